@@ -0,0 +1,126 @@
+'''
+Доля попаданий в кеш главной страницы при нескольких процессах.
+
+Каждый процесс-воркер обслуживает свою долю запросов к случайным
+страницам главной. Попаданием считается ответ без запросов к БД.
+С locmem у каждого воркера свой кеш, и каждая страница промахивается
+в каждом воркере; с общим кешем (file, memcached) страница
+отрисовывается один раз на все воркеры.
+
+    python -m benchmarks.cache_workers --workers 4 --requests 400
+'''
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import tempfile
+
+from .utils import migrate, setup_django
+
+
+def seed(posts):
+    '''
+    Создаёт базу с автором и posts постами.
+    '''
+    setup_django()
+    migrate()
+    from posts.models import Post, User
+    author = User.objects.create_user(username='bench_author')
+    Post.objects.bulk_create(
+        Post(author=author, text=f'Пост {i}') for i in range(posts)
+    )
+
+
+def worker(pages, requests, seed_value, queue):
+    '''
+    Запрашивает случайные страницы главной и считает попадания в кеш.
+    '''
+    setup_django()
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+
+    client = Client()
+    rnd = random.Random(seed_value)
+    hits = 0
+    for _ in range(requests):
+        page = rnd.randint(1, pages)
+        with CaptureQueriesContext(connection) as queries:
+            client.get('/', {'page': page})
+        if not queries.captured_queries:
+            hits += 1
+    queue.put(hits)
+
+
+def run(mode, workers, requests, pages, location):
+    '''
+    Прогон в одном режиме кеша.
+    '''
+    os.environ['YATUBE_CACHE'] = mode
+    if location:
+        os.environ['YATUBE_CACHE_LOCATION'] = location
+    queue = multiprocessing.Queue()
+    per_worker = requests // workers
+    processes = [
+        multiprocessing.Process(
+            target=worker,
+            args=(pages, per_worker, number, queue)
+        )
+        for number in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    hits = sum(queue.get() for _ in processes)
+    for process in processes:
+        process.join()
+    total = per_worker * workers
+    return {
+        'mode': mode,
+        'workers': workers,
+        'requests': total,
+        'pages': pages,
+        'hits': hits,
+        'hit_rate': round(hits / total, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--pages', type=int, default=20)
+    parser.add_argument(
+        '--modes', default='locmem,file',
+        help='Режимы YATUBE_CACHE через запятую'
+    )
+    parser.add_argument('--output', help='Файл для результатов в JSON')
+    args = parser.parse_args()
+
+    multiprocessing.set_start_method('spawn')
+    with tempfile.TemporaryDirectory() as temp_dir:
+        os.environ['YATUBE_DB_NAME'] = os.path.join(
+            temp_dir, 'bench.sqlite3'
+        )
+        process = multiprocessing.Process(
+            target=seed, args=(args.pages * 10,)
+        )
+        process.start()
+        process.join()
+        results = []
+        for mode in args.modes.split(','):
+            location = None
+            if mode == 'file':
+                location = os.path.join(temp_dir, 'cache')
+            results.append(
+                run(mode, args.workers, args.requests, args.pages, location)
+            )
+    report = json.dumps(results, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, 'w') as output:
+            output.write(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+'''
+Пропускная способность записи при нескольких процессах.
+
+Воркеры одновременно создают посты, комментарии и подписки, как это
+делают post_create, add_comment и profile_follow. Режимы:
+sqlite-rollback - прежняя настройка: журнал по умолчанию, обычный BEGIN
+и ожидание блокировки 5 секунд, как в модуле sqlite3;
+sqlite-wal - WAL, BEGIN IMMEDIATE и ожидание блокировки 20 секунд;
+postgresql - база из переменных POSTGRES_* (должна быть создана).
+
+    python -m benchmarks.db_writes --workers 4 --seconds 5
+'''
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+
+from .utils import migrate, setup_django
+
+MODES = {
+    'sqlite-rollback': {
+        'YATUBE_DB_ENGINE': 'sqlite',
+        'YATUBE_SQLITE_WAL': '0',
+        'YATUBE_SQLITE_TIMEOUT': '5',
+    },
+    'sqlite-wal': {
+        'YATUBE_DB_ENGINE': 'sqlite',
+        'YATUBE_SQLITE_WAL': '1',
+        'YATUBE_SQLITE_TIMEOUT': '20',
+    },
+    'postgresql': {
+        'YATUBE_DB_ENGINE': 'postgresql',
+    },
+}
+
+
+def seed(workers):
+    '''
+    Создаёт таблицы и по автору на каждого воркера.
+    '''
+    setup_django()
+    migrate()
+    from posts.models import Post, User
+    for number in range(workers):
+        author = User.objects.create_user(username=f'bench_writer_{number}')
+        Post.objects.create(author=author, text='Первый пост')
+
+
+def worker(number, workers, seconds, queue):
+    '''
+    Пишет в базу seconds секунд, считает записи и ошибки блокировок.
+    '''
+    setup_django()
+    from django.db import OperationalError
+    from posts.models import Comment, Follow, Post, User
+
+    writes = errors = 0
+    try:
+        user = User.objects.get(username=f'bench_writer_{number}')
+        others = list(User.objects.exclude(pk=user.pk))
+        post = Post.objects.filter(author=user).first()
+    except OperationalError:
+        queue.put((writes, 1))
+        return
+    deadline = time.monotonic() + seconds
+    step = 0
+    while time.monotonic() < deadline:
+        try:
+            kind = step % 3
+            if kind == 0:
+                Post.objects.create(author=user, text=f'Пост {step}')
+            elif kind == 1:
+                Comment.objects.create(
+                    author=user, post=post, text=f'Комментарий {step}'
+                )
+            elif others:
+                author = others[step % len(others)]
+                Follow.objects.filter(user=user, author=author).delete()
+                Follow.objects.create(user=user, author=author)
+            writes += 1
+        except OperationalError:
+            errors += 1
+        step += 1
+    queue.put((writes, errors))
+
+
+def run(mode, workers, seconds, temp_dir):
+    '''
+    Прогон в одном режиме базы.
+    '''
+    os.environ.update(MODES[mode])
+    os.environ['YATUBE_DB_NAME'] = os.path.join(temp_dir, f'{mode}.sqlite3')
+    process = multiprocessing.Process(target=seed, args=(workers,))
+    process.start()
+    process.join()
+    queue = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(
+            target=worker, args=(number, workers, seconds, queue)
+        )
+        for number in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    results = [queue.get() for _ in processes]
+    for process in processes:
+        process.join()
+    writes = sum(result[0] for result in results)
+    errors = sum(result[1] for result in results)
+    return {
+        'mode': mode,
+        'workers': workers,
+        'seconds': seconds,
+        'writes': writes,
+        'errors': errors,
+        'writes_per_second': round(writes / seconds, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument(
+        '--modes', default='sqlite-rollback,sqlite-wal',
+        help='Режимы через запятую: ' + ', '.join(MODES)
+    )
+    parser.add_argument('--output', help='Файл для результатов в JSON')
+    args = parser.parse_args()
+
+    multiprocessing.set_start_method('spawn')
+    with tempfile.TemporaryDirectory() as temp_dir:
+        results = [
+            run(mode, args.workers, args.seconds, temp_dir)
+            for mode in args.modes.split(',')
+        ]
+    report = json.dumps(results, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, 'w') as output:
+            output.write(report)
+
+
+if __name__ == '__main__':
+    main()
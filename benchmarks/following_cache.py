@@ -0,0 +1,152 @@
+'''
+Память и время чтения подписок пользователя с --authors авторами.
+
+Сравнивает прежнее представление - set из int, прочитанный
+из Follow, - с массивом array('I') из posts.following: размер
+объекта в памяти процесса (tracemalloc) и строки в кеше (pickle),
+время загрузки из БД и из кеша и время проверки «подписан ли я»
+(для массива - в пределах одного запроса, как на странице).
+
+    python -m benchmarks.following_cache --authors 10000
+'''
+import argparse
+import json
+import os
+import pickle
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+from .utils import migrate, setup_django
+
+
+def seed(authors):
+    '''
+    Создаёт читателя, подписанного на authors авторов.
+    '''
+    from posts.models import Follow, User
+
+    reader = User.objects.create(username='bench_reader')
+    User.objects.bulk_create(
+        User(username=f'bench_author_{number}') for number in range(authors)
+    )
+    author_ids = User.objects.exclude(pk=reader.pk).values_list(
+        'id', flat=True
+    )
+    Follow.objects.bulk_create(
+        (Follow(user=reader, author_id=author_id) for author_id in author_ids),
+        batch_size=500
+    )
+    return reader, list(author_ids)
+
+
+def allocated(build):
+    '''
+    Объект, построенный build(), и занятая им память в байтах.
+    '''
+    tracemalloc.start()
+    value = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return value, size
+
+
+def timed(function, repeat):
+    '''
+    Медиана времени вызова function в миллисекундах.
+    '''
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(timings), 3)
+
+
+def run(authors, repeat):
+    '''
+    Замеры для читателя с authors подписками.
+    '''
+    from django.core.cache import cache
+    from posts.following import (
+        finish_request, following_key, get_following, is_following,
+        start_request
+    )
+    from posts.models import Follow
+
+    reader, author_ids = seed(authors)
+    probes = author_ids[::max(len(author_ids) // 100, 1)] + [0]
+
+    def load_set():
+        return set(Follow.objects.filter(user=reader).values_list(
+            'author_id', flat=True
+        ))
+
+    def load_array():
+        cache.delete(following_key(reader.id))
+        return get_following(reader.id)
+
+    following_set, set_bytes = allocated(load_set)
+    following_array, array_bytes = allocated(load_array)
+    assert set(following_array) == following_set
+
+    def check_set():
+        for author_id in probes:
+            author_id in following_set
+
+    def check_array():
+        start_request()
+        for author_id in probes:
+            is_following(reader.id, author_id)
+        finish_request()
+
+    return {
+        'authors': len(following_set),
+        'set': {
+            'memory_kb': round(set_bytes / 1024, 1),
+            'pickled_kb': round(len(pickle.dumps(following_set)) / 1024, 1),
+            'load_db_ms': timed(load_set, repeat),
+            'lookup_us': round(
+                timed(check_set, repeat) * 1000 / len(probes), 3
+            ),
+        },
+        'array': {
+            'memory_kb': round(array_bytes / 1024, 1),
+            'pickled_kb': round(
+                len(pickle.dumps(following_array.tobytes())) / 1024, 1
+            ),
+            'load_db_ms': timed(load_array, repeat),
+            'load_cache_ms': timed(
+                lambda: get_following(reader.id), repeat
+            ),
+            'lookup_us': round(
+                timed(check_array, repeat) * 1000 / len(probes), 3
+            ),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--authors', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--output', help='Файл для результатов в JSON')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        os.environ['YATUBE_DB_NAME'] = os.path.join(
+            temp_dir, 'bench.sqlite3'
+        )
+        setup_django()
+        migrate()
+        result = run(args.authors, args.repeat)
+    output = json.dumps(result, indent=2, ensure_ascii=False)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(output)
+
+
+if __name__ == '__main__':
+    main()
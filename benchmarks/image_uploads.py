@@ -0,0 +1,189 @@
+'''
+Пиковая память процесса при публикации поста с большой картинкой.
+
+Для каждого размера файла (МБ) создаётся JPEG из шума и тело
+multipart-запроса на диске; запрос к post_create читает тело из файла,
+как из сокета. В замер входят разбор запроса, проверка формы,
+сохранение картинки и создание миниатюры и вариантов
+(THUMBNAIL_WORKERS = 0, сразу в запросе). Режимы:
+default - обработчики загрузки Django и оригинал без уменьшения;
+pipeline - SizeLimitedUploadHandler и уменьшение до POST_IMAGE_MAX_SIDE.
+Каждый замер выполняется в отдельном процессе, peak_rss_mb - прирост
+пикового RSS процесса за запрос.
+
+    python -m benchmarks.image_uploads --sizes 20,35,50
+'''
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+
+from .utils import migrate, setup_django
+
+BOUNDARY = 'BenchmarkBoundary'
+# Байт на точку у JPEG из шума с качеством 95
+JPEG_NOISE_BYTES_PER_PIXEL = 1.18
+
+MODES = ('default', 'pipeline')
+
+
+def make_image(path, megabytes):
+    '''
+    Записывает JPEG из шума размером около megabytes МБ.
+    '''
+    from PIL import Image
+    pixels = megabytes * 1024 * 1024 / JPEG_NOISE_BYTES_PER_PIXEL
+    width = int((pixels * 3 / 2) ** 0.5)
+    height = int(width * 2 / 3)
+    image = Image.frombytes(
+        'RGB', (width, height), os.urandom(width * height * 3)
+    )
+    image.save(path, 'JPEG', quality=95)
+    return width, height
+
+
+def make_body(path, image_path):
+    '''
+    Записывает тело multipart-запроса формы поста с картинкой.
+    '''
+    with open(path, 'wb') as body, open(image_path, 'rb') as image:
+        body.write(
+            f'--{BOUNDARY}\r\n'
+            'Content-Disposition: form-data; name="text"\r\n\r\n'
+            'Пост с большой картинкой\r\n'
+            f'--{BOUNDARY}\r\n'
+            'Content-Disposition: form-data; name="image"; '
+            'filename="big.jpg"\r\n'
+            'Content-Type: image/jpeg\r\n\r\n'.encode()
+        )
+        while True:
+            chunk = image.read(1024 * 1024)
+            if not chunk:
+                break
+            body.write(chunk)
+        body.write(f'\r\n--{BOUNDARY}--\r\n'.encode())
+
+
+def peak_rss_mb():
+    '''
+    Пиковый RSS процесса в МБ.
+    '''
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def upload(mode, body_path, media_root):
+    '''
+    Публикует пост телом запроса из body_path и замеряет память.
+    '''
+    setup_django()
+    migrate()
+    from django.conf import global_settings
+    from django.core.handlers.wsgi import WSGIRequest
+    from django.test.utils import override_settings
+    from posts.models import Post, User
+    from posts.views import post_create
+
+    user = User.objects.create_user(username=f'bench_{mode}')
+    overrides = {'THUMBNAIL_WORKERS': 0, 'MEDIA_ROOT': media_root}
+    if mode == 'default':
+        overrides.update(
+            FILE_UPLOAD_HANDLERS=global_settings.FILE_UPLOAD_HANDLERS,
+            UPLOAD_MAX_SIZE=float('inf'),
+            POST_IMAGE_MAX_SIDE=None,
+        )
+    with override_settings(**overrides), open(body_path, 'rb') as body:
+        request = WSGIRequest({
+            'REQUEST_METHOD': 'POST',
+            'PATH_INFO': '/create/',
+            'SERVER_NAME': 'testserver',
+            'SERVER_PORT': '80',
+            'CONTENT_TYPE': f'multipart/form-data; boundary={BOUNDARY}',
+            'CONTENT_LENGTH': str(os.path.getsize(body_path)),
+            'wsgi.input': body,
+            'wsgi.url_scheme': 'http',
+        })
+        request.user = user
+        before = peak_rss_mb()
+        started = time.monotonic()
+        response = post_create(request)
+        elapsed = time.monotonic() - started
+        after = peak_rss_mb()
+        post = Post.objects.filter(author=user).first()
+        stored = (post.image.width, post.image.height) if post else None
+    return {
+        'status': response.status_code,
+        'stored': stored,
+        'peak_rss_mb': round(after - before, 1),
+        'seconds': round(elapsed, 2),
+    }
+
+
+def worker(mode, body_path, media_root, queue):
+    '''
+    Процесс замера: результат или ошибка всегда попадают в очередь.
+    '''
+    try:
+        queue.put(upload(mode, body_path, media_root))
+    except Exception as error:
+        queue.put({'error': repr(error)})
+
+
+def run(mode, megabytes, temp_dir):
+    '''
+    Замер одного размера файла в одном режиме.
+    '''
+    os.environ['YATUBE_DB_NAME'] = os.path.join(
+        temp_dir, f'{mode}-{megabytes}.sqlite3'
+    )
+    image_path = os.path.join(temp_dir, f'{megabytes}.jpg')
+    body_path = os.path.join(temp_dir, f'{megabytes}.body')
+    if not os.path.exists(body_path):
+        make_image(image_path, megabytes)
+        make_body(body_path, image_path)
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(
+        target=worker,
+        args=(mode, body_path, os.path.join(temp_dir, 'media'), queue)
+    )
+    process.start()
+    result = queue.get()
+    process.join()
+    return {
+        'mode': mode,
+        'file_mb': round(os.path.getsize(image_path) / 1024 / 1024, 1),
+        **result,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        '--sizes', default='20,35,50',
+        help='Размеры файлов в МБ через запятую'
+    )
+    parser.add_argument(
+        '--modes', default=','.join(MODES),
+        help='Режимы через запятую: ' + ', '.join(MODES)
+    )
+    parser.add_argument('--output', help='Файл для результатов в JSON')
+    args = parser.parse_args()
+
+    multiprocessing.set_start_method('spawn')
+    with tempfile.TemporaryDirectory() as temp_dir:
+        results = [
+            run(mode, int(megabytes), temp_dir)
+            for megabytes in args.sizes.split(',')
+            for mode in args.modes.split(',')
+        ]
+    report = json.dumps(results, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, 'w') as output:
+            output.write(report)
+
+
+if __name__ == '__main__':
+    main()
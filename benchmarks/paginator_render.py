@@ -0,0 +1,91 @@
+'''
+Время отрисовки и размер HTML пагинатора при большом числе страниц.
+
+Сравнивает шаблон posts/includes/paginator.html с номерами
+вокруг текущей страницы и прежний цикл по paginator.page_range,
+который выводит ссылку на каждую страницу. База не нужна:
+пагинатор разбивает range() на страницы по COUNT_OF_PAGE_POST.
+
+    python -m benchmarks.paginator_render --posts 1000,100000,1000000
+'''
+import argparse
+import json
+import statistics
+import time
+
+from .utils import setup_django
+
+# Цикл по всем страницам из paginator.html до тега page_range
+FULL_RANGE_TEMPLATE = '''
+<ul class="pagination">
+  {% for i in page_obj.paginator.page_range %}
+    {% if page_obj.number == i %}
+      <li class="page-item active"><span class="page-link">{{ i }}</span></li>
+    {% else %}
+      <li class="page-item">
+        <a class="page-link" href="?page={{ i }}">{{ i }}</a>
+      </li>
+    {% endif %}
+  {% endfor %}
+</ul>
+'''
+
+
+def measure(template, page_obj, repeat):
+    '''
+    Медиана времени отрисовки в миллисекундах и размер HTML в байтах.
+    '''
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        html = template.render({'page_obj': page_obj})
+        timings.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(timings), 3), len(html.encode())
+
+
+def run(posts, repeat):
+    '''
+    Прогон для ленты из posts постов на средней странице.
+    '''
+    from django.conf import settings
+    from django.core.paginator import Paginator
+    from django.template import engines
+    from django.template.loader import get_template
+
+    paginator = Paginator(range(posts), settings.COUNT_OF_PAGE_POST)
+    page_obj = paginator.get_page(paginator.num_pages // 2 or 1)
+    templates = {
+        'full': engines['django'].from_string(FULL_RANGE_TEMPLATE),
+        'elided': get_template('posts/includes/paginator.html'),
+    }
+    result = {'posts': posts, 'pages': paginator.num_pages}
+    for name, template in templates.items():
+        render_ms, html_bytes = measure(template, page_obj, repeat)
+        result[f'{name}_ms'] = render_ms
+        result[f'{name}_bytes'] = html_bytes
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        '--posts', default='1000,100000,1000000',
+        help='Число постов в ленте через запятую'
+    )
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help='Файл для результатов в JSON')
+    args = parser.parse_args()
+
+    setup_django()
+    results = [
+        run(int(posts), args.repeat) for posts in args.posts.split(',')
+    ]
+    report = json.dumps(results, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, 'w') as output:
+            output.write(report)
+
+
+if __name__ == '__main__':
+    main()
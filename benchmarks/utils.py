@@ -0,0 +1,26 @@
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_DIR = os.path.join(BASE_DIR, 'yatube')
+
+
+def setup_django():
+    '''
+    Настраивает Django для бенчмарка.
+    База и кеш выбираются переменными окружения YATUBE_*,
+    их нужно задать до вызова.
+    '''
+    if PROJECT_DIR not in sys.path:
+        sys.path.insert(0, PROJECT_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+    import django
+    django.setup()
+
+
+def migrate():
+    '''
+    Создаёт таблицы в базе бенчмарка.
+    '''
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0, interactive=False)
@@ -0,0 +1,354 @@
+'''
+Задержка, число запросов к БД и память страниц приложения posts.
+
+Сначала mixer (как в фикстурах tests/) заполняет временную базу:
+пользователи, группы, посты с картинками, комментарии и подписки.
+Число подписок пользователя и популярность авторов распределены
+по степенному закону: немногие авторы собирают большую часть
+подписчиков и пишут большую часть постов. Затем каждая страница
+(index, group_posts, profile, post_detail, follow_index)
+запрашивается --requests раз по случайным адресам.
+Режимы кеша: cold - кеш очищается перед каждым запросом,
+warm - не очищается. Прогон идёт с DEBUG=False, запросы к БД
+считаются только внутри замеряемого запроса. Память (tracemalloc)
+замеряется отдельным прогоном из --memory-requests запросов,
+чтобы не искажать задержку.
+Одинаковый --seed даёт одинаковые данные и адреса, поэтому
+результаты в JSON можно сравнивать между коммитами (--baseline).
+
+    python -m benchmarks.views --posts 5000 --output result.json
+'''
+import argparse
+import json
+import os
+import random
+import resource
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from io import BytesIO
+
+from .utils import BASE_DIR, migrate, setup_django
+
+VIEWS = ('index', 'group_list', 'profile', 'post_detail', 'follow_index')
+CACHE_MODES = ('cold', 'warm')
+# Показатель степенного закона популярности авторов
+# и минимальное число подписок пользователя
+POPULARITY_EXPONENT = 1.2
+FOLLOWS_EXPONENT = 1.5
+MIN_FOLLOWS = 2
+IMAGE_COUNT = 8
+
+
+def power_law_weights(count, exponent):
+    '''
+    Веса по закону Ципфа: вес элемента ранга r равен 1 / r ** exponent.
+    '''
+    return [1 / rank ** exponent for rank in range(1, count + 1)]
+
+
+def make_images(count, rnd):
+    '''
+    Сохраняет count разных картинок в хранилище постов
+    и возвращает их имена.
+    '''
+    from django.core.files.base import ContentFile
+    from PIL import Image
+    from posts.storage import post_image_storage
+
+    names = []
+    for number in range(count):
+        color = tuple(rnd.randrange(256) for _ in range(3))
+        image = Image.new('RGB', (1200, 800), color)
+        buffer = BytesIO()
+        image.save(buffer, 'JPEG', quality=85)
+        names.append(post_image_storage.save(
+            f'posts/bench_{number}.jpg', ContentFile(buffer.getvalue())
+        ))
+    return names
+
+
+def follow_graph(users, rnd):
+    '''
+    Пары (подписчик, автор): число подписок пользователя
+    по распределению Парето, авторы выбираются по популярности.
+    '''
+    weights = power_law_weights(len(users), POPULARITY_EXPONENT)
+    pairs = []
+    for user in users:
+        wanted = min(
+            int(rnd.paretovariate(FOLLOWS_EXPONENT) * MIN_FOLLOWS),
+            len(users) - 1
+        )
+        authors = set()
+        while len(authors) < wanted:
+            author = rnd.choices(users, weights)[0]
+            if author != user:
+                authors.add(author)
+        pairs += [(user, author) for author in authors]
+    return pairs
+
+
+def seed(args, rnd):
+    '''
+    Заполняет базу синтетическими данными через mixer
+    и возвращает описание набора данных.
+    '''
+    from django.db.models import Max
+    from mixer.backend.django import mixer
+    from posts.models import (
+        Comment, Follow, Group, Post, User, UserCounter
+    )
+    from posts.thumbnails import schedule_post_thumbnails
+
+    users = mixer.cycle(args.users).blend(
+        User, username=mixer.sequence('bench_user_{0}')
+    )
+    groups = mixer.cycle(args.groups).blend(
+        Group, slug=mixer.sequence('bench-group-{0}')
+    )
+    pairs = follow_graph(users, rnd)
+    for user, author in pairs:
+        mixer.blend(Follow, user=user, author=author)
+    images = make_images(IMAGE_COUNT, rnd)
+    weights = power_law_weights(len(users), POPULARITY_EXPONENT)
+    authors = rnd.choices(users, weights, k=args.posts)
+    posts = mixer.cycle(args.posts).blend(
+        Post,
+        author=(author for author in authors),
+        group=(
+            rnd.choice(groups) if rnd.random() < 0.7 else None
+            for _ in range(args.posts)
+        ),
+        image=(
+            rnd.choice(images) if rnd.random() < args.image_share else ''
+            for _ in range(args.posts)
+        ),
+    )
+    for name in images:
+        post = Post.objects.filter(image=name).first()
+        if post is not None:
+            schedule_post_thumbnails(post)
+            post.refresh_from_db()
+            Post.objects.filter(image=name).update(
+                image_widths=post.image_widths
+            )
+    mixer.cycle(args.comments).blend(
+        Comment,
+        post=(rnd.choice(posts) for _ in range(args.comments)),
+        author=(rnd.choice(users) for _ in range(args.comments)),
+    )
+    return {
+        'users': len(users),
+        'groups': len(groups),
+        'posts': Post.objects.count(),
+        'posts_with_images': Post.objects.exclude(image='').count(),
+        'comments': Comment.objects.count(),
+        'follows': Follow.objects.count(),
+        'max_followers': UserCounter.objects.aggregate(
+            value=Max('follower_count')
+        )['value'],
+    }
+
+
+def build_urls(view, count, rnd):
+    '''
+    Список адресов страницы view и пользователей, от имени которых
+    они запрашиваются (None - гость).
+    '''
+    from django.conf import settings
+    from django.urls import reverse
+    from posts.models import Follow, Group, Post, User
+
+    per_page = settings.COUNT_OF_PAGE_POST
+    pages = max(Post.objects.count() // per_page, 1)
+    if view == 'index':
+        return [
+            (reverse('posts:index') + f'?page={rnd.randint(1, pages)}', None)
+            for _ in range(count)
+        ]
+    if view == 'group_list':
+        slugs = list(Group.objects.values_list('slug', flat=True))
+        return [
+            (reverse('posts:group_list', args=(rnd.choice(slugs),)), None)
+            for _ in range(count)
+        ]
+    if view == 'profile':
+        usernames = list(User.objects.values_list('username', flat=True))
+        return [
+            (reverse('posts:profile', args=(rnd.choice(usernames),)), None)
+            for _ in range(count)
+        ]
+    if view == 'post_detail':
+        ids = list(Post.objects.values_list('id', flat=True))
+        return [
+            (reverse('posts:post_detail', args=(rnd.choice(ids),)), None)
+            for _ in range(count)
+        ]
+    followers = list(
+        Follow.objects.values_list('user', flat=True).distinct()
+    )
+    users = User.objects.in_bulk(followers)
+    return [
+        (reverse('posts:follow_index'), users[rnd.choice(followers)])
+        for _ in range(count)
+    ]
+
+
+def request(client, url, user, cold):
+    '''
+    Выполняет запрос и возвращает время в мс и число запросов к БД.
+    '''
+    from django.core.cache import cache
+    from django.db import connection, reset_queries
+    from django.test.utils import CaptureQueriesContext
+
+    if cold:
+        cache.clear()
+    if user is not None:
+        client.force_login(user)
+    # queries_log ограничен 9000 записями: заполненный журнал
+    # не растёт, и CaptureQueriesContext насчитал бы 0 запросов
+    reset_queries()
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        response = client.get(url)
+        elapsed = (time.perf_counter() - start) * 1000
+    if response.status_code != 200:
+        raise RuntimeError(f'{url}: статус {response.status_code}')
+    return elapsed, len(queries)
+
+
+def measure(view, cold, args, seed_value):
+    '''
+    Задержка, запросы к БД и пиковая память страницы view.
+    '''
+    from django.test import Client
+
+    rnd = random.Random(seed_value)
+    urls = build_urls(view, args.requests + args.memory_requests, rnd)
+    client = Client()
+    timings = []
+    query_counts = []
+    for url, user in urls[:args.requests]:
+        elapsed, queries = request(client, url, user, cold)
+        timings.append(elapsed)
+        query_counts.append(queries)
+    peaks = []
+    for url, user in urls[args.requests:]:
+        tracemalloc.start()
+        request(client, url, user, cold)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    percentiles = statistics.quantiles(timings, n=100)
+    return {
+        'requests': len(timings),
+        'mean_ms': round(statistics.mean(timings), 2),
+        'p50_ms': round(percentiles[49], 2),
+        'p90_ms': round(percentiles[89], 2),
+        'p99_ms': round(percentiles[98], 2),
+        'queries_mean': round(statistics.mean(query_counts), 2),
+        'queries_max': max(query_counts),
+        'peak_kb': round(max(peaks) / 1024, 1) if peaks else None,
+    }
+
+
+def git_commit():
+    '''
+    Текущий коммит репозитория или None.
+    '''
+    try:
+        return subprocess.run(
+            ('git', 'rev-parse', '--short', 'HEAD'), cwd=BASE_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, baseline):
+    '''
+    Печатает изменение p50, p99 и числа запросов относительно baseline.
+    '''
+    print(f'Сравнение с {baseline["commit"]}:')
+    for mode, views in report['results'].items():
+        for view, result in views.items():
+            before = baseline['results'].get(mode, {}).get(view)
+            if before is None:
+                continue
+            changes = ', '.join(
+                f'{key} {before[key]} -> {result[key]}'
+                for key in ('p50_ms', 'p99_ms', 'queries_mean')
+            )
+            print(f'  {mode} {view}: {changes}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--groups', type=int, default=20)
+    parser.add_argument('--posts', type=int, default=5000)
+    parser.add_argument('--comments', type=int, default=10000)
+    parser.add_argument(
+        '--image-share', type=float, default=0.3,
+        help='Доля постов с картинкой'
+    )
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--memory-requests', type=int, default=20)
+    parser.add_argument(
+        '--views', default=','.join(VIEWS),
+        help='Страницы через запятую'
+    )
+    parser.add_argument(
+        '--cache', default=','.join(CACHE_MODES),
+        help='Режимы кеша через запятую'
+    )
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='Файл для результатов в JSON')
+    parser.add_argument('--baseline', help='JSON прошлого прогона')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        os.environ['YATUBE_DB_NAME'] = os.path.join(
+            temp_dir, 'bench.sqlite3'
+        )
+        os.environ['YATUBE_THUMBNAIL_WORKERS'] = '0'
+        setup_django()
+        from django.test.utils import override_settings
+        with override_settings(
+            MEDIA_ROOT=os.path.join(temp_dir, 'media'), DEBUG=False
+        ):
+            migrate()
+            rnd = random.Random(args.seed)
+            started = time.perf_counter()
+            dataset = seed(args, rnd)
+            dataset['seed_seconds'] = round(time.perf_counter() - started, 1)
+            results = {}
+            for mode in args.cache.split(','):
+                results[mode] = {
+                    view: measure(view, mode == 'cold', args, args.seed)
+                    for view in args.views.split(',')
+                }
+    report = {
+        'commit': git_commit(),
+        'seed': args.seed,
+        'dataset': dataset,
+        'results': results,
+        'max_rss_mb': round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+        ),
+    }
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(output)
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            compare(report, json.load(baseline_file))
+
+
+if __name__ == '__main__':
+    main()
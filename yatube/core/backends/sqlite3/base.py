@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    '''
+    SQLite для одновременной записи из нескольких процессов.
+    При SQLITE_WAL = True база работает в режиме WAL: чтение
+    не блокируется записью. Транзакции начинаются с BEGIN IMMEDIATE
+    и сразу берут блокировку на запись, поэтому конкурирующая запись
+    ждёт её timeout секунд, а не падает с "database is locked"
+    при попытке повысить блокировку чтения посреди транзакции.
+    '''
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        if settings.SQLITE_WAL:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        if settings.SQLITE_WAL:
+            self.cursor().execute('BEGIN IMMEDIATE')
+        else:
+            super()._start_transaction_under_autocommit()
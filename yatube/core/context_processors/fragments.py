@@ -0,0 +1,13 @@
+from django.conf import settings
+
+from core.routers import cache_timeout
+
+
+def fragment_timeout(request):
+    """
+    Добавляет время хранения фрагментов шаблонов в кеше:
+    меньше, пока реплики могут отставать от основной базы.
+    """
+    return {
+        'fragment_timeout': cache_timeout(settings.FRAGMENT_TIME_CACHED)
+    }
@@ -0,0 +1,36 @@
+from django.conf import settings
+
+from .routers import use_replica, wrote_to_primary
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class PrimaryPinMiddleware:
+    '''
+    Разрешает PrimaryReplicaRouter читать с реплик безопасные запросы.
+    После записи в основную базу ответ ставит cookie
+    PRIMARY_PIN_COOKIE на PRIMARY_PIN_SECONDS секунд: пока она есть,
+    запросы пользователя читают основную базу и видят свои изменения
+    (например, новый пост в профиле после post_create),
+    даже если реплика ещё не догнала основную базу.
+    '''
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        use_replica(
+            request.method in SAFE_METHODS
+            and settings.PRIMARY_PIN_COOKIE not in request.COOKIES
+        )
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = wrote_to_primary()
+            use_replica(False)
+        if wrote and settings.REPLICA_DATABASES:
+            response.set_cookie(
+                settings.PRIMARY_PIN_COOKIE, '1',
+                max_age=settings.PRIMARY_PIN_SECONDS, httponly=True,
+                samesite='Lax'
+            )
+        return response
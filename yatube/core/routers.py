@@ -0,0 +1,96 @@
+import random
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+
+_state = threading.local()
+
+# Ключ кеша: есть PRIMARY_PIN_SECONDS секунд после сброса кеша,
+# пока реплики могут не содержать сброшенных изменений
+INVALIDATED_KEY = 'replica:invalidated'
+
+
+def use_replica(enabled):
+    '''
+    Разрешает или запрещает чтение с реплик в текущем потоке.
+    Запись в БД снимает разрешение до конца запроса.
+    '''
+    _state.use_replica = enabled
+    _state.replica_request = enabled
+    _state.lagging = None
+    _state.wrote = False
+
+
+def wrote_to_primary():
+    '''
+    Была ли запись в основную базу с последнего вызова use_replica.
+    '''
+    return getattr(_state, 'wrote', False)
+
+
+def mark_invalidated():
+    '''
+    Запоминает, что данные в кеше только что сброшены.
+    '''
+    if settings.REPLICA_DATABASES:
+        cache.set(INVALIDATED_KEY, True, settings.PRIMARY_PIN_SECONDS)
+
+
+def replica_lagging():
+    '''
+    Читает ли текущий запрос реплики меньше чем через
+    PRIMARY_PIN_SECONDS секунд после сброса кеша. Реплика может
+    ещё не догнать основную базу, и прочитанное с неё нельзя
+    надолго класть в кеш под новым поколением.
+    '''
+    if not (
+        settings.REPLICA_DATABASES
+        and getattr(_state, 'replica_request', False)
+    ):
+        return False
+    if getattr(_state, 'lagging', None) is None:
+        _state.lagging = bool(cache.get(INVALIDATED_KEY))
+    return _state.lagging
+
+
+def cache_timeout(timeout):
+    '''
+    Время хранения в кеше данных текущего запроса: timeout или
+    PRIMARY_PIN_SECONDS, пока реплики могут отставать.
+    '''
+    if replica_lagging():
+        return min(timeout, settings.PRIMARY_PIN_SECONDS)
+    return timeout
+
+
+class PrimaryReplicaRouter:
+    '''
+    Роутер основной базы и реплик.
+    Запись всегда идёт в основную базу default. Чтение моделей
+    приложений REPLICA_APP_LABELS идёт на случайную реплику
+    из REPLICA_DATABASES, только если его разрешил
+    PrimaryPinMiddleware (безопасный запрос без закрепления
+    за основной базой) и в запросе ещё не было записи.
+    Команды, фоновые потоки и остальные модели читают
+    основную базу.
+    '''
+    def db_for_read(self, model, **hints):
+        if (
+            settings.REPLICA_DATABASES
+            and getattr(_state, 'use_replica', False)
+            and model._meta.app_label in settings.REPLICA_APP_LABELS
+        ):
+            return random.choice(settings.REPLICA_DATABASES)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        _state.use_replica = False
+        _state.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.REPLICA_DATABASES
@@ -1,5 +1,19 @@
-# from django.contrib.auth import get_user_model
-from django.test import TestCase, Client
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+
+from core.routers import mark_invalidated
+from posts.models import Post, UserCounter
+
+User = get_user_model()
 
 
 class CoreViewsTests(TestCase):
@@ -27,3 +41,130 @@ class CoreViewsTests(TestCase):
             response, template,
             'Тест не пройден, не тот шаблон возвращается'
         )
+
+
+@override_settings(REPLICA_DATABASES=['replica'])
+class ReplicaRoutingTest(TestCase):
+    '''
+    Класс ReplicaRoutingTest.
+    Тестируем чтение с реплики: реплика - отдельный файл SQLite,
+    в котором лежат не те посты, что в основной базе.
+    '''
+    databases = {'default', 'replica'}
+
+    @classmethod
+    def setUpClass(cls):
+        '''
+        Создаём базу реплики, автора в обеих базах
+        и по посту в каждой.
+        '''
+        cls.temp_dir = tempfile.mkdtemp()
+        connections.databases['replica'] = {
+            'ENGINE': 'core.backends.sqlite3',
+            'NAME': os.path.join(cls.temp_dir, 'replica.sqlite3'),
+        }
+        call_command('migrate', database='replica', verbosity=0)
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='usertest')
+        User.objects.using('replica').create(
+            id=cls.user.id, username='usertest'
+        )
+        Post.objects.using('replica').bulk_create(
+            [Post(author_id=cls.user.id, text='Пост с реплики')]
+        )
+        UserCounter.objects.using('replica').filter(
+            user_id=cls.user.id
+        ).update(post_count=1)
+        Post.objects.create(author=cls.user, text='Пост в основной базе')
+
+    @classmethod
+    def tearDownClass(cls):
+        '''
+        Удаляем базу реплики.
+        '''
+        super().tearDownClass()
+        connections['replica'].close()
+        del connections.databases['replica']
+        if hasattr(connections._connections, 'replica'):
+            delattr(connections._connections, 'replica')
+        shutil.rmtree(cls.temp_dir, ignore_errors=True)
+
+    def setUp(self):
+        '''
+        Очищаем кеш и создаём гостевого и авторизированного клиентов.
+        '''
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(ReplicaRoutingTest.user)
+        self.profile_url = reverse(
+            'posts:profile', kwargs={'username': 'usertest'}
+        )
+
+    def test_core_replica_feed_read_from_replica(self):
+        '''
+        Ленты читаются с реплики.
+        '''
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Пост с реплики')
+        self.assertNotContains(response, 'Пост в основной базе')
+
+    @override_settings(REPLICA_DATABASES=[])
+    def test_core_replica_primary_without_replicas(self):
+        '''
+        Без реплик всё читается из основной базы.
+        '''
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Пост в основной базе')
+
+    def test_core_replica_read_your_writes(self):
+        '''
+        После публикации поста автор читает основную базу и видит
+        его в профиле, пока не истечёт закрепление.
+        '''
+        response = self.authorized_client.post(
+            reverse('posts:post_create'), {'text': 'Только что написан'},
+            follow=True
+        )
+        self.assertContains(
+            response, 'Только что написан',
+            msg_prefix='Тест не пройден, после записи профиль '
+                       'читается с реплики'
+        )
+        pin = response.client.cookies['primary_pin']
+        self.assertEqual(pin['max-age'], 5)
+        del self.authorized_client.cookies['primary_pin']
+        cache.clear()
+        response = self.authorized_client.get(self.profile_url)
+        self.assertNotContains(response, 'Только что написан')
+        self.assertContains(response, 'Пост с реплики')
+
+    def test_core_replica_short_cache_after_invalidation(self):
+        '''
+        После сброса кеша гости по-прежнему читают реплику,
+        но прочитанное с неё кешируется ненадолго и без валидаторов.
+        '''
+        mark_invalidated()
+        url = reverse('posts:index')
+        response = self.guest_client.get(url)
+        self.assertContains(response, 'Пост с реплики')
+        self.assertIn('max-age=5', response['Cache-Control'])
+        self.assertFalse(response.has_header('ETag'))
+        cache.clear()
+        response = self.guest_client.get(url)
+        self.assertIn(
+            f'max-age={settings.TIME_CACHED}', response['Cache-Control']
+        )
+        self.assertTrue(response.has_header('ETag'))
+
+    def test_core_replica_writes_go_to_primary(self):
+        '''
+        Запись идёт в основную базу.
+        '''
+        self.authorized_client.post(
+            reverse('posts:post_create'), {'text': 'Новый пост'}
+        )
+        self.assertTrue(Post.objects.filter(text='Новый пост').exists())
+        self.assertFalse(
+            Post.objects.using('replica').filter(text='Новый пост').exists()
+        )
@@ -1,6 +1,28 @@
 from django.contrib import admin
 
+from users.admin import UsernameFilter, UsernameSearchMixin
+
 from .models import Comment, Post, Group, Follow
+from .paginators import EstimatedCountPaginator
+from .search import filter_posts
+
+
+class AuthorFilter(UsernameFilter):
+    '''
+    Фильтр по автору.
+    '''
+    title = 'автору'
+    parameter_name = 'author'
+    field_name = 'author'
+
+
+class FollowerFilter(UsernameFilter):
+    '''
+    Фильтр по подписчику.
+    '''
+    title = 'подписчику'
+    parameter_name = 'user'
+    field_name = 'user'
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -10,10 +32,24 @@ class PostAdmin(admin.ModelAdmin):
     '''
     list_display = ('pk', 'text', 'pub_date', 'author', 'group')
     list_editable = ('group',)
+    list_select_related = ('author', 'group')
     search_fields = ('text',)
-    list_filter = ('pub_date',)
+    list_filter = ('pub_date', AuthorFilter)
+    autocomplete_fields = ('author',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        '''
+        Поиск по тексту идёт по полнотекстовому индексу,
+        а не перебором LIKE по всем постам. Число найденных
+        не ограничено: админке нужны все подходящие посты.
+        '''
+        if not search_term:
+            return queryset, False
+        return filter_posts(queryset, search_term), False
+
 
 class GroupAdmin(admin.ModelAdmin):
     '''
@@ -26,25 +62,37 @@ class GroupAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
 
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(UsernameSearchMixin, admin.ModelAdmin):
     '''
     Класс CommentAdmin.
     Настройка отображения комментариев к постам при администрировании.
+    Поиск - по началу username автора.
     '''
     list_display = ('pk', 'post', 'author', 'text', 'created')
-    search_fields = ('post', 'author')
-    list_filter = ('created', 'author',)
+    list_select_related = ('post', 'author')
+    search_fields = ('author__username',)
+    username_search_fields = ('author',)
+    list_filter = ('created', AuthorFilter)
+    autocomplete_fields = ('post', 'author')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     empty_value_display = '-пусто-'
 
 
-class FollowAdmin(admin.ModelAdmin):
+class FollowAdmin(UsernameSearchMixin, admin.ModelAdmin):
     '''
     Класс FollowAdmin.
     Настройка отображения подписок при администрировании.
+    Поиск - по началу username подписчика или автора.
     '''
     list_display = ('pk', 'user', 'author')
-    search_fields = ('user', 'author')
-    list_filter = ('author', 'user')
+    list_select_related = ('user', 'author')
+    search_fields = ('user__username', 'author__username')
+    username_search_fields = ('user', 'author')
+    list_filter = (AuthorFilter, FollowerFilter)
+    autocomplete_fields = ('user', 'author')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     empty_value_display = '-пусто-'
 
 
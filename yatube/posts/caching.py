@@ -0,0 +1,194 @@
+import hashlib
+import time
+from datetime import datetime, timezone
+from functools import wraps
+from itertools import product
+
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.db import transaction
+from django.middleware.csrf import get_token
+from django.views.decorators.cache import cache_page
+from django.views.decorators.http import condition
+
+from core.routers import cache_timeout, mark_invalidated, replica_lagging
+
+# Имя фрагмента карточки поста в posts/includes/post_list.html
+POST_CARD_FRAGMENT = 'post_card'
+# Значения, от которых зависит карточка: user.is_authenticated
+# и author_not_hide (не задан в лентах, 'False' в профиле)
+POST_CARD_VARIANTS = tuple(product((True, False), ('', 'False')))
+
+
+def after_commit(func):
+    '''
+    Выполняет func сразу и, внутри транзакции, ещё раз после её
+    фиксации. Запрос, прочитавший данные между первым вызовом
+    и фиксацией, видит прежние данные и может закешировать их под
+    новым ключом; второй вызов убирает такую запись.
+    После фиксации запоминается время сброса (mark_invalidated):
+    пока реплики могут отставать, прочитанное с них кешируется
+    ненадолго.
+    '''
+    def invalidate():
+        mark_invalidated()
+        func()
+
+    if transaction.get_connection().in_atomic_block:
+        func()
+        transaction.on_commit(invalidate)
+    else:
+        invalidate()
+
+
+def post_card_keys(post_id):
+    '''
+    Ключи кеша всех вариантов карточки поста.
+    '''
+    return [
+        make_template_fragment_key(
+            POST_CARD_FRAGMENT, (post_id, *variant)
+        )
+        for variant in POST_CARD_VARIANTS
+    ]
+
+
+def invalidate_post_cards(post_ids):
+    '''
+    Удаляет из кеша карточки постов.
+    '''
+    keys = []
+    for post_id in post_ids:
+        keys.extend(post_card_keys(post_id))
+    after_commit(lambda: cache.delete_many(keys))
+
+
+# Имя фрагмента первой страницы комментариев в posts/post_details.html
+POST_COMMENTS_FRAGMENT = 'post_comments'
+
+
+def invalidate_post_comments(post_ids):
+    '''
+    Удаляет из кеша первые страницы комментариев постов.
+    '''
+    keys = [
+        make_template_fragment_key(POST_COMMENTS_FRAGMENT, (post_id,))
+        for post_id in post_ids
+    ]
+    after_commit(lambda: cache.delete_many(keys))
+
+
+# Поколение данных лент: меняется при любом изменении постов,
+# групп и комментариев и входит в префикс ключей закешированных страниц
+FEED_GENERATION_KEY = 'feed:generation'
+# Поколение профилей: меняется при подписках и изменении
+# пользователей, от него зависят счётчики и кнопка подписки
+PROFILE_GENERATION_KEY = 'profile:generation'
+
+# Число постов главной страницы для CachedCountPaginator
+INDEX_COUNT_KEY = 'feed:index:count'
+
+
+def get_generation(key):
+    '''
+    Текущее поколение данных под ключом key.
+    Начальное значение берётся от текущего времени, чтобы после
+    вытеснения ключа из кеша не вернуться к уже использованному номеру.
+    '''
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, time.time_ns(), None)
+        generation = cache.get(key)
+    return generation
+
+
+def bump_generation(key):
+    '''
+    Начинает новое поколение данных под ключом key
+    и запоминает время изменения. Внутри транзакции поколение
+    меняется ещё раз после её фиксации.
+    '''
+    def bump():
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), None)
+        cache.set(f'{key}:modified', time.time(), None)
+
+    after_commit(bump)
+
+
+def get_feed_generation():
+    '''
+    Текущее поколение данных лент.
+    '''
+    return get_generation(FEED_GENERATION_KEY)
+
+
+def bump_feed_generation():
+    '''
+    Начинает новое поколение: все закешированные страницы лент
+    становятся недоступны.
+    '''
+    bump_generation(FEED_GENERATION_KEY)
+
+
+def cache_feed_page(timeout, key_prefix):
+    '''
+    Аналог cache_page, у которого в префикс ключа входит поколение
+    данных лент. Страницы можно держать в кеше долго: после изменения
+    данных они перестают находиться по новому префиксу.
+    Страница, прочитанная с отстающей реплики, хранится недолго.
+    '''
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            prefix = f'{key_prefix}:{get_feed_generation()}'
+            cached_view = cache_page(
+                cache_timeout(timeout), key_prefix=prefix
+            )(view_func)
+            return cached_view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def conditional_page(*keys):
+    '''
+    Аналог condition для страниц, содержимое которых зависит
+    от поколений данных keys и от пользователя.
+    ETag складывается из поколений, id пользователя и, для
+    авторизованного пользователя, отпечатка токена CSRF из формы
+    на странице. Токен создаётся до вычисления ETag, поэтому уже
+    первый ответ получает ETag с токеном, который браузер пришлёт
+    в cookie. Вход меняет токен, и страница с формой не отдаётся
+    из кеша браузера со старым токеном.
+    Last-Modified - время последнего изменения поколений - отдаётся
+    только гостям: по If-Modified-Since нельзя отличить страницу
+    одного пользователя от страницы другого, поэтому страницы
+    авторизованных пользователей проверяются только по ETag.
+    Для повторного запроса с совпавшим If-None-Match или
+    If-Modified-Since ответ 304 отдаётся без запросов к постам
+    и рендера шаблона. Страница, прочитанная с отстающей реплики,
+    отдаётся без валидаторов, чтобы браузер не хранил её под
+    новым поколением.
+    '''
+    def etag(request, *args, **kwargs):
+        if replica_lagging():
+            return None
+        generations = '-'.join(str(get_generation(key)) for key in keys)
+        if not request.user.is_authenticated:
+            return f'{generations}-0'
+        get_token(request)
+        csrf_token = request.META['CSRF_COOKIE']
+        csrf = hashlib.sha256(csrf_token.encode()).hexdigest()[:12]
+        return f'{generations}-{request.user.pk}-{csrf}'
+
+    def last_modified(request, *args, **kwargs):
+        if replica_lagging() or request.user.is_authenticated:
+            return None
+        times = cache.get_many([f'{key}:modified' for key in keys])
+        if len(times) < len(keys):
+            return None
+        return datetime.fromtimestamp(max(times.values()), timezone.utc)
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
@@ -0,0 +1,134 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment, Follow, Group, Post, User, UserCounter
+
+
+def count_subquery(counted_model, field):
+    '''
+    Подзапрос: число строк counted_model, у которых field
+    ссылается на текущую запись внешнего запроса.
+    '''
+    counted = counted_model.objects.filter(
+        **{field: OuterRef('pk')}
+    ).order_by().values(field).annotate(count=Count('pk')).values('count')
+    return Coalesce(Subquery(counted), 0)
+
+
+def reconcile_counter(model, name, counted_model, field, dry_run=False):
+    '''
+    Исправляет счётчик name у записей model, разошедшийся с числом
+    строк counted_model. Возвращает число исправленных записей.
+    '''
+    actual = count_subquery(counted_model, field)
+    drifted = model.objects.annotate(actual=actual).exclude(
+        **{name: F('actual')}
+    )
+    if dry_run:
+        return drifted.count()
+    return model.objects.filter(
+        pk__in=drifted.values('pk')
+    ).update(**{name: actual})
+
+
+# Счётчик: (модель, поле счётчика, считаемая модель, поле связи)
+COUNTERS = (
+    (Group, 'post_count', Post, 'group'),
+    (Post, 'comment_count', Comment, 'post'),
+    (UserCounter, 'post_count', Post, 'author'),
+    (UserCounter, 'follower_count', Follow, 'author'),
+    (UserCounter, 'following_count', Follow, 'user'),
+)
+
+USER_COUNTERS = {
+    name: (counted_model, field)
+    for model, name, counted_model, field in COUNTERS
+    if model is UserCounter
+}
+
+
+def reconcile(dry_run=False):
+    '''
+    Пересчитывает все счётчики.
+    Возвращает словарь "модель.счётчик" -> число исправленных записей.
+    '''
+    missing = User.objects.filter(counters__isnull=True)
+    fixed = {'UserCounter.created': missing.count()}
+    if not dry_run:
+        UserCounter.objects.bulk_create(
+            (
+                UserCounter(user_id=user_id)
+                for user_id in missing.values_list('id', flat=True)
+            ),
+            batch_size=1000
+        )
+    for model, name, counted_model, field in COUNTERS:
+        fixed[f'{model.__name__}.{name}'] = reconcile_counter(
+            model, name, counted_model, field, dry_run
+        )
+    return fixed
+
+
+def add_counts(queryset, **deltas):
+    '''
+    Атомарно прибавляет deltas к счётчикам записей queryset.
+    Счётчик не опускается ниже нуля, даже если успел разойтись.
+    Возвращает число обновлённых записей.
+    '''
+    return queryset.update(**{
+        name: Greatest(F(name) + delta, 0)
+        for name, delta in deltas.items()
+    })
+
+
+def recount_user(user_id):
+    '''
+    Считает счётчики пользователя заново и сохраняет их.
+    '''
+    counts = {
+        name: counted_model.objects.filter(**{field: user_id}).count()
+        for name, (counted_model, field) in USER_COUNTERS.items()
+    }
+    counter, _ = UserCounter.objects.update_or_create(
+        user_id=user_id, defaults=counts
+    )
+    return counter
+
+
+def recount_follows(user_ids):
+    '''
+    Считает заново счётчики подписчиков и подписок пользователей
+    user_ids одним UPDATE с подзапросами, записи без счётчиков
+    создаются с точными значениями.
+    '''
+    user_ids = set(user_ids)
+    updated = UserCounter.objects.filter(user_id__in=user_ids).update(
+        follower_count=count_subquery(Follow, 'author'),
+        following_count=count_subquery(Follow, 'user'),
+    )
+    if updated < len(user_ids):
+        existing = UserCounter.objects.filter(
+            user_id__in=user_ids
+        ).values_list('user_id', flat=True)
+        for user_id in user_ids - set(existing):
+            recount_user(user_id)
+
+
+def add_user_counts(user_id, **deltas):
+    '''
+    Изменяет счётчики пользователя. Записи со счётчиками
+    не создаются: её нет у пользователя, удаляемого вместе со
+    счётчиками, а недостающие записи с точными значениями
+    создают get_user_counters и reconcile.
+    '''
+    add_counts(UserCounter.objects.filter(user_id=user_id), **deltas)
+
+
+def get_user_counters(user):
+    '''
+    Счётчики пользователя, при отсутствии считаются заново.
+    '''
+    try:
+        return user.counters
+    except UserCounter.DoesNotExist:
+        return recount_user(user.id)
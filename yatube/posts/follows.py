@@ -0,0 +1,84 @@
+'''
+Подписка и отписка сразу на нескольких авторов.
+
+Подписки вставляются одним INSERT с пропуском уже существующих
+(bulk_create(ignore_conflicts=True)), отписка - одним DELETE.
+Такие запросы не вызывают сигналы Follow, поэтому счётчики,
+подписки в кеше, поколение профилей и ленты подписок
+обновляются здесь.
+Ограничения unique_follow и user_is_not_author не нарушаются:
+подписка на себя отбрасывается заранее, а одновременная подписка
+на того же автора из другого запроса пропускается базой.
+'''
+from django.conf import settings
+from django.db import connection, transaction
+
+from . import timeline
+from .caching import PROFILE_GENERATION_KEY, bump_generation
+from .counters import recount_follows
+from .following import invalidate_following
+from .models import Follow
+
+
+def follow_authors(user, author_ids):
+    '''
+    user подписывается на авторов author_ids.
+    Возвращает id авторов, подписки на которых не было.
+    '''
+    author_ids = set(author_ids) - {user.id}
+    if not author_ids:
+        return set()
+    with transaction.atomic():
+        existing = Follow.objects.filter(
+            user=user, author_id__in=author_ids
+        ).values_list('author_id', flat=True)
+        new_ids = author_ids - set(existing)
+        if not new_ids:
+            return new_ids
+        Follow.objects.bulk_create(
+            [Follow(user=user, author_id=author_id)
+             for author_id in sorted(new_ids)],
+            ignore_conflicts=True
+        )
+        recount_follows({user.id, *new_ids})
+    invalidate_following((user.id,))
+    bump_generation(PROFILE_GENERATION_KEY)
+    if settings.FOLLOW_TIMELINE:
+        def backfill():
+            for author_id in new_ids:
+                timeline.backfill_author(user.id, author_id)
+        transaction.on_commit(backfill)
+    return new_ids
+
+
+def unfollow_authors(user, author_ids):
+    '''
+    user отписывается от авторов author_ids.
+    Возвращает число удалённых подписок.
+    '''
+    author_ids = set(author_ids)
+    if not author_ids:
+        return 0
+    with transaction.atomic():
+        # DELETE одним запросом: QuerySet.delete() заранее выбирает
+        # подписки для сигналов
+        table = connection.ops.quote_name(Follow._meta.db_table)
+        placeholders = ', '.join(['%s'] * len(author_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {table} '
+                f'WHERE user_id = %s AND author_id IN ({placeholders})',
+                (user.id, *author_ids)
+            )
+            deleted = cursor.rowcount
+        if deleted:
+            recount_follows({user.id, *author_ids})
+    if deleted:
+        invalidate_following((user.id,))
+        bump_generation(PROFILE_GENERATION_KEY)
+        if settings.FOLLOW_TIMELINE:
+            def prune():
+                for author_id in author_ids:
+                    timeline.prune_author(user.id, author_id)
+            transaction.on_commit(prune)
+    return deleted
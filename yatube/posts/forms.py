@@ -1,6 +1,10 @@
+import re
+
 from django import forms
+from django.conf import settings
 
 from .models import Post, Comment
+from .uploads import downsample, pixel_limit, too_many_pixels
 
 
 class PostForm(forms.ModelForm):
@@ -11,6 +15,21 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('text', 'group', 'image')
 
+    def __init__(self, *args, **kwargs):
+        '''
+        Файлы, отброшенные SizeLimitedUploadHandler из-за размера,
+        убираются из формы, ошибка о них выводится в clean.
+        '''
+        super().__init__(*args, **kwargs)
+        self.oversize_files = [
+            name for name, upload in self.files.items()
+            if getattr(upload, 'oversize', False)
+        ]
+        if self.oversize_files:
+            self.files = self.files.copy()
+            for name in self.oversize_files:
+                del self.files[name]
+
     def clean_text(self):
         '''
         Функция валидации поля text.
@@ -20,6 +39,32 @@ class PostForm(forms.ModelForm):
             raise forms.ValidationError('Это поле не заполнено!')
         return data
 
+    def clean_image(self):
+        '''
+        Функция валидации поля image.
+        Размер картинки проверяется по заголовку, до декодирования,
+        слишком большие картинки уменьшаются.
+        '''
+        data = self.cleaned_data['image']
+        if not data or not hasattr(data, 'image'):
+            return data
+        if too_many_pixels(data.image):
+            raise forms.ValidationError(
+                'Слишком большая картинка: больше '
+                f'{pixel_limit(data.image) // 1_000_000} Мп'
+            )
+        return downsample(data)
+
+    def clean(self):
+        '''
+        Ошибки о слишком больших файлах.
+        '''
+        cleaned_data = super().clean()
+        max_size = settings.UPLOAD_MAX_SIZE // (1024 * 1024)
+        for name in self.oversize_files:
+            self.add_error(name, f'Файл больше {max_size} МБ')
+        return cleaned_data
+
 
 class CommentForm(forms.ModelForm):
     '''
@@ -37,3 +82,28 @@ class CommentForm(forms.ModelForm):
         if not data:
             raise forms.ValidationError('Это поле не заполнено!')
         return data
+
+
+class FollowManyForm(forms.Form):
+    '''
+    Класс для формы подписки на нескольких авторов.
+    '''
+    usernames = forms.CharField(
+        widget=forms.Textarea,
+        label='Авторы',
+        help_text='Имена пользователей через пробел или запятую'
+    )
+
+    def clean_usernames(self):
+        '''
+        Список имён без повторов, не больше FOLLOW_MANY_MAX_AUTHORS.
+        '''
+        usernames = list(dict.fromkeys(
+            re.split(r'[\s,]+', self.cleaned_data['usernames'].strip())
+        ))
+        if len(usernames) > settings.FOLLOW_MANY_MAX_AUTHORS:
+            raise forms.ValidationError(
+                'Не больше %(limit)s авторов за раз',
+                params={'limit': settings.FOLLOW_MANY_MAX_AUTHORS}
+            )
+        return usernames
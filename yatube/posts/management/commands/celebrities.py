@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.models import User
+from posts.timeline import find_celebrities, refresh_celebrities
+
+
+class Command(BaseCommand):
+    '''
+    Выводит авторов, чьи посты подмешиваются в ленты подписок
+    при чтении, а не рассылаются при публикации.
+    '''
+    help = (
+        'Показывает авторов-знаменитостей ленты подписок '
+        '(FOLLOW_TIMELINE_CELEBRITY_THRESHOLD)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threshold', type=int,
+            help='Порог числа подписчиков вместо значения из настроек'
+        )
+        parser.add_argument(
+            '--refresh', action='store_true',
+            help='Обновить закешированное множество знаменитостей'
+        )
+
+    def handle(self, *args, **options):
+        threshold = options['threshold']
+        if threshold is None:
+            threshold = settings.FOLLOW_TIMELINE_CELEBRITY_THRESHOLD
+        if threshold is None:
+            raise CommandError(
+                'Гибридный режим выключен: '
+                'FOLLOW_TIMELINE_CELEBRITY_THRESHOLD = None'
+            )
+        celebrities = list(find_celebrities(threshold))
+        usernames = User.objects.in_bulk(
+            [author_id for author_id, _ in celebrities]
+        )
+        for author_id, followers in celebrities:
+            self.stdout.write(
+                f'{usernames[author_id].username}\t{followers}'
+            )
+        self.stdout.write(
+            f'Знаменитостей: {len(celebrities)} (порог {threshold})'
+        )
+        if options['refresh']:
+            refresh_celebrities(threshold)
@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand
+
+from posts.caching import invalidate_post_cards
+from posts.models import Post
+from posts.storage import (
+    delete_image, image_references, post_image_storage
+)
+
+
+class Command(BaseCommand):
+    '''
+    Переносит картинки постов, загруженные до хранения по содержимому,
+    под имена по хешу. Одинаковые картинки сводятся к одному файлу,
+    посты переключаются на него, а прежние файлы с миниатюрами
+    и вариантами удаляются.
+    '''
+    help = 'Объединяет одинаковые картинки постов в один файл'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, что будет сделано'
+        )
+
+    def dedupe(self, name, dry_run):
+        '''
+        Переносит одну картинку. Возвращает новое имя и размер
+        освобождённого места или None, если файла нет.
+        '''
+        if not post_image_storage.exists(name):
+            self.stderr.write(f'{name}\tфайл не найден')
+            return None
+        size = post_image_storage.size(name)
+        with post_image_storage.open(name) as image_file:
+            target = post_image_storage.content_name(name, image_file)
+            duplicate = post_image_storage.exists(target)
+            if dry_run:
+                return target, size if duplicate else 0
+            post_image_storage.save(name, image_file)
+        widths = image_references(target).exclude(
+            image_widths=''
+        ).values_list('image_widths', flat=True).first() or ''
+        posts = Post.objects.filter(image=name)
+        post_ids = list(posts.values_list('id', flat=True))
+        posts.update(image=target, image_widths=widths)
+        invalidate_post_cards(post_ids)
+        delete_image(name)
+        return target, size if duplicate else 0
+
+    def handle(self, *args, **options):
+        names = Post.objects.exclude(image='').order_by().values_list(
+            'image', flat=True
+        ).distinct()
+        moved = merged = freed = 0
+        for name in list(names):
+            if post_image_storage.is_content_addressed(name):
+                continue
+            result = self.dedupe(name, options['dry_run'])
+            if result is None:
+                continue
+            target, released = result
+            self.stdout.write(f'{name}\t{target}')
+            if released:
+                merged += 1
+                freed += released
+            else:
+                moved += 1
+        self.stdout.write(
+            f'Перенесено: {moved}, '
+            f'объединено с одинаковыми: {merged}, '
+            f'освобождено: {freed / 1024 / 1024:.1f} МБ'
+        )
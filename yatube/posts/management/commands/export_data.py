@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from posts.transfer import (
+    FORMATS, MODELS, Checkpoint, export_rows, open_export
+)
+
+
+class Command(BaseCommand):
+    '''
+    Потоково выгружает посты, комментарии или подписки в NDJSON
+    или CSV. С контрольной точкой прерванная выгрузка продолжается
+    в том же файле с конца последней записанной пачки.
+    '''
+    help = 'Выгружает посты, комментарии или подписки в файл'
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=MODELS)
+        parser.add_argument('path', help='Файл выгрузки')
+        parser.add_argument('--format', choices=FORMATS, default='ndjson')
+        parser.add_argument(
+            '--batch-size', type=int, default=2000,
+            help='Сколько записей читать из БД за один запрос'
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл с id последней выгруженной записи и размером файла'
+        )
+
+    def handle(self, *args, **options):
+        checkpoint = Checkpoint(options['checkpoint'])
+        with open_export(options['path'], checkpoint) as stream:
+            count = export_rows(
+                options['model'], stream, options['format'],
+                options['batch_size'], checkpoint
+            )
+        self.stdout.write(f'Выгружено записей: {count}')
@@ -0,0 +1,52 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from posts.caching import (
+    PROFILE_GENERATION_KEY, bump_feed_generation, bump_generation
+)
+from posts.counters import reconcile
+from posts.following import invalidate_all_following
+from posts.transfer import FORMATS, MODELS, Checkpoint, import_records
+
+
+class Command(BaseCommand):
+    '''
+    Потоково загружает посты, комментарии или подписки из NDJSON
+    или CSV, сохраняя id и даты. bulk_create не вызывает сигналы,
+    поэтому после загрузки пересчитываются счётчики, для постов
+    перестраивается поисковый индекс, для подписок сбрасываются
+    подписки пользователей в кеше и профили, сбрасываются страницы лент.
+    '''
+    help = 'Загружает посты, комментарии или подписки из файла'
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=MODELS)
+        parser.add_argument('path', help='Файл выгрузки')
+        parser.add_argument('--format', choices=FORMATS, default='ndjson')
+        parser.add_argument(
+            '--batch-size', type=int, default=2000,
+            help='Сколько записей вставлять за один запрос'
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл с числом уже загруженных строк'
+        )
+
+    def handle(self, *args, **options):
+        checkpoint = Checkpoint(options['checkpoint'])
+        with open(options['path'], newline='', encoding='utf-8') as stream:
+            count = import_records(
+                options['model'], stream, options['format'],
+                options['batch_size'], checkpoint
+            )
+        self.stdout.write(f'Загружено записей: {count}')
+        reconcile()
+        if options['model'] == 'post':
+            call_command(
+                'rebuild_search_index', batch_size=options['batch_size'],
+                stdout=self.stdout
+            )
+        if options['model'] == 'follow':
+            invalidate_all_following()
+            bump_generation(PROFILE_GENERATION_KEY)
+        bump_feed_generation()
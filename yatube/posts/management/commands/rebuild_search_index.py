@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.search import rebuild_index
+
+
+class Command(BaseCommand):
+    '''
+    Строит поисковый индекс постов заново: после массовой загрузки
+    или изменения постов в обход сигналов.
+    '''
+    help = 'Строит заново полнотекстовый индекс постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько постов добавлять в индекс за один запрос'
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = rebuild_index(batch_size=options['batch_size'])
+        self.stdout.write(f'Проиндексировано постов: {count}')
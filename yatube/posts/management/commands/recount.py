@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import reconcile
+
+
+class Command(BaseCommand):
+    '''
+    Пересчитывает денормализованные счётчики постов,
+    комментариев и подписок.
+    '''
+    help = 'Исправляет разошедшиеся счётчики постов, комментариев и подписок'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать число разошедшихся счётчиков'
+        )
+
+    def handle(self, *args, **options):
+        fixed = reconcile(dry_run=options['dry_run'])
+        for counter, count in fixed.items():
+            self.stdout.write(f'{counter}\t{count}')
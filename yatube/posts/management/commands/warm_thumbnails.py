@@ -0,0 +1,87 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from sorl.thumbnail import default
+
+from posts.models import Post
+from posts.thumbnails import (
+    POST_THUMBNAIL_GEOMETRY, POST_THUMBNAIL_OPTIONS, deferred_feed_bump,
+    generate_variants
+)
+
+CREATED = 'created'
+SKIPPED = 'skipped'
+FAILED = 'failed'
+
+
+class Command(BaseCommand):
+    '''
+    Создаёт недостающие миниатюры и варианты картинок уже
+    опубликованных постов, чтобы страницы не выводили заглушки.
+    '''
+    help = 'Создаёт миниатюры и варианты картинок существующих постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Число потоков, создающих миниатюры'
+        )
+
+    def warm(self, image):
+        '''
+        Создаёт миниатюру и варианты одной картинки, если их ещё нет.
+        '''
+        name, widths = image
+        backend = default.backend
+        thumbnail = backend.get_ready_thumbnail(
+            name, POST_THUMBNAIL_GEOMETRY, **POST_THUMBNAIL_OPTIONS
+        )
+        if thumbnail and widths:
+            return SKIPPED
+        try:
+            if not thumbnail:
+                backend.generate(
+                    name, POST_THUMBNAIL_GEOMETRY, POST_THUMBNAIL_OPTIONS
+                )
+            if not widths:
+                generate_variants(name)
+        except Exception as error:
+            self.stderr.write(f'{name}\t{error}')
+            return FAILED
+        if not backend.get_ready_thumbnail(
+            name, POST_THUMBNAIL_GEOMETRY, **POST_THUMBNAIL_OPTIONS
+        ):
+            self.stderr.write(f'{name}\tкартинка не прочитана')
+            return FAILED
+        return CREATED
+
+    def warm_in_worker(self, image):
+        '''
+        Создание миниатюры в потоке пула.
+        '''
+        try:
+            return self.warm(image)
+        finally:
+            connections.close_all()
+
+    def handle(self, *args, **options):
+        images = Post.objects.exclude(image='').order_by().values_list(
+            'image', 'image_widths'
+        ).distinct().iterator()
+        results = {CREATED: 0, SKIPPED: 0, FAILED: 0}
+        with deferred_feed_bump():
+            if options['workers'] > 1:
+                with ThreadPoolExecutor(options['workers']) as executor:
+                    for status in executor.map(
+                        self.warm_in_worker, images
+                    ):
+                        results[status] += 1
+            else:
+                for image in images:
+                    results[self.warm(image)] += 1
+        self.stdout.write(
+            f'Создано: {results[CREATED]}, '
+            f'уже были: {results[SKIPPED]}, '
+            f'с ошибкой: {results[FAILED]}'
+        )
@@ -0,0 +1,75 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:52
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def fill_counters(apps, schema_editor):
+    '''
+    Заполняем счётчики по существующим данным.
+    '''
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    Group = apps.get_model('posts', 'Group')
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    UserCounter = apps.get_model('posts', 'UserCounter')
+    UserCounter.objects.bulk_create(
+        (
+            UserCounter(user_id=user_id)
+            for user_id in User.objects.values_list('id', flat=True)
+        ),
+        batch_size=1000
+    )
+    counters = (
+        (Group, 'post_count', Post, 'group'),
+        (Post, 'comment_count', Comment, 'post'),
+        (UserCounter, 'post_count', Post, 'author'),
+        (UserCounter, 'follower_count', Follow, 'author'),
+        (UserCounter, 'following_count', Follow, 'user'),
+    )
+    for model, name, counted_model, field in counters:
+        counted = counted_model.objects.filter(
+            **{field: OuterRef('pk')}
+        ).order_by().values(field).annotate(
+            count=Count('pk')
+        ).values('count')
+        model.objects.update(**{name: Coalesce(Subquery(counted), 0)})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0016_auto_20211206_1216'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserCounter',
+            fields=[
+                ('user', models.OneToOneField(help_text='Пользователь', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='counters', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('post_count', models.PositiveIntegerField(default=0, help_text='Число постов пользователя', verbose_name='Число постов')),
+                ('follower_count', models.PositiveIntegerField(default=0, help_text='Число подписчиков пользователя', verbose_name='Число подписчиков')),
+                ('following_count', models.PositiveIntegerField(default=0, help_text='Число авторов, на которых подписан пользователь', verbose_name='Число подписок')),
+            ],
+            options={
+                'verbose_name': 'Счётчики пользователя',
+                'verbose_name_plural': 'Счётчики пользователей',
+            },
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='post_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Число постов группы', verbose_name='Число постов'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Число комментариев к посту', verbose_name='Число комментариев'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
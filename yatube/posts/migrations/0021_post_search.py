@@ -0,0 +1,47 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:10
+
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    '''
+    Создаём поисковый индекс. В SQLite таблица создаётся пустой:
+    существующие посты добавляет в неё пачками команда
+    rebuild_search_index - миграция не зависит от текущего
+    кода стеммера.
+    '''
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX post_text_search_idx ON posts_post '
+            "USING gin (to_tsvector('russian', text))"
+        )
+        return
+    if connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        'CREATE VIRTUAL TABLE posts_post_search USING fts5('
+        "body, tokenize = 'unicode61 remove_diacritics 0')"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    '''
+    Удаляем поисковый индекс.
+    '''
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX post_text_search_idx')
+    elif connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE posts_post_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_content_addressed_images'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -1,11 +1,39 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 
+from .storage import post_image_storage
+
 
 User = get_user_model()
 
 
-class Group(models.Model):
+class CountedModel(models.Model):
+    '''
+    Класс CountedModel.
+    Модель с денормализованными счётчиками: их меняют только
+    атомарные UPDATE, а сохранение существующей записи не перезаписывает
+    поля counter_fields устаревшими значениями.
+    '''
+    counter_fields = ()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        '''
+        Счётчики обновляются в одной транзакции с записью.
+        '''
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+            ]
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+
+class Group(CountedModel):
     '''
     Класс Group.
     '''
@@ -24,6 +52,14 @@ class Group(models.Model):
         verbose_name='Описание группы',
         help_text='Краткое описание группы'
     )
+    post_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Число постов',
+        help_text='Число постов группы'
+    )
+
+    counter_fields = ('post_count',)
 
     class Meta:
         verbose_name = 'Группа'
@@ -36,7 +72,35 @@ class Group(models.Model):
         return self.title
 
 
-class Post(models.Model):
+class PostQuerySet(models.QuerySet):
+    '''
+    Класс PostQuerySet.
+    Общие запросы к постам для лент.
+    '''
+    FEED_FIELDS = (
+        'id',
+        'text',
+        'pub_date',
+        'image',
+        'image_widths',
+        'author__username',
+        'author__first_name',
+        'author__last_name',
+        'group__slug',
+    )
+
+    def for_feed(self):
+        '''
+        Посты для ленты: автор и группа подтягиваются одним JOIN,
+        выбираются только поля, которые выводит
+        posts/includes/post_list.html.
+        '''
+        return self.select_related('author', 'group').only(
+            *self.FEED_FIELDS
+        )
+
+
+class Post(CountedModel):
     '''
     Класс Post.
     '''
@@ -69,13 +133,40 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=post_image_storage,
         blank=True
     )
+    image_widths = models.CharField(
+        max_length=64,
+        blank=True,
+        editable=False,
+        verbose_name='Ширины вариантов картинки',
+        help_text='Ширины готовых вариантов картинки через запятую'
+    )
+    comment_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Число комментариев',
+        help_text='Число комментариев к посту'
+    )
+
+    objects = PostQuerySet.as_manager()
+    counter_fields = ('comment_count',)
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = (
+            models.Index(
+                fields=('group', '-pub_date', '-id'),
+                name='post_group_pub_date_idx'
+            ),
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='post_author_pub_date_idx'
+            ),
+        )
 
     def __str__(self):
         '''
@@ -84,6 +175,16 @@ class Post(models.Model):
         '''
         return self.text[:15]
 
+    @property
+    def variant_widths(self):
+        '''
+        Ширины готовых вариантов картинки.
+        '''
+        return [
+            int(width) for width in self.image_widths.split(',')
+            if width.isdigit()
+        ]
+
 
 class Comment(models.Model):
     '''
@@ -121,6 +222,12 @@ class Comment(models.Model):
         ordering = ('-created',)
         verbose_name = 'Коментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = (
+            models.Index(
+                fields=('post', '-created', '-id'),
+                name='comment_post_created_idx'
+            ),
+        )
 
     def __str__(self):
         '''
@@ -129,6 +236,14 @@ class Comment(models.Model):
         '''
         return self.text[:15]
 
+    def save(self, *args, **kwargs):
+        '''
+        Счётчик комментариев поста обновляется в одной транзакции
+        с комментарием.
+        '''
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
 
 class Follow(models.Model):
     '''
@@ -156,6 +271,14 @@ class Follow(models.Model):
     class Meta:
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
+        # Поиск по (user, author) покрывает unique_follow,
+        # подписчиков автора выбирают по (author, user).
+        indexes = (
+            models.Index(
+                fields=('author', 'user'),
+                name='follow_author_user_idx'
+            ),
+        )
         constraints = (
             models.UniqueConstraint(
                 fields=('user', 'author'),
@@ -175,3 +298,50 @@ class Follow(models.Model):
         user = self.user.username
         author = self.author.username
         return f'{user}: {author}'
+
+    def save(self, *args, **kwargs):
+        '''
+        Счётчики подписок обновляются в одной транзакции с подпиской.
+        '''
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+
+class UserCounter(models.Model):
+    '''
+    Класс UserCounter.
+    Денормализованные счётчики пользователя.
+    '''
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counters',
+        verbose_name='Пользователь',
+        help_text='Пользователь'
+    )
+    post_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Число постов',
+        help_text='Число постов пользователя'
+    )
+    follower_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Число подписчиков',
+        help_text='Число подписчиков пользователя'
+    )
+    following_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Число подписок',
+        help_text='Число авторов, на которых подписан пользователь'
+    )
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+    def __str__(self):
+        '''
+        При обращении к экземпляру возвращаем id пользователя.
+        '''
+        return f'{self.user_id}'
@@ -0,0 +1,412 @@
+import base64
+import json
+from collections.abc import Sequence
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import EmptyPage, Page, Paginator
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+
+from core.routers import cache_timeout
+
+POST_CURSOR_ORDERING = ('-pub_date', '-id')
+COMMENT_CURSOR_ORDERING = ('-created', '-id')
+
+CURSOR_NEXT = 'n'
+CURSOR_PREVIOUS = 'p'
+
+
+class CursorPage(Sequence):
+    '''
+    Страница курсорного пагинатора.
+    Запрос в БД выполняется только при первом обращении к странице.
+    '''
+    is_cursor = True
+
+    def __init__(self, paginator, cursor):
+        self.paginator = paginator
+        self.cursor = cursor
+        self._object_list = None
+        self._has_next = False
+        self._has_previous = False
+
+    def __repr__(self):
+        return f'<Cursor page {self.cursor or "first"}>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    @property
+    def object_list(self):
+        '''
+        Записи страницы, выбранные по ключу из курсора.
+        '''
+        if self._object_list is None:
+            self._fetch()
+        return self._object_list
+
+    def _fetch(self):
+        paginator = self.paginator
+        direction, values = paginator.decode_cursor(self.cursor)
+        queryset = paginator.object_list.order_by(*paginator.ordering)
+        if values is not None:
+            queryset = queryset.filter(
+                paginator.keyset_filter(values, direction)
+            )
+        if direction == CURSOR_PREVIOUS:
+            queryset = queryset.reverse()
+        rows = list(queryset[:paginator.per_page + 1])
+        has_more = len(rows) > paginator.per_page
+        rows = rows[:paginator.per_page]
+        if direction == CURSOR_PREVIOUS:
+            rows.reverse()
+            self._has_previous = has_more
+            self._has_next = True
+        else:
+            self._has_next = has_more
+            self._has_previous = values is not None
+        self._object_list = rows
+
+    def has_next(self):
+        return bool(self.object_list) and self._has_next
+
+    def has_previous(self):
+        return bool(self.object_list) and self._has_previous
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    @property
+    def next_cursor(self):
+        '''
+        Курсор следующей страницы или None.
+        '''
+        if not self.has_next():
+            return None
+        return self.paginator.encode_cursor(
+            CURSOR_NEXT, self._object_list[-1]
+        )
+
+    @property
+    def previous_cursor(self):
+        '''
+        Курсор предыдущей страницы или None.
+        '''
+        if not self.has_previous():
+            return None
+        return self.paginator.encode_cursor(
+            CURSOR_PREVIOUS, self._object_list[0]
+        )
+
+
+class CursorPaginator:
+    '''
+    Пагинатор по ключу (keyset pagination).
+    Вместо COUNT(*) и OFFSET выбирает записи, лежащие в порядке
+    сортировки после (или перед) записью, зашитой в курсор.
+    Сортировка должна однозначно упорядочивать записи,
+    поэтому последним полем в ordering идёт первичный ключ.
+    '''
+    def __init__(self, object_list, per_page, ordering=POST_CURSOR_ORDERING):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.fields = tuple(name.lstrip('-') for name in self.ordering)
+
+    def get_page(self, cursor=None):
+        '''
+        Возвращает страницу по курсору.
+        Пустой или испорченный курсор означает первую страницу.
+        '''
+        return CursorPage(self, cursor)
+
+    def encode_cursor(self, direction, obj):
+        '''
+        Кодирует позицию записи obj в непрозрачную строку.
+        '''
+        model = self.object_list.model
+        values = [
+            model._meta.get_field(name).value_to_string(obj)
+            for name in self.fields
+        ]
+        raw = json.dumps([direction, values], separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        '''
+        Раскодирует курсор в пару (направление, значения полей).
+        Для первой страницы возвращает (CURSOR_NEXT, None).
+        '''
+        if not cursor:
+            return CURSOR_NEXT, None
+        model = self.object_list.model
+        try:
+            padding = '=' * (-len(cursor) % 4)
+            raw = base64.urlsafe_b64decode(cursor + padding)
+            direction, values = json.loads(raw.decode())
+            if (
+                direction not in (CURSOR_NEXT, CURSOR_PREVIOUS)
+                or len(values) != len(self.fields)
+            ):
+                return CURSOR_NEXT, None
+            values = [
+                model._meta.get_field(name).to_python(value)
+                for name, value in zip(self.fields, values)
+            ]
+        except (ValueError, TypeError, ValidationError):
+            return CURSOR_NEXT, None
+        if any(value is None for value in values):
+            return CURSOR_NEXT, None
+        return direction, values
+
+    def keyset_filter(self, values, direction):
+        '''
+        Строит условие "запись лежит после курсора" для
+        лексикографического сравнения по полям сортировки.
+        '''
+        condition = Q()
+        equal = {}
+        for name, value in zip(self.ordering, values):
+            field = name.lstrip('-')
+            descending = name.startswith('-')
+            if direction == CURSOR_PREVIOUS:
+                descending = not descending
+            lookup = 'lt' if descending else 'gt'
+            condition |= Q(**equal, **{f'{field}__{lookup}': value})
+            equal[field] = value
+        return condition
+
+
+class CountedPaginator(Paginator):
+    '''
+    Paginator с заранее известным числом записей
+    (из денормализованных счётчиков) вместо SELECT COUNT(*).
+    '''
+    def __init__(self, object_list, per_page, count, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.known_count = count
+
+    @cached_property
+    def count(self):
+        return self.known_count
+
+
+def estimate_count(model, using='default'):
+    '''
+    Число строк таблицы модели по статистике планировщика
+    или None, если статистики нет.
+    PostgreSQL хранит его в pg_class.reltuples (обновляют
+    VACUUM, ANALYZE и autovacuum), SQLite - в sqlite_stat1
+    после ANALYZE.
+    '''
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class '
+                'WHERE oid = %s::regclass', (table,)
+            )
+        elif connection.vendor == 'sqlite':
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'"
+            )
+            if cursor.fetchone() is None:
+                return None
+            cursor.execute(
+                'SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1',
+                (table,)
+            )
+        else:
+            return None
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    estimate = int(str(row[0]).split()[0])
+    return estimate if estimate > 0 else None
+
+
+class EstimatedPage(Page):
+    '''
+    Страница пагинатора с приблизительным числом записей: есть ли
+    следующая страница, известно по выборке на одну запись больше.
+    '''
+    def __init__(self, object_list, number, paginator, has_next):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+
+    def has_next(self):
+        return self._has_next
+
+
+class EstimatedCountPaginator(Paginator):
+    '''
+    Paginator, который для запроса по всей таблице без фильтров
+    берёт число строк из статистики планировщика, если таблица
+    больше ESTIMATED_COUNT_THRESHOLD строк: точный COUNT(*)
+    по такой таблице обходит её целиком.
+    Для запросов с фильтрами и небольших таблиц число точное.
+    Приблизительное число влияет только на ссылки на страницы:
+    страница выбирается на запись больше, чем выводится, и по ней
+    видно, есть ли следующая, а номера за оценкой не отбрасываются.
+    '''
+    estimated = False
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if isinstance(queryset, QuerySet) and not queryset.query.where:
+            estimate = estimate_count(queryset.model, queryset.db)
+            if (
+                estimate is not None
+                and estimate > settings.ESTIMATED_COUNT_THRESHOLD
+            ):
+                self.estimated = True
+                return estimate
+        return super().count
+
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            if not self.estimated or int(number) < 1:
+                raise
+            return int(number)
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if not self.estimated:
+            return super().page(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage('На странице нет записей')
+        return EstimatedPage(
+            rows[:self.per_page], number, self, len(rows) > self.per_page
+        )
+
+    def get_page(self, number):
+        try:
+            return super().get_page(number)
+        except EmptyPage:
+            return self.page(1)
+
+
+class CachedCountPaginator(EstimatedCountPaginator):
+    '''
+    EstimatedCountPaginator, который хранит число записей в кеше
+    под ключом count_key PAGINATOR_COUNT_TIMEOUT секунд: статистика
+    большой ленты перечитывается раз в несколько минут, а не
+    на каждый запрос.
+    Для ленты не больше ESTIMATED_COUNT_THRESHOLD записей в кеше
+    лежит 0, и число считается точно, как у обычного Paginator.
+    Число из кеша, как и оценка, считается приблизительным.
+    '''
+    def __init__(self, object_list, per_page, count_key, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_key = count_key
+
+    @cached_property
+    def count(self):
+        threshold = settings.ESTIMATED_COUNT_THRESHOLD
+        count = cache.get(self.count_key)
+        if count is None:
+            count = super().count
+            cache.set(
+                self.count_key, count if count > threshold else 0,
+                cache_timeout(settings.PAGINATOR_COUNT_TIMEOUT)
+            )
+            return count
+        if count > threshold:
+            self.estimated = True
+            return count
+        return super(EstimatedCountPaginator, self).count
+
+
+PAGE_ELLIPSIS = '…'
+
+
+def elided_page_range(number, num_pages, on_each_side, on_ends):
+    '''
+    Номера страниц для ссылок пагинатора: on_ends первых и последних
+    страниц, on_each_side страниц по обе стороны от текущей number
+    и PAGE_ELLIPSIS на месте пропущенных (пропуск в одну страницу
+    выводится её номером). Номера собираются объединением этих
+    трёх диапазонов, поэтому не повторяются. Длина списка не больше
+    2 * (on_each_side + on_ends) + 3 и не зависит от num_pages.
+    '''
+    number = min(max(number, 1), num_pages)
+    if num_pages <= 2 * (on_each_side + on_ends) + 1:
+        return list(range(1, num_pages + 1))
+    shown = sorted({
+        *range(1, on_ends + 1),
+        *range(
+            max(number - on_each_side, 1),
+            min(number + on_each_side, num_pages) + 1
+        ),
+        *range(num_pages - on_ends + 1, num_pages + 1),
+    })
+    pages = []
+    previous = 0
+    for page in shown:
+        if page - previous == 2:
+            pages.append(page - 1)
+        elif page - previous > 2:
+            pages.append(PAGE_ELLIPSIS)
+        pages.append(page)
+        previous = page
+    if num_pages - previous == 1:
+        pages.append(num_pages)
+    elif num_pages - previous > 1:
+        pages.append(PAGE_ELLIPSIS)
+    return pages
+
+
+def paginate(
+    request, object_list, ordering=POST_CURSOR_ORDERING, count=None,
+    count_key=None
+):
+    '''
+    Возвращает страницу ленты для запроса.
+    При CURSOR_PAGINATION = True запросы к БД разбиваются курсорным
+    пагинатором (параметр ?cursor=), иначе и для готовых списков
+    используется обычный Paginator (параметр ?page=).
+    Известное число записей count избавляет Paginator от COUNT(*),
+    а count_key - ключ кеша, в котором хранится число записей
+    большой ленты (CachedCountPaginator).
+    '''
+    if settings.CURSOR_PAGINATION and isinstance(object_list, QuerySet):
+        paginator = CursorPaginator(
+            object_list, settings.COUNT_OF_PAGE_POST, ordering
+        )
+        return paginator.get_page(request.GET.get('cursor'))
+    if count is None and count_key is not None:
+        paginator = CachedCountPaginator(
+            object_list, settings.COUNT_OF_PAGE_POST, count_key
+        )
+    elif count is None:
+        paginator = Paginator(object_list, settings.COUNT_OF_PAGE_POST)
+    else:
+        paginator = CountedPaginator(
+            object_list, settings.COUNT_OF_PAGE_POST, count
+        )
+    return paginator.get_page(request.GET.get('page'))
+
+
+def paginate_comments(request, object_list):
+    '''
+    Возвращает страницу комментариев к посту.
+    Комментарии всегда разбиваются курсорным пагинатором:
+    у популярного поста их десятки тысяч, и OFFSET до последних
+    страниц обходил бы их все.
+    '''
+    paginator = CursorPaginator(
+        object_list, settings.COUNT_OF_PAGE_COMMENT, COMMENT_CURSOR_ORDERING
+    )
+    return paginator.get_page(request.GET.get('cursor'))
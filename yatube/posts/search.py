@@ -0,0 +1,179 @@
+'''
+Полнотекстовый поиск по постам.
+
+В SQLite индекс - виртуальная таблица FTS5 posts_post_search:
+rowid - id поста, body - основы слов текста (posts.stemmer).
+Таблицу ведут сигналы сохранения и удаления постов, а команда
+rebuild_search_index строит её заново. Результаты упорядочиваются
+по bm25.
+В PostgreSQL используется встроенный русский словарь и GIN-индекс
+по to_tsvector('russian', text) из миграции 0021_post_search,
+результаты упорядочиваются по ts_rank.
+'''
+import re
+
+from django.conf import settings
+from django.db import connection
+
+from .models import Post
+from .stemmer import stem
+
+SEARCH_TABLE = 'posts_post_search'
+
+WORD = re.compile(r'\w+')
+
+
+def stems(text):
+    '''
+    Основы слов текста text.
+    '''
+    return [stem(word) for word in WORD.findall(text)]
+
+
+def uses_fts():
+    '''
+    Индекс ведёт сам проект (SQLite FTS5).
+    '''
+    return connection.vendor == 'sqlite'
+
+
+def index_post(post):
+    '''
+    Добавляет пост в индекс или обновляет его.
+    '''
+    if not uses_fts():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', (post.pk,)
+        )
+        cursor.execute(
+            f'INSERT INTO {SEARCH_TABLE} (rowid, body) VALUES (%s, %s)',
+            (post.pk, ' '.join(stems(post.text)))
+        )
+
+
+def remove_post(post_id):
+    '''
+    Убирает пост из индекса.
+    '''
+    if not uses_fts():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', (post_id,)
+        )
+
+
+def rebuild_index(batch_size=1000):
+    '''
+    Строит индекс заново по всем постам.
+    Возвращает число проиндексированных постов.
+    '''
+    if not uses_fts():
+        return Post.objects.count()
+    count = 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+        rows = []
+        posts = Post.objects.order_by().values_list('id', 'text')
+        for post_id, text in posts.iterator(chunk_size=batch_size):
+            rows.append((post_id, ' '.join(stems(text))))
+            if len(rows) == batch_size:
+                count += _insert(cursor, rows)
+                rows = []
+        count += _insert(cursor, rows)
+    return count
+
+
+def _insert(cursor, rows):
+    '''
+    Добавляет в индекс пачку строк (id поста, основы слов).
+    '''
+    cursor.executemany(
+        f'INSERT INTO {SEARCH_TABLE} (rowid, body) VALUES (%s, %s)', rows
+    )
+    return len(rows)
+
+
+def match_query(terms):
+    '''
+    Выражение FTS5 MATCH: все основы слов terms.
+    '''
+    return ' '.join(f'"{term}"' for term in terms)
+
+
+def filter_posts(queryset, query):
+    '''
+    Посты queryset, подходящие под запрос query, без ограничения
+    SEARCH_MAX_RESULTS: условие поиска добавляется в SQL запроса.
+    '''
+    terms = stems(query)
+    if not terms:
+        return queryset.none()
+    table = Post._meta.db_table
+    if uses_fts():
+        return queryset.extra(
+            where=[
+                f'{table}.id IN (SELECT rowid FROM {SEARCH_TABLE} '
+                f'WHERE {SEARCH_TABLE} MATCH %s)'
+            ],
+            params=[match_query(terms)]
+        )
+    return queryset.extra(
+        where=[
+            f"to_tsvector('russian', {table}.text) "
+            "@@ plainto_tsquery('russian', %s)"
+        ],
+        params=[query]
+    )
+
+
+def search_ids(query):
+    '''
+    id постов, подходящих под запрос query, от самых релевантных.
+    Пост подходит, если в нём есть все слова запроса в любой форме.
+    Выдаётся не больше SEARCH_MAX_RESULTS постов.
+    '''
+    terms = stems(query)
+    if not terms:
+        return []
+    limit = settings.SEARCH_MAX_RESULTS
+    with connection.cursor() as cursor:
+        if uses_fts():
+            cursor.execute(
+                f'SELECT rowid FROM {SEARCH_TABLE} '
+                f'WHERE {SEARCH_TABLE} MATCH %s '
+                f'ORDER BY bm25({SEARCH_TABLE}), rowid DESC LIMIT %s',
+                (match_query(terms), limit)
+            )
+        else:
+            cursor.execute(
+                'SELECT id FROM posts_post '
+                "WHERE to_tsvector('russian', text) "
+                "@@ plainto_tsquery('russian', %s) "
+                "ORDER BY ts_rank(to_tsvector('russian', text), "
+                "plainto_tsquery('russian', %s)) DESC, id DESC LIMIT %s",
+                (query, query, limit)
+            )
+        return [row[0] for row in cursor.fetchall()]
+
+
+class SearchResults:
+    '''
+    Результаты поиска для Paginator.
+    id найденных постов выбираются из индекса одним запросом,
+    посты страницы - по id.
+    '''
+    def __init__(self, query):
+        self.post_ids = search_ids(query)
+
+    def __len__(self):
+        return len(self.post_ids)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        post_ids = self.post_ids[index]
+        posts = Post.objects.for_feed().in_bulk(post_ids)
+        return [posts[post_id] for post_id in post_ids if post_id in posts]
@@ -0,0 +1,308 @@
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save
+)
+from django.dispatch import receiver
+
+from . import search, timeline
+from .caching import (
+    PROFILE_GENERATION_KEY, bump_feed_generation, bump_generation,
+    invalidate_post_cards, invalidate_post_comments
+)
+from .counters import add_counts, add_user_counts
+from .following import invalidate_following
+from .models import Comment, Follow, Group, Post, User, UserCounter
+from .storage import release_image
+
+# Посты и пользователи, удаляемые сейчас в этом потоке. Для строк,
+# удаляемых каскадом вместе с ними, счётчики и кеш родителя
+# не обновляются: родитель удаляется следом
+_deleting = threading.local()
+
+
+def deleting():
+    '''
+    Множество (модель, pk) удаляемых родителей.
+    '''
+    if not hasattr(_deleting, 'parents'):
+        _deleting.parents = set()
+    return _deleting.parents
+
+
+def is_deleting(model, pk):
+    '''
+    Удаляется ли сейчас запись model с первичным ключом pk.
+    '''
+    return (model, pk) in deleting()
+
+
+@receiver(pre_delete, sender=Post)
+@receiver(pre_delete, sender=User)
+def parent_deleting(sender, instance, **kwargs):
+    '''
+    Collector рассылает pre_delete всех записей до удаления,
+    а post_delete родителя - после удаления зависимых строк.
+    '''
+    deleting().add((sender, instance.pk))
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    '''
+    Сбрасывается карточка поста, новый пост рассылается
+    в ленты подписчиков.
+    '''
+    invalidate_post_cards((instance.id,))
+    if created and settings.FOLLOW_TIMELINE:
+        # Подписчики читают ленту из кеша, а посты - из БД: пост
+        # рассылается после фиксации, когда он уже виден другим
+        transaction.on_commit(lambda: timeline.push_post(instance))
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    '''
+    Удалённый пост убирается из кеша и лент подписчиков.
+    '''
+    invalidate_post_cards((instance.id,))
+    invalidate_post_comments((instance.id,))
+    if settings.FOLLOW_TIMELINE:
+        post_id, author_id = instance.pk, instance.author_id
+        transaction.on_commit(
+            lambda: timeline.remove_post(post_id, author_id)
+        )
+
+
+@receiver(post_save, sender=Post)
+def post_indexed(sender, instance, **kwargs):
+    '''
+    Текст поста попадает в поисковый индекс.
+    '''
+    search.index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_unindexed(sender, instance, **kwargs):
+    '''
+    Удалённый пост убирается из поискового индекса.
+    '''
+    search.remove_post(instance.pk)
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    '''
+    Карточки постов выводят slug группы.
+    '''
+    invalidate_post_cards(instance.posts.values_list('id', flat=True))
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    '''
+    Карточки постов выводят имя автора, комментарии - username,
+    профиль нового пользователя перестаёт быть ошибкой 404.
+    Вход пользователя обновляет только last_login и кеш не трогает.
+    '''
+    if update_fields and set(update_fields) == {'last_login'}:
+        return
+    bump_generation(PROFILE_GENERATION_KEY)
+    if created:
+        return
+    invalidate_post_cards(instance.posts.values_list('id', flat=True))
+    invalidate_post_comments(
+        instance.comments.values_list('post_id', flat=True).distinct()
+    )
+    bump_feed_generation()
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comments_changed(sender, instance, **kwargs):
+    '''
+    Первая страница комментариев поста устаревает.
+    '''
+    if not is_deleting(Post, instance.post_id):
+        invalidate_post_comments((instance.post_id,))
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def feed_changed(sender, instance, **kwargs):
+    '''
+    Закешированные страницы лент устаревают.
+    '''
+    if sender is Comment and is_deleting(Post, instance.post_id):
+        return
+    bump_feed_generation()
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def follows_changed(sender, **kwargs):
+    '''
+    Счётчики подписчиков и кнопка подписки в профиле
+    и на странице поста устаревают.
+    '''
+    bump_generation(PROFILE_GENERATION_KEY)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def following_changed(sender, instance, **kwargs):
+    '''
+    Подписки пользователя в кеше устаревают.
+    '''
+    invalidate_following((instance.user_id,))
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    '''
+    При подписке в ленту добавляются посты автора.
+    '''
+    if created and settings.FOLLOW_TIMELINE:
+        transaction.on_commit(lambda: timeline.backfill_author(
+            instance.user_id, instance.author_id
+        ))
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    '''
+    При отписке посты автора убираются из ленты.
+    '''
+    if settings.FOLLOW_TIMELINE:
+        transaction.on_commit(lambda: timeline.prune_author(
+            instance.user_id, instance.author_id
+        ))
+
+
+@receiver(pre_save, sender=Post)
+def post_group_remembered(sender, instance, **kwargs):
+    '''
+    Запоминаем прежние группу и картинку редактируемого поста.
+    '''
+    instance._saved_group_id = None
+    instance._saved_image = ''
+    if not instance._state.adding:
+        instance._saved_group_id, instance._saved_image = Post.objects.filter(
+            pk=instance.pk
+        ).values_list('group_id', 'image').first() or (None, '')
+
+
+@receiver(post_save, sender=Post)
+def post_counted(sender, instance, created, **kwargs):
+    '''
+    Счётчики постов автора и групп.
+    '''
+    if created:
+        add_user_counts(instance.author_id, post_count=1)
+        old_group_id = None
+    else:
+        old_group_id = instance._saved_group_id
+    if old_group_id == instance.group_id:
+        return
+    if old_group_id is not None:
+        add_counts(Group.objects.filter(pk=old_group_id), post_count=-1)
+    if instance.group_id is not None:
+        add_counts(Group.objects.filter(pk=instance.group_id), post_count=1)
+
+
+@receiver(post_delete, sender=Post)
+def post_uncounted(sender, instance, **kwargs):
+    '''
+    Счётчики постов автора и группы удалённого поста.
+    '''
+    if not is_deleting(User, instance.author_id):
+        add_user_counts(instance.author_id, post_count=-1)
+    if instance.group_id is not None:
+        add_counts(Group.objects.filter(pk=instance.group_id), post_count=-1)
+
+
+@receiver(post_save, sender=Post)
+def post_image_replaced(sender, instance, created, **kwargs):
+    '''
+    Прежняя картинка отредактированного поста удаляется,
+    если на неё больше не ссылается ни один пост.
+    '''
+    old_image = '' if created else instance._saved_image
+    if old_image and old_image != instance.image.name:
+        transaction.on_commit(lambda: release_image(old_image))
+
+
+@receiver(post_delete, sender=Post)
+def post_image_released(sender, instance, **kwargs):
+    '''
+    Картинка удалённого поста удаляется, если на неё больше
+    не ссылается ни один пост.
+    '''
+    if instance.image:
+        name = instance.image.name
+        transaction.on_commit(lambda: release_image(name))
+
+
+@receiver(post_save, sender=Comment)
+def comment_counted(sender, instance, created, **kwargs):
+    '''
+    Счётчик комментариев поста.
+    '''
+    if created:
+        add_counts(Post.objects.filter(pk=instance.post_id), comment_count=1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_uncounted(sender, instance, **kwargs):
+    '''
+    Счётчик комментариев поста при удалении комментария.
+    '''
+    if not is_deleting(Post, instance.post_id):
+        add_counts(Post.objects.filter(pk=instance.post_id), comment_count=-1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_counted(sender, instance, created, **kwargs):
+    '''
+    Счётчики подписчиков автора и подписок пользователя.
+    '''
+    if created:
+        add_user_counts(instance.author_id, follower_count=1)
+        add_user_counts(instance.user_id, following_count=1)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_uncounted(sender, instance, **kwargs):
+    '''
+    Счётчики подписчиков и подписок при отписке.
+    '''
+    if not is_deleting(User, instance.author_id):
+        add_user_counts(instance.author_id, follower_count=-1)
+    if not is_deleting(User, instance.user_id):
+        add_user_counts(instance.user_id, following_count=-1)
+
+
+@receiver(post_save, sender=User)
+def user_counted(sender, instance, created, raw=False, using=None,
+                 **kwargs):
+    '''
+    Счётчики нового пользователя заводятся вместе с ним в той же базе.
+    '''
+    if created and not raw:
+        UserCounter.objects.using(using).create(user=instance)
+
+
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=User)
+def parent_deleted(sender, instance, **kwargs):
+    '''
+    Зависимые строки удалены раньше родителя.
+    '''
+    deleting().discard((sender, instance.pk))
@@ -0,0 +1,169 @@
+'''
+Стеммер Snowball для русского языка.
+
+Отсекает окончания и суффиксы по алгоритму
+https://snowballstem.org/algorithms/russian/stemmer.html,
+чтобы «книга», «книги» и «книгами» искались как одно слово.
+Все отсечения выполняются в области RV - после первой гласной,
+словообразовательный суффикс «ост(ь)» - в области R2.
+'''
+import re
+
+VOWELS = 'аеиоуыэюя'
+
+# Окончания, которые отсекаются только после «а» или «я»,
+# и окончания без этого условия
+PERFECTIVE_GERUND = (
+    ('в', 'вши', 'вшись'),
+    ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'),
+)
+ADJECTIVE = ((), (
+    'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем',
+    'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю',
+    'ая', 'яя', 'ою', 'ею',
+))
+PARTICIPLE = (
+    ('ем', 'нн', 'вш', 'ющ', 'щ'),
+    ('ивш', 'ывш', 'ующ'),
+)
+REFLEXIVE = ((), ('ся', 'сь'))
+VERB = (
+    (
+        'ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но',
+        'ет', 'ют', 'ны', 'ть', 'ешь', 'нно',
+    ),
+    (
+        'ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей',
+        'уй', 'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят',
+        'ует', 'уют', 'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю',
+    ),
+)
+NOUN = ((), (
+    'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии',
+    'и', 'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам',
+    'ом', 'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия',
+    'ья', 'я',
+))
+DERIVATIONAL = ((), ('ост', 'ость'))
+SUPERLATIVE = ('ейше', 'ейш')
+
+CYRILLIC = re.compile('[а-я]')
+
+
+def _endings(group):
+    '''
+    Окончания группы от длинных к коротким с признаком
+    «только после а или я».
+    '''
+    after_a, plain = group
+    endings = [(ending, True) for ending in after_a]
+    endings += [(ending, False) for ending in plain]
+    return sorted(endings, key=lambda item: len(item[0]), reverse=True)
+
+
+ENDINGS = {
+    group: _endings(group)
+    for group in (
+        PERFECTIVE_GERUND, ADJECTIVE, PARTICIPLE, REFLEXIVE, VERB, NOUN,
+        DERIVATIONAL,
+    )
+}
+
+
+def _regions(word):
+    '''
+    Начала областей RV и R2 слова.
+    '''
+    rv = len(word)
+    for index, letter in enumerate(word):
+        if letter in VOWELS:
+            rv = index + 1
+            break
+    r1 = _next_region(word, 0)
+    return rv, _next_region(word, r1)
+
+
+def _next_region(word, start):
+    '''
+    Начало области после первой согласной, идущей за гласной.
+    '''
+    for index in range(start + 1, len(word)):
+        if word[index] not in VOWELS and word[index - 1] in VOWELS:
+            return index + 1
+    return len(word)
+
+
+def _cut(word, start, group):
+    '''
+    Отсекает самое длинное окончание группы, лежащее в области
+    с началом start. Возвращает None, если окончания нет.
+    '''
+    for ending, after_a in ENDINGS[group]:
+        position = len(word) - len(ending)
+        if position < start or not word.endswith(ending):
+            continue
+        if after_a and (
+            position - 1 < start or word[position - 1] not in 'ая'
+        ):
+            return None
+        return word[:position]
+    return None
+
+
+def _cut_ending(word, rv):
+    '''
+    Шаг 1: отсекает окончание деепричастия или возвратную частицу
+    и окончание прилагательного, причастия, глагола или
+    существительного.
+    '''
+    result = _cut(word, rv, PERFECTIVE_GERUND)
+    if result is not None:
+        return result
+    reflexive = _cut(word, rv, REFLEXIVE)
+    if reflexive is not None:
+        word = reflexive
+    result = _cut(word, rv, ADJECTIVE)
+    if result is not None:
+        participle = _cut(result, rv, PARTICIPLE)
+        return result if participle is None else participle
+    for group in (VERB, NOUN):
+        result = _cut(word, rv, group)
+        if result is not None:
+            return result
+    return word
+
+
+def _tidy_up(word, rv):
+    '''
+    Шаг 4: отсекает превосходную степень, двойное «н»
+    и мягкий знак.
+    '''
+    for ending in SUPERLATIVE:
+        if word.endswith(ending) and len(word) - len(ending) >= rv:
+            word = word[:-len(ending)]
+            break
+    if word.endswith('нн') and len(word) - 2 >= rv:
+        return word[:-1]
+    if word.endswith('ь') and len(word) - 1 >= rv:
+        return word[:-1]
+    return word
+
+
+def stem(word):
+    '''
+    Основа слова word в нижнем регистре.
+    Слова без кириллицы возвращаются без изменений.
+    '''
+    word = word.lower().replace('ё', 'е')
+    if not CYRILLIC.search(word):
+        return word
+    rv, r2 = _regions(word)
+    word = _cut_ending(word, rv)
+    # Шаг 2: окончание «и»
+    if word.endswith('и') and len(word) - 1 >= rv:
+        word = word[:-1]
+    # Шаг 3: словообразовательный суффикс
+    result = _cut(word, r2, DERIVATIONAL)
+    if result is not None:
+        word = result
+    return _tidy_up(word, rv)
@@ -0,0 +1,201 @@
+'''
+Хранилище картинок постов с адресацией по содержимому.
+
+Имя файла - SHA-256 его содержимого: posts/ab/abcd...ef.jpg.
+Одинаковая картинка, загруженная в несколько постов, хранится
+один раз, а её миниатюра и варианты (их имена строятся от имени
+картинки) создаются тоже один раз.
+Счётчик ссылок - число постов с этой картинкой: файл, на который
+больше не ссылается ни один пост, удаляется вместе с миниатюрами
+и вариантами (release_image).
+Повторная загрузка уже сохранённой картинки обновляет время изменения
+файла, а release_image не удаляет файл, изменённый меньше
+POST_IMAGE_RELEASE_DELAY секунд назад: пост, которому картинка только
+что досталась, мог ещё не быть записан в БД. Такой файл проверяется
+ещё раз по истечении задержки. Обновление времени и проверка
+с удалением выполняются под блокировкой файла (flock).
+'''
+import hashlib
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import connections
+from django.utils.deconstruct import deconstructible
+from sorl.thumbnail import delete as delete_thumbnails
+from sorl.thumbnail.images import ImageFile
+
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+def content_hash(content):
+    '''
+    SHA-256 содержимого файла content, прочитанного по частям.
+    '''
+    digest = hashlib.sha256()
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks(HASH_CHUNK_SIZE):
+        digest.update(chunk)
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    return digest.hexdigest()
+
+
+@contextmanager
+def locked(path):
+    '''
+    Исключительная блокировка файла path между процессами.
+    Если файла нет, поднимается FileNotFoundError.
+    '''
+    with open(path, 'rb') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    '''
+    Файловое хранилище, в котором имя файла задаёт его содержимое.
+    '''
+    def content_name(self, name, content):
+        '''
+        Имя файла content в каталоге name: хеш и расширение name.
+        '''
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        digest = content_hash(content)
+        return os.path.join(directory, digest[:2], digest + extension)
+
+    def get_available_name(self, name, max_length=None):
+        '''
+        Занятое имя означает, что такой файл уже сохранён,
+        другое имя ему не подбирается.
+        '''
+        if self.exists(name):
+            raise FileExistsError(name)
+        return name
+
+    def save(self, name, content, max_length=None):
+        '''
+        Сохраняет content, если файла с таким содержимым ещё нет,
+        и возвращает имя файла.
+        '''
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.content_name(name, content)
+        if self.touch(name):
+            return name
+        try:
+            return self._save(name, content)
+        except OSError:
+            # Тот же файл одновременно сохранил другой запрос
+            if self.exists(name):
+                return name
+            raise
+
+    def touch(self, name):
+        '''
+        Обновляет время изменения уже сохранённого файла name,
+        чтобы release_image не удалил его до записи нового поста.
+        Возвращает False, если файла нет.
+        '''
+        path = self.path(name)
+        try:
+            with locked(path):
+                os.utime(path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def is_content_addressed(self, name):
+        '''
+        Имя name построено по содержимому файла.
+        '''
+        stem = os.path.splitext(os.path.basename(name))[0]
+        parent = os.path.basename(os.path.dirname(name))
+        return len(stem) == 64 and parent == stem[:2]
+
+
+post_image_storage = ContentAddressedStorage()
+
+
+def image_references(name, exclude=None):
+    '''
+    Посты, ссылающиеся на картинку name.
+    '''
+    from .models import Post
+    posts = Post.objects.filter(image=name)
+    if exclude is not None:
+        posts = posts.exclude(pk=exclude)
+    return posts
+
+
+def delete_image(name):
+    '''
+    Удаляет картинку name вместе с её миниатюрами и вариантами.
+    '''
+    from .thumbnails import (
+        POST_IMAGE_FORMATS, POST_IMAGE_WIDTHS, variant_name
+    )
+    delete_thumbnails(ImageFile(name, post_image_storage), delete_file=False)
+    post_image_storage.delete(name)
+    for width in POST_IMAGE_WIDTHS:
+        for extension, _, _ in POST_IMAGE_FORMATS:
+            default_storage.delete(variant_name(name, width, extension))
+
+
+def release_image(name):
+    '''
+    Удаляет картинку name, если на неё не ссылается ни один пост.
+    Недавно сохранённая картинка проверяется ещё раз позже.
+    Картинки со старыми именами не по содержимому не удаляются:
+    их переносит команда dedupe_images.
+    '''
+    if not post_image_storage.is_content_addressed(name):
+        return False
+    path = post_image_storage.path(name)
+    try:
+        with locked(path):
+            if image_references(name).exists():
+                return False
+            delay = (
+                settings.POST_IMAGE_RELEASE_DELAY
+                - (time.time() - os.path.getmtime(path))
+            )
+            if delay <= 0:
+                delete_image(name)
+                return True
+    except FileNotFoundError:
+        return False
+    schedule_release(name, delay)
+    return False
+
+
+def schedule_release(name, delay):
+    '''
+    Повторяет release_image(name) через delay секунд в фоновом потоке.
+    '''
+    timer = threading.Timer(delay, release_in_background, (name,))
+    timer.daemon = True
+    timer.start()
+
+
+def release_in_background(name):
+    '''
+    Отложенная проверка картинки в потоке таймера.
+    '''
+    try:
+        release_image(name)
+    finally:
+        connections.close_all()
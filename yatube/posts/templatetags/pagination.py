@@ -0,0 +1,32 @@
+from django import template
+from django.conf import settings
+
+from posts.paginators import PAGE_ELLIPSIS, elided_page_range
+
+register = template.Library()
+
+
+@register.simple_tag
+def page_range(page_obj):
+    '''
+    Добавляет тег page_range: номера первой и последней страниц
+    и PAGE_WINDOW страниц с каждой стороны от текущей,
+    пропуски заменены многоточием (фильтр is_page_ellipsis).
+    В отличие от paginator.page_range размер вывода
+    не зависит от числа страниц.
+    '''
+    # При приблизительном числе записей страница может быть
+    # дальше последней по оценке
+    num_pages = max(page_obj.paginator.num_pages, page_obj.number)
+    return elided_page_range(
+        page_obj.number, num_pages,
+        settings.PAGE_WINDOW, settings.PAGE_ON_ENDS
+    )
+
+
+@register.filter
+def is_page_ellipsis(value):
+    '''
+    Добавляет фильтр is_page_ellipsis: элемент page_range - пропуск.
+    '''
+    return value == PAGE_ELLIPSIS
@@ -0,0 +1,47 @@
+from django import template
+from django.core.files.storage import default_storage
+
+from posts.thumbnails import POST_IMAGE_FORMATS, variant_name
+
+register = template.Library()
+
+MIME_TYPES = {'webp': 'image/webp', 'jpg': 'image/jpeg'}
+# Картинка занимает ширину колонки, но не больше 960px
+POST_IMAGE_SIZES = '(min-width: 992px) 960px, 100vw'
+# Ширина варианта для браузеров без поддержки srcset
+POST_IMAGE_FALLBACK_WIDTH = 960
+
+
+def variant_srcset(name, widths, extension):
+    '''
+    Значение srcset для вариантов картинки одного формата.
+    '''
+    return ', '.join(
+        f'{default_storage.url(variant_name(name, width, extension))} {width}w'
+        for width in widths
+    )
+
+
+@register.inclusion_tag('posts/includes/picture.html')
+def post_picture(post):
+    '''
+    Добавляет тег post_picture: картинка поста с вариантами
+    разной ширины, из которых браузер выбирает подходящий.
+    Последний формат в POST_IMAGE_FORMATS (JPEG) идёт в <img>,
+    остальные - в <source>.
+    '''
+    name = post.image.name
+    widths = post.variant_widths
+    *formats, (extension, _, _) = POST_IMAGE_FORMATS
+    fallback = [
+        width for width in widths if width <= POST_IMAGE_FALLBACK_WIDTH
+    ][-1]
+    return {
+        'sources': [
+            (MIME_TYPES[source], variant_srcset(name, widths, source))
+            for source, _, _ in formats
+        ],
+        'srcset': variant_srcset(name, widths, extension),
+        'src': default_storage.url(variant_name(name, fallback, extension)),
+        'sizes': POST_IMAGE_SIZES,
+    }
@@ -0,0 +1,218 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Post
+from posts.paginators import EstimatedCountPaginator, estimate_count
+from users.admin import username_prefix_users
+
+User = get_user_model()
+
+
+class AdminChangelistTest(TestCase):
+    '''
+    Класс AdminChangelistTest.
+    Тестируем списки комментариев и подписок в админке.
+    '''
+    @classmethod
+    def setUpClass(cls):
+        '''
+        Создаём администратора, авторов, комментарии и подписки.
+        '''
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin'
+        )
+        cls.authors = [
+            User.objects.create_user(username=f'author{number}')
+            for number in range(3)
+        ]
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(
+            author=cls.authors[0], text='Тестовый пост'
+        )
+        for author in cls.authors:
+            Comment.objects.create(
+                post=cls.post, author=author, text='Комментарий'
+            )
+            Follow.objects.create(user=cls.reader, author=author)
+
+    def setUp(self):
+        '''
+        Создаём клиента администратора.
+        '''
+        self.admin_client = Client()
+        self.admin_client.force_login(AdminChangelistTest.admin)
+        self.comments_url = reverse('admin:posts_comment_changelist')
+        self.follows_url = reverse('admin:posts_follow_changelist')
+
+    def count_queries(self, url):
+        '''
+        Число запросов при открытии страницы url.
+        '''
+        with CaptureQueriesContext(connection) as queries:
+            response = self.admin_client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_posts_admin_queries_do_not_grow_with_rows(self):
+        '''
+        Число запросов списков не зависит от числа строк.
+        '''
+        before = {
+            url: self.count_queries(url)
+            for url in (self.comments_url, self.follows_url)
+        }
+        author = User.objects.create_user(username='author_new')
+        Comment.objects.create(
+            post=AdminChangelistTest.post, author=author, text='Ещё'
+        )
+        Follow.objects.create(user=AdminChangelistTest.reader, author=author)
+        for url, count in before.items():
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.count_queries(url), count,
+                    'Тест не пройден, связанные записи выбираются '
+                    'отдельным запросом на каждую строку'
+                )
+
+    def test_posts_admin_filters_do_not_list_users(self):
+        '''
+        Фильтры по пользователю не перечисляют всех пользователей.
+        '''
+        for url in (self.comments_url, self.follows_url):
+            with self.subTest(url=url):
+                response = self.admin_client.get(url)
+                self.assertNotContains(response, '__id__exact=')
+                self.assertContains(response, 'author-usernames')
+
+    def test_posts_admin_filter_by_username(self):
+        '''
+        Фильтр по username автора.
+        '''
+        response = self.admin_client.get(
+            self.comments_url, {'author': 'author1'}
+        )
+        comments = response.context['cl'].result_list
+        self.assertEqual(
+            [comment.author for comment in comments],
+            [AdminChangelistTest.authors[1]]
+        )
+        response = self.admin_client.get(
+            self.follows_url, {'user': 'reader', 'author': 'author2'}
+        )
+        self.assertEqual(len(response.context['cl'].result_list), 1)
+
+    def test_posts_admin_search_by_username_prefix(self):
+        '''
+        Поиск по началу username подписчика или автора.
+        '''
+        response = self.admin_client.get(self.follows_url, {'q': 'autho'})
+        self.assertEqual(len(response.context['cl'].result_list), 3)
+        response = self.admin_client.get(self.follows_url, {'q': 'read'})
+        self.assertEqual(len(response.context['cl'].result_list), 3)
+        response = self.admin_client.get(self.comments_url, {'q': 'thor'})
+        self.assertEqual(len(response.context['cl'].result_list), 0)
+
+    def test_posts_admin_user_autocomplete(self):
+        '''
+        Автодополнение пользователей ищет по началу username.
+        '''
+        response = self.admin_client.get(
+            reverse('admin:auth_user_autocomplete'), {'term': 'author'}
+        )
+        self.assertEqual(
+            [result['text'] for result in response.json()['results']],
+            ['author0', 'author1', 'author2']
+        )
+
+    def test_posts_admin_username_prefix_range(self):
+        '''
+        В SQLite префикс ищется диапазоном по индексу username
+        с побайтным сравнением: регистр и буквы за пределами ASCII
+        учитываются.
+        '''
+        User.objects.create_user(username='Author9')
+        User.objects.create_user(username='authorё')
+        users = username_prefix_users('author')
+        self.assertEqual(
+            sorted(User.objects.filter(pk__in=users).values_list(
+                'username', flat=True
+            )),
+            ['author0', 'author1', 'author2', 'authorё']
+        )
+        sql, params = users.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+        self.assertIn('SEARCH', plan)
+        self.assertIn('username>? AND username<?', plan)
+
+    def test_posts_admin_user_search_default_fields(self):
+        '''
+        Список пользователей ищет по email и середине username,
+        автодополнение - только по началу username.
+        '''
+        users_url = reverse('admin:auth_user_changelist')
+        response = self.admin_client.get(users_url, {'q': 'example.com'})
+        self.assertEqual(
+            list(response.context['cl'].result_list),
+            [AdminChangelistTest.admin]
+        )
+        response = self.admin_client.get(users_url, {'q': 'thor1'})
+        self.assertEqual(
+            list(response.context['cl'].result_list),
+            [AdminChangelistTest.authors[1]]
+        )
+        response = self.admin_client.get(
+            reverse('admin:auth_user_autocomplete'), {'term': 'thor1'}
+        )
+        self.assertEqual(response.json()['results'], [])
+
+
+class EstimatedCountPaginatorTest(TestCase):
+    '''
+    Класс EstimatedCountPaginatorTest.
+    Тестируем число строк из статистики планировщика.
+    '''
+    @classmethod
+    def setUpClass(cls):
+        '''
+        Создаём посты.
+        '''
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='usertest')
+        Post.objects.bulk_create(
+            Post(author=cls.user, text=f'Пост {number}')
+            for number in range(5)
+        )
+
+    @override_settings(ESTIMATED_COUNT_THRESHOLD=3)
+    def test_posts_admin_estimated_count(self):
+        '''
+        Для таблицы больше порога без фильтров число строк берётся
+        из статистики, для запросов с фильтром - точное.
+        '''
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self.assertEqual(estimate_count(Post), 5)
+        Post.objects.create(
+            author=EstimatedCountPaginatorTest.user,
+            text='Пост после ANALYZE'
+        )
+        paginator = EstimatedCountPaginator(Post.objects.all(), 2)
+        with self.assertNumQueries(2):
+            self.assertEqual(paginator.count, 5)
+        filtered = EstimatedCountPaginator(
+            Post.objects.filter(text__startswith='Пост 1'), 2
+        )
+        self.assertEqual(filtered.count, 1)
+
+    def test_posts_admin_exact_count_below_threshold(self):
+        '''
+        Небольшие таблицы считаются точно.
+        '''
+        paginator = EstimatedCountPaginator(Post.objects.all(), 2)
+        self.assertEqual(paginator.count, 5)
@@ -0,0 +1,365 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.caching import (
+    POST_COMMENTS_FRAGMENT, get_feed_generation, post_card_keys
+)
+from posts.models import Comment, Follow, Post, Group
+
+User = get_user_model()
+
+
+class PostCardCacheTest(TestCase):
+    '''
+    Класс PostCardCacheTest.
+    Тестируем кеширование карточек постов в лентах.
+    '''
+    @classmethod
+    def setUpClass(cls):
+        '''
+        Создаём пост в группе.
+        '''
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='usertest')
+        cls.group = Group.objects.create(
+            title='Тестовая группа 1',
+            slug='slug-g1',
+            description='Тестовое описание группы 1',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Тестовый пост',
+            group=cls.group
+        )
+
+    def setUp(self):
+        '''
+        Очищаем кеш и создаём гостевого клиента.
+        '''
+        cache.clear()
+        self.guest_client = Client()
+        self.group_url = reverse(
+            'posts:group_list', kwargs={'slug': 'slug-g1'}
+        )
+        self.profile_url = reverse(
+            'posts:profile', kwargs={'username': 'usertest'}
+        )
+
+    def cached_cards(self):
+        '''
+        Число закешированных вариантов карточки поста.
+        '''
+        return len(cache.get_many(post_card_keys(self.post.id)))
+
+    def test_posts_caching_card_reused_between_feeds(self):
+        '''
+        Карточка кешируется и повторно используется без рендера.
+        '''
+        self.guest_client.get(self.group_url)
+        self.assertEqual(self.cached_cards(), 1)
+        Post.objects.filter(id=self.post.id).update(text='Без сигнала')
+        response = self.guest_client.get(self.group_url)
+        self.assertContains(response, 'Тестовый пост')
+        self.guest_client.get(self.profile_url)
+        self.assertEqual(
+            self.cached_cards(), 2,
+            'Тест не пройден, в профиле нужна карточка без автора'
+        )
+
+    def test_posts_caching_card_invalidated_on_save(self):
+        '''
+        Сохранение поста сбрасывает все варианты карточки.
+        '''
+        self.guest_client.get(self.group_url)
+        self.guest_client.get(self.profile_url)
+        post = Post.objects.get(id=self.post.id)
+        post.text = 'Отредактированный пост'
+        post.save()
+        self.assertEqual(self.cached_cards(), 0)
+        response = self.guest_client.get(self.group_url)
+        self.assertContains(response, 'Отредактированный пост')
+
+    def test_posts_caching_card_invalidated_on_author_rename(self):
+        '''
+        Изменение имени автора сбрасывает его карточки.
+        '''
+        self.guest_client.get(self.group_url)
+        user = User.objects.get(id=self.user.id)
+        user.first_name = 'Новое имя'
+        user.save()
+        self.assertEqual(self.cached_cards(), 0)
+        response = self.guest_client.get(self.group_url)
+        self.assertContains(response, 'Новое имя')
+
+    def test_posts_caching_invalidated_after_commit(self):
+        '''
+        Карточка и страницы лент сбрасываются ещё раз после
+        фиксации транзакции: закешированное другим запросом
+        до фиксации не остаётся в кеше.
+        '''
+        post = Post.objects.get(id=self.post.id)
+        post.text = 'Отредактированный пост'
+        post.save()
+        generation = get_feed_generation()
+        self.guest_client.get(self.group_url)
+        self.assertEqual(self.cached_cards(), 1)
+        for _, func in connection.run_on_commit:
+            func()
+        self.assertEqual(self.cached_cards(), 0)
+        self.assertGreater(get_feed_generation(), generation)
+
+
+@override_settings(COUNT_OF_PAGE_COMMENT=2)
+class PostCommentsCacheTest(TestCase):
+    '''
+    Класс PostCommentsCacheTest.
+    Тестируем постраничный вывод и кеширование комментариев.
+    '''
+    @classmethod
+    def setUpClass(cls):
+        '''
+        Создаём пост с тремя комментариями.
+        '''
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='usertest')
+        cls.commentator = User.objects.create_user(username='commentator')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+        for i in range(3):
+            Comment.objects.create(
+                post=cls.post, author=cls.commentator, text=f'Комментарий {i}'
+            )
+
+    def setUp(self):
+        '''
+        Очищаем кеш и создаём клиентов.
+        '''
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(PostCommentsCacheTest.user)
+        self.url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.id}
+        )
+        self.key = make_template_fragment_key(
+            POST_COMMENTS_FRAGMENT, (self.post.id,)
+        )
+
+    def test_posts_caching_comments_paginated(self):
+        '''
+        Комментарии выводятся страницами от новых к старым.
+        '''
+        response = self.guest_client.get(self.url)
+        comments = response.context['comments']
+        self.assertEqual(
+            [comment.text for comment in comments],
+            ['Комментарий 2', 'Комментарий 1']
+        )
+        response = self.guest_client.get(
+            self.url, {'cursor': comments.next_cursor}
+        )
+        self.assertEqual(
+            [comment.text for comment in response.context['comments']],
+            ['Комментарий 0']
+        )
+
+    def test_posts_caching_comments_authors_in_one_query(self):
+        '''
+        Авторы комментариев выбираются вместе с комментариями.
+        '''
+        response = self.guest_client.get(self.url)
+        comments = list(response.context['comments'])
+        with self.assertNumQueries(0):
+            for comment in comments:
+                comment.author.username
+
+    def test_posts_caching_comments_first_page_cached(self):
+        '''
+        Первая страница комментариев берётся из кеша
+        и сбрасывается новым комментарием.
+        '''
+        self.guest_client.get(self.url)
+        self.assertIsNotNone(cache.get(self.key))
+        Comment.objects.filter(text='Комментарий 2').update(
+            text='Без сигнала'
+        )
+        response = self.guest_client.get(self.url)
+        self.assertContains(response, 'Комментарий 2')
+        self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.id}),
+            data={'text': 'Новый комментарий'}
+        )
+        self.assertIsNone(cache.get(self.key))
+        response = self.guest_client.get(self.url)
+        self.assertContains(response, 'Новый комментарий')
+        self.assertNotContains(response, 'Комментарий 2')
+
+
+class ConditionalGetTest(TestCase):
+    '''
+    Класс ConditionalGetTest.
+    Тестируем ответы 304 по ETag и Last-Modified.
+    '''
+    @classmethod
+    def setUpClass(cls):
+        '''
+        Создаём автора, читателя и пост в группе.
+        '''
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='usertest')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа 1',
+            slug='slug-g1',
+            description='Тестовое описание группы 1',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, text='Тестовый пост', group=cls.group
+        )
+
+    def setUp(self):
+        '''
+        Очищаем кеш и создаём гостевого клиента.
+        '''
+        cache.clear()
+        self.guest_client = Client()
+        self.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'slug-g1'}),
+            reverse('posts:profile', kwargs={'username': 'usertest'}),
+            reverse(
+                'posts:post_detail',
+                kwargs={'post_id': ConditionalGetTest.post.id}
+            ),
+        )
+
+    def revalidate(self, client, url, response):
+        '''
+        Повторный запрос url с валидаторами из ответа response.
+        '''
+        return client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_posts_caching_not_modified_without_queries(self):
+        '''
+        Неизменившаяся страница отдаётся с кодом 304 без запросов
+        к БД и рендера.
+        '''
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                with self.assertNumQueries(0):
+                    second = self.revalidate(
+                        self.guest_client, url, response
+                    )
+                self.assertEqual(
+                    second.status_code, 304,
+                    'Тест не пройден, неизменившаяся страница '
+                    'отдаётся целиком'
+                )
+
+    def test_posts_caching_modified_after_comment(self):
+        '''
+        Новый комментарий меняет ETag страниц.
+        '''
+        responses = {url: self.guest_client.get(url) for url in self.urls}
+        Comment.objects.create(
+            post=ConditionalGetTest.post,
+            author=ConditionalGetTest.reader,
+            text='Комментарий'
+        )
+        for url, response in responses.items():
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.revalidate(
+                        self.guest_client, url, response
+                    ).status_code,
+                    200
+                )
+
+    def test_posts_caching_modified_after_follow(self):
+        '''
+        Подписка меняет ETag профиля и страницы поста, но не лент.
+        '''
+        index_url, group_url, profile_url, detail_url = self.urls
+        responses = {url: self.guest_client.get(url) for url in self.urls}
+        Follow.objects.create(
+            user=ConditionalGetTest.reader, author=ConditionalGetTest.user
+        )
+        expected = {
+            index_url: 304, group_url: 304, profile_url: 200, detail_url: 200
+        }
+        for url, status_code in expected.items():
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.revalidate(
+                        self.guest_client, url, responses[url]
+                    ).status_code,
+                    status_code
+                )
+
+    def test_posts_caching_etag_depends_on_user(self):
+        '''
+        Страница гостя не подходит авторизованному пользователю.
+        '''
+        url = self.urls[0]
+        response = self.guest_client.get(url)
+        authorized_client = Client()
+        authorized_client.force_login(ConditionalGetTest.reader)
+        self.assertEqual(
+            self.revalidate(authorized_client, url, response).status_code,
+            200
+        )
+
+    def test_posts_caching_modified_after_login(self):
+        '''
+        После повторного входа страница поста с формой комментария
+        отдаётся целиком: в ней новый токен CSRF.
+        '''
+        url = self.urls[3]
+        client = Client()
+        client.force_login(ConditionalGetTest.reader)
+        response = client.get(url)
+        self.assertEqual(
+            self.revalidate(client, url, response).status_code, 304,
+            'Тест не пройден, первый ответ получил ETag без токена CSRF'
+        )
+        client.logout()
+        client.force_login(ConditionalGetTest.reader)
+        self.assertEqual(
+            self.revalidate(client, url, response).status_code, 200,
+            'Тест не пройден, после входа страница со старым токеном '
+            'CSRF отдаётся из кеша браузера'
+        )
+
+    def test_posts_caching_last_modified(self):
+        '''
+        После изменения данных страница получает Last-Modified,
+        по которому отдаётся 304.
+        '''
+        Post.objects.create(author=ConditionalGetTest.user, text='Новый')
+        url = self.urls[0]
+        response = self.guest_client.get(url)
+        second = self.guest_client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(second.status_code, 304)
+
+    def test_posts_caching_last_modified_only_for_guests(self):
+        '''
+        Страница авторизованного пользователя отдаётся без
+        Last-Modified: по If-Modified-Since после входа страница
+        гостя не отдаётся из кеша браузера.
+        '''
+        Post.objects.create(author=ConditionalGetTest.user, text='Новый')
+        url = self.urls[0]
+        response = self.guest_client.get(url)
+        client = Client()
+        client.force_login(ConditionalGetTest.reader)
+        authorized = client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(authorized.status_code, 200)
+        self.assertFalse(authorized.has_header('Last-Modified'))
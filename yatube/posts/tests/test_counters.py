@@ -0,0 +1,152 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from posts.models import Comment, Follow, Group, Post, UserCounter
+
+User = get_user_model()
+
+
+class CountersTest(TestCase):
+    '''
+    Класс CountersTest.
+    Тестируем денормализованные счётчики.
+    '''
+    @classmethod
+    def setUpClass(cls):
+        '''
+        Создаём пользователей и группы.
+        '''
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа 1',
+            slug='slug-g1',
+            description='Тестовое описание группы 1',
+        )
+        cls.group2 = Group.objects.create(
+            title='Тестовая группа 2',
+            slug='slug-g2',
+            description='Тестовое описание группы 2',
+        )
+
+    def counters(self, user):
+        '''
+        Счётчики пользователя из БД.
+        '''
+        counter = UserCounter.objects.get(user=user)
+        return (
+            counter.post_count,
+            counter.follower_count,
+            counter.following_count
+        )
+
+    def group_post_count(self, group):
+        '''
+        Счётчик постов группы из БД.
+        '''
+        return Group.objects.get(pk=group.pk).post_count
+
+    def test_posts_counters_posts_and_groups(self):
+        '''
+        Создание, перенос в другую группу и удаление поста.
+        '''
+        post = Post.objects.create(
+            author=self.author, text='Пост', group=self.group
+        )
+        self.assertEqual(self.counters(self.author), (1, 0, 0))
+        self.assertEqual(self.group_post_count(self.group), 1)
+
+        post.group = self.group2
+        post.save()
+        self.assertEqual(self.group_post_count(self.group), 0)
+        self.assertEqual(self.group_post_count(self.group2), 1)
+
+        post.delete()
+        self.assertEqual(self.counters(self.author), (0, 0, 0))
+        self.assertEqual(self.group_post_count(self.group2), 0)
+
+    def test_posts_counters_comments(self):
+        '''
+        Счётчик комментариев не затирается при редактировании поста.
+        '''
+        post = Post.objects.create(author=self.author, text='Пост')
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='Комментарий'
+        )
+        self.assertEqual(Post.objects.get(pk=post.pk).comment_count, 1)
+        post.text = 'Отредактированный пост'
+        post.save()
+        self.assertEqual(
+            Post.objects.get(pk=post.pk).comment_count, 1,
+            'Тест не пройден, сохранение поста затёрло счётчик'
+        )
+        comment.delete()
+        self.assertEqual(Post.objects.get(pk=post.pk).comment_count, 0)
+
+    def test_posts_counters_follow(self):
+        '''
+        Подписка и отписка.
+        '''
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.counters(self.author), (0, 1, 0))
+        self.assertEqual(self.counters(self.reader), (0, 0, 1))
+        follow.delete()
+        self.assertEqual(self.counters(self.author), (0, 0, 0))
+        self.assertEqual(self.counters(self.reader), (0, 0, 0))
+
+    def test_posts_counters_recount_command(self):
+        '''
+        Команда recount исправляет разошедшиеся счётчики.
+        '''
+        Post.objects.create(author=self.author, text='Пост', group=self.group)
+        UserCounter.objects.filter(user=self.author).update(post_count=10)
+        Group.objects.filter(pk=self.group.pk).update(post_count=0)
+        out = StringIO()
+        call_command('recount', stdout=out)
+        self.assertIn('UserCounter.post_count\t1', out.getvalue())
+        self.assertIn('Group.post_count\t1', out.getvalue())
+        self.assertEqual(self.counters(self.author), (1, 0, 0))
+        self.assertEqual(self.group_post_count(self.group), 1)
+
+    def test_posts_counters_delete_user(self):
+        '''
+        Удаление пользователя с постами, комментариями и подписками
+        не создаёт заново его счётчики и исправляет чужие.
+        '''
+        user = User.objects.create_user(username='leaving')
+        post = Post.objects.create(author=user, text='Пост', group=self.group)
+        Comment.objects.create(post=post, author=self.reader, text='Ок')
+        reader_post = Post.objects.create(author=self.reader, text='Пост')
+        Comment.objects.create(post=reader_post, author=user, text='Ок')
+        Follow.objects.create(user=self.reader, author=user)
+        Follow.objects.create(user=user, author=self.author)
+        user.delete()
+        self.assertFalse(UserCounter.objects.filter(user_id=user.id).exists())
+        self.assertEqual(self.counters(self.reader), (1, 0, 0))
+        self.assertEqual(self.counters(self.author), (0, 0, 0))
+        self.assertEqual(self.group_post_count(self.group), 0)
+        self.assertEqual(Post.objects.get(pk=reader_post.pk).comment_count, 0)
+
+    def test_posts_counters_delete_post_with_comments(self):
+        '''
+        Комментарии удаляемого поста не обновляют его счётчик
+        по одному.
+        '''
+        post = Post.objects.create(author=self.author, text='Пост')
+        Comment.objects.bulk_create(
+            Comment(post=post, author=self.reader, text=f'Ок {number}')
+            for number in range(5)
+        )
+        with CaptureQueriesContext(connection) as queries:
+            post.delete()
+        self.assertFalse(any(
+            query['sql'].startswith('UPDATE "posts_post"')
+            for query in queries
+        ))
+        self.assertEqual(self.counters(self.author), (0, 0, 0))
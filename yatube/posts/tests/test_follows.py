@@ -0,0 +1,303 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.following import (
+    finish_request, following_key, get_following, is_following,
+    start_request
+)
+from posts.follows import follow_authors, unfollow_authors
+from posts.models import Follow, Post, UserCounter
+
+User = get_user_model()
+
+
+class FollowManyTest(TestCase):
+    '''
+    Класс FollowManyTest.
+    Тестируем подписку и отписку сразу на нескольких авторов.
+    '''
+    @classmethod
+    def setUpClass(cls):
+        '''
+        Создаём читателя и авторов.
+        '''
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username=f'author{number}')
+            for number in range(5)
+        ]
+
+    def setUp(self):
+        '''
+        Создаём авторизированного клиента.
+        '''
+        self.authorized_client = Client()
+        self.authorized_client.force_login(FollowManyTest.reader)
+
+    def followed(self):
+        '''
+        Авторы, на которых подписан читатель.
+        '''
+        return set(Follow.objects.filter(
+            user=FollowManyTest.reader
+        ).values_list('author__username', flat=True))
+
+    def counters(self, user):
+        '''
+        Счётчики подписчиков и подписок пользователя.
+        '''
+        counter = UserCounter.objects.get(user=user)
+        return counter.follower_count, counter.following_count
+
+    def test_posts_follows_follow_many(self):
+        '''
+        Подписка на нескольких авторов одним запросом: себя
+        и уже подписанных авторов пропускает, счётчики точные.
+        '''
+        reader = FollowManyTest.reader
+        authors = FollowManyTest.authors
+        Follow.objects.create(user=reader, author=authors[0])
+        new_ids = follow_authors(
+            reader, [author.id for author in authors[:3]] + [reader.id]
+        )
+        self.assertEqual(new_ids, {authors[1].id, authors[2].id})
+        self.assertEqual(self.followed(), {'author0', 'author1', 'author2'})
+        self.assertEqual(self.counters(reader), (0, 3))
+        for author in authors[:3]:
+            with self.subTest(author=author):
+                self.assertEqual(self.counters(author), (1, 0))
+
+    def test_posts_follows_unfollow_single_delete(self):
+        '''
+        Отписка удаляет подписки одним DELETE без выборки подписок.
+        '''
+        reader = FollowManyTest.reader
+        authors = FollowManyTest.authors
+        follow_authors(reader, [author.id for author in authors])
+        with CaptureQueriesContext(connection) as queries:
+            deleted = unfollow_authors(
+                reader, [authors[1].id, authors[2].id, reader.id]
+            )
+        follow_queries = [
+            query['sql'] for query in queries
+            if query['sql'].startswith(('SELECT', 'DELETE'))
+            and 'FROM "posts_follow"' in query['sql'].split(' WHERE ')[0]
+        ]
+        self.assertEqual(len(follow_queries), 1)
+        self.assertTrue(follow_queries[0].startswith('DELETE'))
+        self.assertEqual(deleted, 2)
+        self.assertEqual(
+            self.followed(), {'author0', 'author3', 'author4'}
+        )
+        self.assertEqual(self.counters(reader), (0, 3))
+        self.assertEqual(self.counters(authors[1]), (0, 0))
+
+    def test_posts_follows_concurrent_follow(self):
+        '''
+        Подписка на того же автора из другого запроса между
+        проверкой и вставкой не нарушает unique_follow
+        и не сбивает счётчики.
+        '''
+        reader = FollowManyTest.reader
+        author = FollowManyTest.authors[0]
+        bulk_create = Follow.objects.bulk_create
+
+        def concurrent_bulk_create(objs, **kwargs):
+            Follow.objects.create(user=reader, author=author)
+            return bulk_create(objs, **kwargs)
+
+        with mock.patch.object(
+            Follow.objects, 'bulk_create', concurrent_bulk_create
+        ):
+            follow_authors(reader, [author.id])
+        self.assertEqual(
+            Follow.objects.filter(user=reader, author=author).count(), 1
+        )
+        self.assertEqual(self.counters(reader), (0, 1))
+        self.assertEqual(self.counters(author), (1, 0))
+
+    def test_posts_follows_constraints(self):
+        '''
+        База сама не даёт подписаться дважды и на себя.
+        '''
+        reader = FollowManyTest.reader
+        author = FollowManyTest.authors[0]
+        Follow.objects.create(user=reader, author=author)
+        for user, follow_author in ((reader, author), (reader, reader)):
+            with self.subTest(author=follow_author):
+                with self.assertRaises(IntegrityError):
+                    with transaction.atomic():
+                        Follow.objects.bulk_create(
+                            [Follow(user=user, author=follow_author)]
+                        )
+
+    def test_posts_follows_endpoints(self):
+        '''
+        Подписка и отписка по списку имён одним запросом.
+        '''
+        response = self.authorized_client.post(
+            reverse('posts:follow_many'),
+            {'usernames': 'author0, author1\nauthor2 unknown reader'}
+        )
+        self.assertRedirects(response, reverse('posts:follow_index'))
+        self.assertEqual(self.followed(), {'author0', 'author1', 'author2'})
+        self.authorized_client.post(
+            reverse('posts:unfollow_many'), {'usernames': 'author0 author2'}
+        )
+        self.assertEqual(self.followed(), {'author1'})
+
+    def test_posts_follows_endpoints_post_only(self):
+        '''
+        Подписка по списку принимает только POST
+        и не больше FOLLOW_MANY_MAX_AUTHORS имён.
+        '''
+        response = self.authorized_client.get(reverse('posts:follow_many'))
+        self.assertEqual(response.status_code, 405)
+        with self.settings(FOLLOW_MANY_MAX_AUTHORS=2):
+            self.authorized_client.post(
+                reverse('posts:follow_many'),
+                {'usernames': 'author0 author1 author2'}
+            )
+        self.assertEqual(self.followed(), set())
+
+
+class FollowingCacheTest(TestCase):
+    '''
+    Класс FollowingCacheTest.
+    Тестируем подписки пользователей в кеше.
+    '''
+    @classmethod
+    def setUpClass(cls):
+        '''
+        Создаём читателя, авторов и пост.
+        '''
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username=f'author{number}')
+            for number in range(3)
+        ]
+        cls.post = Post.objects.create(
+            author=cls.authors[1], text='Пост автора'
+        )
+
+    def setUp(self):
+        '''
+        Очищаем кеш и создаём авторизированного клиента.
+        '''
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(FollowingCacheTest.reader)
+
+    def test_posts_follows_following_cached(self):
+        '''
+        Подписки читаются из БД один раз и хранятся
+        отсортированным массивом id.
+        '''
+        reader = FollowingCacheTest.reader
+        authors = FollowingCacheTest.authors
+        for author in reversed(authors[:2]):
+            Follow.objects.create(user=reader, author=author)
+        self.assertEqual(
+            list(get_following(reader.id)), [authors[0].id, authors[1].id]
+        )
+        with self.assertNumQueries(0):
+            self.assertTrue(is_following(reader.id, authors[1].id))
+            self.assertFalse(is_following(reader.id, authors[2].id))
+
+    def test_posts_follows_following_invalidated(self):
+        '''
+        Подписка и отписка, одиночные и по списку,
+        сбрасывают подписки в кеше.
+        '''
+        reader = FollowingCacheTest.reader
+        author, other, third = FollowingCacheTest.authors
+        self.assertFalse(is_following(reader.id, author.id))
+        follow = Follow.objects.create(user=reader, author=author)
+        self.assertTrue(is_following(reader.id, author.id))
+        follow.delete()
+        self.assertFalse(is_following(reader.id, author.id))
+        follow_authors(reader, (other.id, third.id))
+        self.assertTrue(is_following(reader.id, third.id))
+        unfollow_authors(reader, (third.id,))
+        self.assertEqual(list(get_following(reader.id)), [other.id])
+
+    def test_posts_follows_following_read_once_per_request(self):
+        '''
+        В запросе подписки разбираются из кеша один раз,
+        подписка в том же запросе сбрасывает запомненные.
+        '''
+        reader = FollowingCacheTest.reader
+        author, other, _ = FollowingCacheTest.authors
+        Follow.objects.create(user=reader, author=author)
+        start_request()
+        try:
+            following = get_following(reader.id)
+            cache.delete(following_key(reader.id))
+            with self.assertNumQueries(0):
+                self.assertIs(get_following(reader.id), following)
+                self.assertTrue(is_following(reader.id, author.id))
+            follow_authors(reader, (other.id,))
+            self.assertTrue(is_following(reader.id, other.id))
+        finally:
+            finish_request()
+        Follow.objects.filter(user=reader).delete()
+        self.assertFalse(is_following(reader.id, author.id))
+
+    def test_posts_follows_profile_uses_cache(self):
+        '''
+        Профиль проверяет подписку без запроса к подпискам.
+        '''
+        reader = FollowingCacheTest.reader
+        author = FollowingCacheTest.authors[1]
+        Follow.objects.create(user=reader, author=author)
+        get_following(reader.id)
+        url = reverse('posts:profile', kwargs={'username': 'author1'})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.authorized_client.get(url)
+        self.assertTrue(response.context['following'])
+        self.assertFalse(any(
+            'posts_follow' in query['sql'] for query in queries
+        ))
+
+    def test_posts_follows_feed_authors(self):
+        '''
+        Лента подписок одинакова со списком авторов из кеша
+        и с JOIN через подписки для большого числа авторов.
+        '''
+        reader = FollowingCacheTest.reader
+        follow_authors(
+            reader, [author.id for author in FollowingCacheTest.authors]
+        )
+        url = reverse('posts:follow_index')
+        for max_authors in (900, 1):
+            with self.subTest(max_authors=max_authors):
+                with override_settings(
+                    FOLLOWING_FEED_MAX_AUTHORS=max_authors
+                ):
+                    response = self.authorized_client.get(url)
+                self.assertEqual(
+                    list(response.context['page_obj']),
+                    [FollowingCacheTest.post]
+                )
+
+    def test_posts_follows_feed_without_following(self):
+        '''
+        Без подписок лента не запрашивает посты.
+        '''
+        get_following(FollowingCacheTest.reader.id)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.authorized_client.get(
+                reverse('posts:follow_index')
+            )
+        self.assertEqual(len(response.context['page_obj']), 0)
+        self.assertFalse(any(
+            'posts_post' in query['sql'] for query in queries
+        ))
@@ -1,5 +1,7 @@
+import hashlib
 import shutil
 import tempfile
+from io import BytesIO
 
 from posts.models import Post, Group, User, Comment
 
@@ -8,11 +10,20 @@ from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from django import forms
+from PIL import Image
 
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
+def content_name(content, extension):
+    '''
+    Имя, под которым хранится картинка с содержимым content.
+    '''
+    digest = hashlib.sha256(content).hexdigest()
+    return f'posts/{digest[:2]}/{digest}{extension}'
+
+
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
 class PostFormTests(TestCase):
     '''
@@ -145,7 +156,7 @@ class PostFormTests(TestCase):
             Post.objects.filter(
                 text='Тестовый 2',
                 group=PostFormTests.group,
-                image='posts/small.gif'
+                image=content_name(small_gif, '.gif')
             ).exists(),
             'Тест не пройден, данные из формы не перенеслись в базу'
         )
@@ -205,7 +216,7 @@ class PostFormTests(TestCase):
             Post.objects.filter(
                 text='Тестовый 1 (редактирован)',
                 group=PostFormTests.group2,
-                image='posts/little.gif'
+                image=content_name(little_gif, '.gif')
             ).exists()
         )
 
@@ -335,3 +346,103 @@ class CommentFormTests(TestCase):
             ).count(), comment_user2_count + 1,
             'Тест не пройден, у пользователя не добавился комментарий'
         )
+
+
+def uploaded_image(name, size, image_format):
+    '''
+    Картинка размера size для поля image.
+    '''
+    buffer = BytesIO()
+    Image.effect_noise(size, 64).convert('RGB').save(buffer, image_format)
+    return SimpleUploadedFile(
+        name=name,
+        content=buffer.getvalue(),
+        content_type=Image.MIME[image_format]
+    )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class PostImageUploadTests(TestCase):
+    '''
+    Класс PostImageUploadTests.
+    Тестируем ограничения и уменьшение загружаемых картинок.
+    '''
+    @classmethod
+    def setUpClass(cls):
+        '''
+        Создаём автора.
+        '''
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='usertest')
+
+    @classmethod
+    def tearDownClass(cls):
+        '''
+        Удаляем лишнее по завершении тестов.
+        '''
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        '''
+        Создаём авторизированного клиента.
+        '''
+        self.authorized_client = Client()
+        self.authorized_client.force_login(PostImageUploadTests.user)
+
+    def create_post(self, image):
+        '''
+        Публикует пост с картинкой.
+        '''
+        return self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Пост с картинкой', 'image': image}
+        )
+
+    @override_settings(UPLOAD_MAX_SIZE=1024)
+    def test_posts_forms_oversize_upload_rejected(self):
+        '''
+        Файл больше UPLOAD_MAX_SIZE не принимается.
+        '''
+        response = self.create_post(
+            uploaded_image('big.png', (100, 100), 'PNG')
+        )
+        self.assertIn('image', response.context['form'].errors)
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=100)
+    def test_posts_forms_too_many_pixels_rejected(self):
+        '''
+        Картинка с большим числом точек не принимается.
+        '''
+        response = self.create_post(
+            uploaded_image('wide.png', (20, 20), 'PNG')
+        )
+        self.assertIn('image', response.context['form'].errors)
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(
+        POST_IMAGE_MAX_PIXELS=1000, POST_IMAGE_MAX_DECODED_PIXELS=100
+    )
+    def test_posts_forms_decoded_pixels_limit(self):
+        '''
+        Картинка, которая декодируется целиком, принимается
+        с меньшим числом точек, чем JPEG.
+        '''
+        response = self.create_post(
+            uploaded_image('wide.png', (20, 20), 'PNG')
+        )
+        self.assertIn('image', response.context['form'].errors)
+        self.create_post(uploaded_image('wide.jpg', (20, 20), 'JPEG'))
+        self.assertTrue(Post.objects.exists())
+
+    @override_settings(POST_IMAGE_MAX_SIDE=100)
+    def test_posts_forms_huge_image_downsampled(self):
+        '''
+        Картинка больше POST_IMAGE_MAX_SIDE уменьшается при публикации.
+        '''
+        self.create_post(uploaded_image('huge.jpg', (400, 200), 'JPEG'))
+        post = Post.objects.get(text='Пост с картинкой')
+        self.assertEqual((post.image.width, post.image.height), (100, 50))
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.format, 'JPEG')
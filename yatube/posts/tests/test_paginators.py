@@ -0,0 +1,313 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post, Group, Follow
+from posts.caching import INDEX_COUNT_KEY
+from posts.paginators import (
+    PAGE_ELLIPSIS, CachedCountPaginator, CursorPaginator, elided_page_range
+)
+
+from yatube.settings import COUNT_OF_PAGE_POST
+
+User = get_user_model()
+
+
+class CursorPaginatorTest(TestCase):
+    '''
+    Класс CursorPaginatorTest.
+    Тестируем курсорный пагинатор.
+    '''
+    @classmethod
+    def setUpClass(cls):
+        '''
+        Создаём посты с одинаковой датой публикации,
+        чтобы порядок определялся только id.
+        '''
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='usertest')
+        cls.count_posts = 25
+        posts = [
+            Post.objects.create(author=cls.user, text=f'Тестовый пост {i}')
+            for i in range(cls.count_posts)
+        ]
+        Post.objects.filter(
+            id__in=[post.id for post in posts[:10]]
+        ).update(pub_date=posts[0].pub_date)
+        cls.expected_ids = list(
+            Post.objects.order_by('-pub_date', '-id').values_list(
+                'id', flat=True
+            )
+        )
+
+    def test_posts_paginators_cursor_walks_forward_and_back(self):
+        '''
+        Проходим все страницы вперёд и назад без пропусков и повторов.
+        '''
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        page = paginator.get_page()
+        self.assertFalse(page.has_previous())
+        forward = []
+        pages = []
+        while True:
+            pages.append(page)
+            forward.extend(post.id for post in page)
+            if not page.has_next():
+                break
+            page = paginator.get_page(page.next_cursor)
+        self.assertEqual(
+            forward, CursorPaginatorTest.expected_ids,
+            'Тест не пройден, курсорные страницы не покрывают все посты'
+        )
+        self.assertEqual(len(pages), 3)
+
+        backward = []
+        while page.has_previous():
+            page = paginator.get_page(page.previous_cursor)
+            backward = [post.id for post in page] + backward
+        self.assertEqual(
+            backward, CursorPaginatorTest.expected_ids[:20],
+            'Тест не пройден, переход назад возвращает не те посты'
+        )
+        self.assertFalse(page.has_previous())
+
+    def test_posts_paginators_cursor_bad_cursor_is_first_page(self):
+        '''
+        Испорченный курсор возвращает первую страницу.
+        '''
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        for cursor in ('', 'garbage', '!!!', 'WyJ4Il0'):
+            with self.subTest(cursor=cursor):
+                page = paginator.get_page(cursor)
+                self.assertEqual(
+                    [post.id for post in page],
+                    CursorPaginatorTest.expected_ids[:10]
+                )
+
+    def test_posts_paginators_cursor_page_no_count_query(self):
+        '''
+        Страница выбирается одним запросом, без COUNT(*).
+        '''
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        cursor = paginator.get_page().next_cursor
+        with self.assertNumQueries(1):
+            page = paginator.get_page(cursor)
+            self.assertEqual(len(page), 10)
+            self.assertTrue(page.has_next())
+            self.assertTrue(page.has_previous())
+
+
+@override_settings(CURSOR_PAGINATION=True)
+class CursorPaginationViewsTest(TestCase):
+    '''
+    Класс CursorPaginationViewsTest.
+    Тестируем ленты в режиме курсорной пагинации.
+    '''
+    @classmethod
+    def setUpClass(cls):
+        '''
+        Создаём полторы страницы постов.
+        '''
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='usertest')
+        cls.follower_user = User.objects.create_user(username='follower_user')
+        cls.group = Group.objects.create(
+            title='Тестовая группа 1',
+            slug='slug-g1',
+            description='Тестовое описание группы 1',
+        )
+        cls.count_posts = int(COUNT_OF_PAGE_POST * 1.5)
+        for i in range(cls.count_posts):
+            Post.objects.create(
+                author=cls.user,
+                text=f'Тестовый пост {i}',
+                group=cls.group
+            )
+        Follow.objects.create(user=cls.follower_user, author=cls.user)
+
+    def setUp(self):
+        '''
+        Создаём авторизированного клиента.
+        '''
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(
+            CursorPaginationViewsTest.follower_user
+        )
+
+    def test_posts_views_cursor_pages(self):
+        '''
+        Первая и вторая страницы всех лент по курсору.
+        '''
+        pages = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'slug-g1'}),
+            reverse('posts:profile', kwargs={'username': 'usertest'}),
+            reverse('posts:follow_index'),
+        )
+        for page in pages:
+            with self.subTest(page=page):
+                response = self.authorized_client.get(page)
+                page_obj = response.context['page_obj']
+                self.assertEqual(len(page_obj), COUNT_OF_PAGE_POST)
+                self.assertContains(
+                    response, f'?cursor={page_obj.next_cursor}'
+                )
+                response = self.authorized_client.get(
+                    page, {'cursor': page_obj.next_cursor}
+                )
+                self.assertEqual(
+                    len(response.context['page_obj']),
+                    CursorPaginationViewsTest.count_posts - COUNT_OF_PAGE_POST
+                )
+                self.assertFalse(response.context['page_obj'].has_next())
+
+
+class CachedCountPaginatorTest(TestCase):
+    '''
+    Класс CachedCountPaginatorTest.
+    Тестируем число постов из кеша и окно номеров страниц.
+    '''
+    @classmethod
+    def setUpClass(cls):
+        '''
+        Создаём 30 постов.
+        '''
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='usertest')
+        for i in range(30):
+            Post.objects.create(author=cls.user, text=f'Тестовый пост {i}')
+
+    def setUp(self):
+        '''
+        Очищаем кеш и создаём гостевого клиента.
+        '''
+        cache.clear()
+        self.guest_client = Client()
+
+    @override_settings(ESTIMATED_COUNT_THRESHOLD=10)
+    def test_posts_paginators_count_cached_above_threshold(self):
+        '''
+        Число записей больше порога считается один раз
+        и берётся из кеша.
+        '''
+        paginator = CachedCountPaginator(Post.objects.all(), 10, 'count')
+        self.assertEqual(paginator.count, 30)
+        Post.objects.create(
+            author=CachedCountPaginatorTest.user, text='Новый пост'
+        )
+        paginator = CachedCountPaginator(Post.objects.all(), 10, 'count')
+        with self.assertNumQueries(0):
+            self.assertEqual(paginator.count, 30)
+        cache.delete('count')
+        paginator = CachedCountPaginator(Post.objects.all(), 10, 'count')
+        self.assertEqual(paginator.count, 31)
+
+    @override_settings(ESTIMATED_COUNT_THRESHOLD=10)
+    def test_posts_paginators_low_count_keeps_next_pages(self):
+        '''
+        Заниженное число записей не обрезает последнюю по нему
+        страницу и не скрывает следующие.
+        '''
+        cache.set('count', 15)
+        paginator = CachedCountPaginator(Post.objects.all(), 10, 'count')
+        self.assertEqual(paginator.num_pages, 2)
+        page = paginator.get_page(2)
+        self.assertEqual(len(page), 10)
+        self.assertTrue(page.has_next())
+        self.assertEqual(page.next_page_number(), 3)
+        page = paginator.get_page(3)
+        self.assertEqual(len(page), 10)
+        self.assertFalse(page.has_next())
+        self.assertEqual(paginator.get_page(4).number, 1)
+
+    def test_posts_paginators_count_exact_below_threshold(self):
+        '''
+        Небольшие ленты считаются точно: в кеше лежит только
+        признак небольшой ленты.
+        '''
+        paginator = CachedCountPaginator(Post.objects.all(), 10, 'count')
+        self.assertEqual(paginator.count, 30)
+        self.assertEqual(cache.get('count'), 0)
+        Post.objects.create(
+            author=CachedCountPaginatorTest.user, text='Новый пост'
+        )
+        paginator = CachedCountPaginator(Post.objects.all(), 10, 'count')
+        self.assertEqual(paginator.count, 31)
+
+    @override_settings(
+        COUNT_OF_PAGE_POST=1, ESTIMATED_COUNT_THRESHOLD=10, PAGE_WINDOW=2
+    )
+    def test_posts_paginators_index_page_window(self):
+        '''
+        Главная страница берёт число постов из кеша и выводит
+        номера только соседних, первой и последней страниц.
+        '''
+        response = self.guest_client.get(
+            reverse('posts:index'), {'page': 10}
+        )
+        self.assertEqual(cache.get(INDEX_COUNT_KEY), 30)
+        self.assertEqual(response.context['page_obj'].paginator.num_pages, 30)
+        for number in (8, 9, 11, 12):
+            self.assertContains(response, f'?page={number}"')
+        for number in (2, 7, 13, 29):
+            self.assertNotContains(response, f'?page={number}"')
+        self.assertContains(response, '?page=1"')
+        self.assertContains(response, '?page=30"')
+        self.assertContains(response, PAGE_ELLIPSIS, count=2)
+
+
+class ElidedPageRangeTest(TestCase):
+    '''
+    Класс ElidedPageRangeTest.
+    Тестируем номера страниц с многоточиями.
+    '''
+    def test_posts_paginators_elided_page_range(self):
+        '''
+        Первая, последняя и соседние с текущей страницы,
+        пропуски больше одной страницы заменены многоточием.
+        '''
+        cases = {
+            (1, 5): [1, 2, 3, 4, 5],
+            (1, 100): [1, 2, 3, PAGE_ELLIPSIS, 100],
+            (4, 100): [1, 2, 3, 4, 5, 6, PAGE_ELLIPSIS, 100],
+            (5, 100): [1, 2, 3, 4, 5, 6, 7, PAGE_ELLIPSIS, 100],
+            (6, 100): [1, PAGE_ELLIPSIS, 4, 5, 6, 7, 8, PAGE_ELLIPSIS, 100],
+            (50, 100): [1, PAGE_ELLIPSIS, 48, 49, 50, 51, 52,
+                        PAGE_ELLIPSIS, 100],
+            (97, 100): [1, PAGE_ELLIPSIS, 95, 96, 97, 98, 99, 100],
+            (500, 100): [1, PAGE_ELLIPSIS, 98, 99, 100],
+        }
+        for (number, num_pages), expected in cases.items():
+            with self.subTest(number=number, num_pages=num_pages):
+                self.assertEqual(
+                    elided_page_range(number, num_pages, 2, 1), expected
+                )
+
+    def test_posts_paginators_elided_page_range_settings(self):
+        '''
+        Номера не повторяются при любых on_each_side и on_ends.
+        '''
+        cases = {
+            (1, 8, 0, 2): [1, 2, PAGE_ELLIPSIS, 7, 8],
+            (8, 8, 0, 2): [1, 2, PAGE_ELLIPSIS, 7, 8],
+            (4, 8, 0, 2): [1, 2, 3, 4, PAGE_ELLIPSIS, 7, 8],
+            (5, 12, 1, 2): [1, 2, 3, 4, 5, 6, PAGE_ELLIPSIS, 11, 12],
+            (2, 20, 3, 0): [1, 2, 3, 4, 5, PAGE_ELLIPSIS],
+            (10, 20, 1, 0): [PAGE_ELLIPSIS, 9, 10, 11, PAGE_ELLIPSIS],
+        }
+        for arguments, expected in cases.items():
+            with self.subTest(arguments=arguments):
+                self.assertEqual(elided_page_range(*arguments), expected)
+
+    def test_posts_paginators_elided_page_range_is_bounded(self):
+        '''
+        Число номеров не зависит от числа страниц.
+        '''
+        for num_pages in (10 ** 3, 10 ** 6):
+            with self.subTest(num_pages=num_pages):
+                self.assertLessEqual(
+                    len(elided_page_range(num_pages // 2, num_pages, 3, 1)),
+                    11
+                )
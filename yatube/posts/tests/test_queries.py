@@ -0,0 +1,213 @@
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.caching import INDEX_COUNT_KEY
+from posts.following import get_following
+from posts.models import Comment, Post, Group, Follow
+
+from yatube.settings import COUNT_OF_PAGE_POST
+
+User = get_user_model()
+
+
+class PostsFeedQueriesTest(TestCase):
+    '''
+    Класс PostsFeedQueriesTest.
+    Число запросов к БД у лент не зависит от числа постов на странице.
+    '''
+    # Бюджет запросов на страницу ленты:
+    # сессия и пользователь (для авторизованного клиента),
+    # объект страницы (группа, автор), счётчики автора,
+    # COUNT пагинатора там, где нет счётчика, и выборка самих постов.
+    # Статистику таблицы постов главная страница читает один раз
+    # в PAGINATOR_COUNT_TIMEOUT секунд, лента подписок берёт авторов
+    # из кеша подписок - в бюджет эти запросы не входят.
+    QUERY_BUDGET = {
+        'posts:index': 2,
+        'posts:group_list': 2,
+        'posts:profile': 3,
+        'posts:follow_index': 4,
+    }
+
+    @classmethod
+    def setUpClass(cls):
+        '''
+        Создаём авторов, группу, подписку и полную страницу постов.
+        '''
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='usertest', first_name='Имя', last_name='Фамилия'
+        )
+        cls.follower_user = User.objects.create_user(username='follower_user')
+        cls.group = Group.objects.create(
+            title='Тестовая группа 1',
+            slug='slug-g1',
+            description='Тестовое описание группы 1',
+        )
+        for i in range(COUNT_OF_PAGE_POST):
+            Post.objects.create(
+                author=cls.user,
+                text=f'Тестовый пост {i}',
+                group=cls.group
+            )
+        Follow.objects.create(user=cls.follower_user, author=cls.user)
+
+    def setUp(self):
+        '''
+        Создаём гостевого и авторизированного клиента.
+        '''
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(
+            PostsFeedQueriesTest.follower_user
+        )
+
+    def check_budget(self, client, view_name, kwargs=None):
+        '''
+        Страница ленты укладывается в бюджет запросов.
+        '''
+        url = reverse(view_name, kwargs=kwargs)
+        with self.assertNumQueries(self.QUERY_BUDGET[view_name]):
+            response = client.get(url)
+        self.assertEqual(
+            len(response.context['page_obj']), COUNT_OF_PAGE_POST
+        )
+
+    def test_posts_queries_index(self):
+        '''
+        Главная страница.
+        '''
+        cache.set(INDEX_COUNT_KEY, 0)
+        self.check_budget(self.guest_client, 'posts:index')
+
+    def test_posts_queries_group_list(self):
+        '''
+        Страница сообщества.
+        '''
+        self.check_budget(
+            self.guest_client, 'posts:group_list', {'slug': 'slug-g1'}
+        )
+
+    def test_posts_queries_profile(self):
+        '''
+        Страница пользователя.
+        '''
+        self.check_budget(
+            self.guest_client, 'posts:profile', {'username': 'usertest'}
+        )
+
+    def test_posts_queries_follow_index(self):
+        '''
+        Лента подписок.
+        '''
+        get_following(PostsFeedQueriesTest.follower_user.id)
+        self.check_budget(self.authorized_client, 'posts:follow_index')
+
+    def test_posts_queries_feed_does_not_load_relations(self):
+        '''
+        Поля, которые выводит карточка поста, не требуют новых запросов.
+        '''
+        posts = list(Post.objects.for_feed()[:COUNT_OF_PAGE_POST])
+        with self.assertNumQueries(0):
+            for post in posts:
+                post.author.get_full_name()
+                post.author.username
+                post.group.slug
+
+
+@skipUnless(connection.vendor == 'sqlite', 'План запроса в формате SQLite')
+class PostsFeedPlansTest(TestCase):
+    '''
+    Класс PostsFeedPlansTest.
+    Ленты сортируются по индексу, а не во временном B-дереве.
+    Лента подписок сюда не входит: в ней посты нескольких авторов,
+    и порядок не берётся из одного индекса (его даёт FOLLOW_TIMELINE).
+    '''
+    FEED_TABLES = ('"posts_post"', '"posts_comment"')
+
+    @classmethod
+    def setUpClass(cls):
+        '''
+        Создаём автора, группу, пост и комментарий.
+        '''
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='usertest')
+        cls.group = Group.objects.create(
+            title='Тестовая группа 1',
+            slug='slug-g1',
+            description='Тестовое описание группы 1',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, text='Тестовый пост', group=cls.group
+        )
+        Comment.objects.create(
+            post=cls.post, author=cls.user, text='Комментарий'
+        )
+
+    def setUp(self):
+        '''
+        Очищаем кеш и создаём гостевого клиента.
+        '''
+        cache.clear()
+        self.guest_client = Client()
+
+    def feed_plans(self, url):
+        '''
+        Планы сортирующих запросов к постам и комментариям страницы.
+        '''
+        with CaptureQueriesContext(connection) as context:
+            self.guest_client.get(url)
+        plans = {}
+        with connection.cursor() as cursor:
+            for query in context.captured_queries:
+                sql = query['sql']
+                if 'ORDER BY' not in sql:
+                    continue
+                if not any(table in sql for table in self.FEED_TABLES):
+                    continue
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                plans[sql] = [row[-1] for row in cursor.fetchall()]
+        return plans
+
+    def check_plans(self):
+        '''
+        Ни одна страница не сортирует посты во временном B-дереве.
+        '''
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'slug-g1'}),
+            reverse('posts:profile', kwargs={'username': 'usertest'}),
+            reverse(
+                'posts:post_detail',
+                kwargs={'post_id': PostsFeedPlansTest.post.id}
+            ),
+        )
+        for url in urls:
+            plans = self.feed_plans(url)
+            self.assertTrue(plans, f'Нет запросов ленты на {url}')
+            for sql, plan in plans.items():
+                with self.subTest(url=url, sql=sql):
+                    self.assertFalse(
+                        [step for step in plan if 'TEMP B-TREE' in step],
+                        f'Тест не пройден, сортировка без индекса: {plan}'
+                    )
+
+    def test_posts_plans_offset_pagination(self):
+        '''
+        Постраничный вывод по номеру страницы.
+        '''
+        self.check_plans()
+
+    @override_settings(CURSOR_PAGINATION=True)
+    def test_posts_plans_cursor_pagination(self):
+        '''
+        Постраничный вывод по курсору.
+        '''
+        self.check_plans()
@@ -0,0 +1,191 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+from posts.search import search_ids
+from posts.stemmer import stem
+
+User = get_user_model()
+
+
+class StemmerTest(TestCase):
+    '''
+    Класс StemmerTest.
+    Тестируем русский стеммер.
+    '''
+    def test_posts_search_stemmer_word_forms(self):
+        '''
+        Формы одного слова сводятся к одной основе.
+        '''
+        forms = {
+            'книг': ('книга', 'книги', 'книгами', 'Книгу'),
+            'красив': ('красивая', 'красивые', 'красивейший'),
+            'дела': ('делавшись',),
+            'нежност': ('нежность', 'нежности'),
+            'елк': ('ёлки', 'Ёлками'),
+        }
+        for expected, words in forms.items():
+            for word in words:
+                with self.subTest(word=word):
+                    self.assertEqual(stem(word), expected)
+
+    def test_posts_search_stemmer_keeps_latin(self):
+        '''
+        Слова без кириллицы не меняются.
+        '''
+        self.assertEqual(stem('Django'), 'django')
+        self.assertEqual(stem('2021'), '2021')
+
+
+class PostSearchTest(TestCase):
+    '''
+    Класс PostSearchTest.
+    Тестируем поиск постов по полнотекстовому индексу.
+    '''
+    @classmethod
+    def setUpClass(cls):
+        '''
+        Создаём посты с разными формами слов.
+        '''
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='usertest')
+        cls.about_books = Post.objects.create(
+            author=cls.user, text='Книги о программировании на Python'
+        )
+        cls.new_book = Post.objects.create(
+            author=cls.user, text='Купил новую книгу про программирование'
+        )
+        cls.about_cats = Post.objects.create(
+            author=cls.user, text='Про котов и кошек'
+        )
+
+    def setUp(self):
+        '''
+        Очищаем кеш и создаём гостевого клиента.
+        '''
+        cache.clear()
+        self.guest_client = Client()
+
+    def search(self, query, **params):
+        '''
+        Страница поиска по запросу query.
+        '''
+        return self.guest_client.get(
+            reverse('posts:search'), {'q': query, **params}
+        )
+
+    def test_posts_search_finds_word_forms(self):
+        '''
+        Поиск находит посты с любой формой слова.
+        '''
+        response = self.search('книга')
+        self.assertEqual(
+            set(response.context['page_obj']),
+            {PostSearchTest.about_books, PostSearchTest.new_book},
+            'Тест не пройден, поиск не учитывает формы слов'
+        )
+        self.assertEqual(response.context['page_obj'].paginator.count, 2)
+
+    def test_posts_search_all_words_required(self):
+        '''
+        Пост подходит, если в нём есть все слова запроса.
+        '''
+        self.assertEqual(
+            search_ids('книги python'), [PostSearchTest.about_books.id]
+        )
+        self.assertEqual(search_ids('книги коты'), [])
+        self.assertEqual(search_ids('   '), [])
+
+    def test_posts_search_index_follows_posts(self):
+        '''
+        Индекс обновляется при изменении и удалении поста.
+        '''
+        post = Post.objects.get(pk=PostSearchTest.about_cats.pk)
+        post.text = 'Про собак'
+        post.save()
+        self.assertEqual(search_ids('кошки'), [])
+        self.assertEqual(search_ids('собака'), [post.id])
+        post_id = post.id
+        post.delete()
+        self.assertEqual(search_ids('собака'), [])
+        self.assertFalse(Post.objects.filter(pk=post_id).exists())
+
+    def test_posts_search_empty_query(self):
+        '''
+        Пустой запрос показывает форму без результатов.
+        '''
+        response = self.search('')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['page_obj']), 0)
+
+    @override_settings(COUNT_OF_PAGE_POST=1)
+    def test_posts_search_paginated(self):
+        '''
+        Результаты разбиваются на страницы, ссылки на страницы
+        сохраняют запрос.
+        '''
+        response = self.search('программирование')
+        self.assertEqual(len(response.context['page_obj']), 1)
+        self.assertContains(response, '?q=%D0%BF%D1%80%D0%BE%D0%B3')
+        second = self.search('программирование', page=2)
+        self.assertEqual(
+            set(response.context['page_obj'])
+            | set(second.context['page_obj']),
+            {PostSearchTest.about_books, PostSearchTest.new_book}
+        )
+
+    def test_posts_search_rebuild_command(self):
+        '''
+        Команда rebuild_search_index строит индекс заново.
+        '''
+        Post.objects.filter(pk=PostSearchTest.about_cats.pk).update(
+            text='Про попугаев'
+        )
+        self.assertEqual(search_ids('попугай'), [])
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn(
+            f'Проиндексировано постов: {Post.objects.count()}',
+            out.getvalue()
+        )
+        self.assertEqual(
+            search_ids('попугаи'), [PostSearchTest.about_cats.id]
+        )
+
+    def test_posts_search_admin_uses_index(self):
+        '''
+        Поиск в админке идёт по индексу, а не по LIKE:
+        «книгами» нет ни в одном тексте.
+        '''
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin'
+        )
+        self.guest_client.force_login(admin)
+        response = self.guest_client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'книгами'}
+        )
+        self.assertEqual(
+            set(response.context['cl'].result_list),
+            {PostSearchTest.about_books, PostSearchTest.new_book}
+        )
+
+    @override_settings(SEARCH_MAX_RESULTS=1)
+    def test_posts_search_admin_not_limited(self):
+        '''
+        Админка показывает все найденные посты, а не первые
+        SEARCH_MAX_RESULTS.
+        '''
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin'
+        )
+        self.guest_client.force_login(admin)
+        response = self.guest_client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'книгами'}
+        )
+        self.assertEqual(len(search_ids('книгами')), 1)
+        self.assertEqual(len(response.context['cl'].result_list), 2)
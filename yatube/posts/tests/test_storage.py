@@ -0,0 +1,254 @@
+import os
+import shutil
+import tempfile
+import time
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import (
+    Client, TestCase, TransactionTestCase, override_settings
+)
+from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail import default
+
+from posts.models import Post
+from posts.storage import post_image_storage, release_image
+from posts.thumbnails import (
+    POST_THUMBNAIL_GEOMETRY, POST_THUMBNAIL_OPTIONS, variant_name
+)
+
+User = get_user_model()
+
+# Временная папка для медиа файлов
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def png_content(size, color=(200, 0, 0)):
+    '''
+    Содержимое картинки PNG.
+    '''
+    buffer = BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def uploaded_png(name, content):
+    '''
+    Картинка PNG для поля image.
+    '''
+    return SimpleUploadedFile(
+        name=name, content=content, content_type='image/png'
+    )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ContentAddressedStorageTest(TestCase):
+    '''
+    Класс ContentAddressedStorageTest.
+    Одинаковые картинки постов хранятся одним файлом.
+    '''
+    @classmethod
+    def setUpClass(cls):
+        '''
+        Создаём автора.
+        '''
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='usertest')
+
+    @classmethod
+    def tearDownClass(cls):
+        '''
+        Удаляем лишнее по завершении тестов.
+        '''
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        '''
+        Очищаем кеш и создаём клиента автора.
+        '''
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(ContentAddressedStorageTest.user)
+
+    def test_posts_storage_same_image_stored_once(self):
+        '''
+        Повторно загруженная картинка не сохраняется второй раз,
+        второй пост получает готовые миниатюру и варианты.
+        '''
+        content = png_content((700, 300))
+        for number, name in enumerate(('meme.png', 'repost.png')):
+            self.authorized_client.post(
+                reverse('posts:post_create'),
+                data={
+                    'text': f'Пост {number}',
+                    'image': uploaded_png(name, content)
+                }
+            )
+        first = Post.objects.get(text='Пост 0')
+        second = Post.objects.get(text='Пост 1')
+        self.assertEqual(
+            first.image.name, second.image.name,
+            'Тест не пройден, одинаковые картинки сохранены под разными '
+            'именами'
+        )
+        directory = os.path.dirname(
+            post_image_storage.path(first.image.name)
+        )
+        self.assertEqual(len(os.listdir(directory)), 1)
+        self.assertEqual(second.image_widths, '320,640')
+        self.assertIsNotNone(default.backend.get_ready_thumbnail(
+            second.image.name,
+            POST_THUMBNAIL_GEOMETRY,
+            **POST_THUMBNAIL_OPTIONS
+        ))
+
+    def test_posts_storage_dedupe_command(self):
+        '''
+        Команда dedupe_images переносит картинки под имена по
+        содержимому и сводит одинаковые к одному файлу.
+        '''
+        legacy_storage = FileSystemStorage()
+        content = png_content((400, 200), (0, 0, 200))
+        legacy = [
+            legacy_storage.save(name, ContentFile(content))
+            for name in ('posts/a.png', 'posts/b.png')
+        ]
+        posts = [
+            Post.objects.create(
+                author=ContentAddressedStorageTest.user,
+                text='Старый пост',
+                image=name
+            )
+            for name in legacy
+        ]
+        out = StringIO()
+        call_command('dedupe_images', stdout=out)
+        self.assertIn(
+            'Перенесено: 1, объединено с одинаковыми: 1', out.getvalue()
+        )
+        for post in posts:
+            post.refresh_from_db()
+        self.assertEqual(posts[0].image.name, posts[1].image.name)
+        self.assertTrue(
+            post_image_storage.is_content_addressed(posts[0].image.name)
+        )
+        self.assertTrue(post_image_storage.exists(posts[0].image.name))
+        for name in legacy:
+            self.assertFalse(
+                legacy_storage.exists(name),
+                f'Тест не пройден, файл {name} не удалён'
+            )
+        out = StringIO()
+        call_command('dedupe_images', stdout=out)
+        self.assertIn(
+            'Перенесено: 0, объединено с одинаковыми: 0', out.getvalue()
+        )
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0,
+    POST_IMAGE_RELEASE_DELAY=0
+)
+class ReleaseImageTest(TransactionTestCase):
+    '''
+    Класс ReleaseImageTest.
+    Картинка удаляется, когда на неё не ссылается ни один пост.
+    Удаление выполняется после фиксации транзакции,
+    поэтому тест выполняется без общей транзакции.
+    '''
+    def setUp(self):
+        '''
+        Очищаем кеш и создаём автора.
+        '''
+        cache.clear()
+        self.user = User.objects.create_user(username='usertest')
+
+    @classmethod
+    def tearDownClass(cls):
+        '''
+        Удаляем лишнее по завершении тестов.
+        '''
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, content):
+        '''
+        Пост с картинкой и её вариантами.
+        '''
+        post = Post.objects.create(
+            author=self.user,
+            text='Тестовый пост',
+            image=uploaded_png('image.png', content)
+        )
+        call_command('warm_thumbnails', stdout=StringIO())
+        return post
+
+    def test_posts_storage_released_after_last_post(self):
+        '''
+        Файл, миниатюры и варианты удаляются вместе с последним
+        постом, который на них ссылается.
+        '''
+        content = png_content((400, 200))
+        first = self.create_post(content)
+        second = self.create_post(content)
+        name = first.image.name
+        variant = variant_name(name, 320, 'jpg')
+        self.assertTrue(default_storage.exists(variant))
+        first.delete()
+        self.assertTrue(
+            post_image_storage.exists(name),
+            'Тест не пройден, удалена картинка, на которую ссылается пост'
+        )
+        second.delete()
+        self.assertFalse(post_image_storage.exists(name))
+        self.assertFalse(default_storage.exists(variant))
+
+    def test_posts_storage_released_on_replace(self):
+        '''
+        Заменённая при редактировании картинка удаляется.
+        '''
+        post = self.create_post(png_content((400, 200)))
+        old_name = post.image.name
+        post.image = uploaded_png('new.png', png_content((300, 200)))
+        post.save()
+        self.assertFalse(post_image_storage.exists(old_name))
+        self.assertTrue(post_image_storage.exists(post.image.name))
+
+    @override_settings(POST_IMAGE_RELEASE_DELAY=60)
+    def test_posts_storage_release_delayed_for_reupload(self):
+        '''
+        Недавно сохранённая картинка удаляемого поста не удаляется
+        сразу: её могли только что загрузить в новый пост.
+        '''
+        content = png_content((400, 200))
+        with mock.patch('posts.storage.schedule_release') as schedule:
+            post = self.create_post(content)
+            name = post.image.name
+            post.delete()
+            self.assertTrue(
+                post_image_storage.exists(name),
+                'Тест не пройден, удалена картинка, которую могли '
+                'загрузить повторно'
+            )
+            schedule.assert_called_once()
+            self.assertEqual(schedule.call_args[0][0], name)
+            path = post_image_storage.path(name)
+            old = time.time() - 120
+            os.utime(path, (old, old))
+            self.create_post(content)
+            self.assertGreater(os.path.getmtime(path), old)
+            self.assertFalse(release_image(name))
+            self.assertTrue(post_image_storage.exists(name))
+            Post.objects.all().delete()
+            os.utime(path, (old, old))
+            self.assertTrue(release_image(name))
+        self.assertFalse(post_image_storage.exists(name))
@@ -0,0 +1,293 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import (
+    Client, TestCase, TransactionTestCase, override_settings
+)
+from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail import default
+
+from posts.caching import get_feed_generation
+from posts.models import Post
+from posts.thumbnails import (
+    POST_IMAGE_FORMATS, POST_THUMBNAIL_GEOMETRY, POST_THUMBNAIL_OPTIONS,
+    variant_name, wait_thumbnails
+)
+
+User = get_user_model()
+
+# Временная папка для медиа файлов
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def uploaded_gif(name='small.gif'):
+    '''
+    Картинка для поля image.
+    '''
+    return SimpleUploadedFile(
+        name=name, content=SMALL_GIF, content_type='image/gif'
+    )
+
+
+def uploaded_png(name, size):
+    '''
+    Картинка PNG размера size для поля image.
+    '''
+    buffer = BytesIO()
+    Image.new('RGB', size, (200, 0, 0)).save(buffer, 'PNG')
+    return SimpleUploadedFile(
+        name=name, content=buffer.getvalue(), content_type='image/png'
+    )
+
+
+def ready_thumbnail(post):
+    '''
+    Готовая миниатюра картинки поста или None.
+    '''
+    return default.backend.get_ready_thumbnail(
+        post.image.name, POST_THUMBNAIL_GEOMETRY, **POST_THUMBNAIL_OPTIONS
+    )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=1)
+class BackgroundThumbnailTest(TransactionTestCase):
+    '''
+    Класс BackgroundThumbnailTest.
+    Страница не ждёт создания миниатюр.
+    Поток пула видит только зафиксированные данные,
+    поэтому тест выполняется без общей транзакции, а база
+    в памяти выдаётся за файловую, чтобы пул не отключался.
+    '''
+    def run(self, result=None):
+        '''
+        Тесты выполняются с пулом потоков.
+        '''
+        with mock.patch('posts.thumbnails.in_memory_db', return_value=False):
+            return super().run(result)
+
+    def setUp(self):
+        '''
+        Очищаем кеш, создаём автора и его клиента.
+        '''
+        cache.clear()
+        self.user = User.objects.create_user(username='usertest')
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    @classmethod
+    def tearDownClass(cls):
+        '''
+        Удаляем лишнее по завершении тестов.
+        '''
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_posts_thumbnails_placeholder_until_ready(self):
+        '''
+        Пока миниатюры нет, страница выводит заглушку.
+        '''
+        post = Post.objects.create(
+            author=self.user, text='Тестовый пост', image=uploaded_gif()
+        )
+        url = reverse('posts:post_detail', kwargs={'post_id': post.id})
+        response = self.authorized_client.get(url)
+        self.assertContains(response, 'aspect-ratio')
+        wait_thumbnails()
+        thumbnail = ready_thumbnail(post)
+        self.assertIsNotNone(thumbnail)
+        response = self.authorized_client.get(url)
+        self.assertContains(response, thumbnail.url)
+        self.assertNotContains(response, 'aspect-ratio')
+
+    def test_posts_thumbnails_pregenerated_on_create(self):
+        '''
+        Миниатюра создаётся при публикации поста с картинкой.
+        '''
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Пост с картинкой', 'image': uploaded_gif()}
+        )
+        wait_thumbnails()
+        post = Post.objects.get(text='Пост с картинкой')
+        self.assertIsNotNone(
+            ready_thumbnail(post),
+            'Тест не пройден, миниатюра не создана при публикации'
+        )
+
+    def test_posts_thumbnails_generated_in_pool(self):
+        '''
+        Миниатюра создаётся в потоке пула.
+        '''
+        post = Post.objects.create(
+            author=self.user, text='Тестовый пост', image=uploaded_gif()
+        )
+        default.backend.submit(
+            post.image.name, POST_THUMBNAIL_GEOMETRY, POST_THUMBNAIL_OPTIONS
+        )
+        wait_thumbnails()
+        self.assertIsNotNone(ready_thumbnail(post))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class WarmThumbnailsCommandTest(TestCase):
+    '''
+    Класс WarmThumbnailsCommandTest.
+    Тестируем команду warm_thumbnails.
+    '''
+    @classmethod
+    def setUpClass(cls):
+        '''
+        Создаём посты с картинками и без.
+        '''
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='usertest')
+        cls.post = Post.objects.create(
+            author=cls.user, text='Тестовый пост 1', image=uploaded_gif()
+        )
+        Post.objects.create(author=cls.user, text='Тестовый пост 2')
+
+    @classmethod
+    def tearDownClass(cls):
+        '''
+        Удаляем лишнее по завершении тестов.
+        '''
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        '''
+        Очищаем кеш.
+        '''
+        cache.clear()
+
+    def test_posts_thumbnails_warm_command(self):
+        '''
+        Команда создаёт недостающие миниатюры и пропускает готовые.
+        '''
+        self.assertIsNone(ready_thumbnail(self.post))
+        out = StringIO()
+        call_command('warm_thumbnails', stdout=out)
+        self.assertIn('Создано: 1, уже были: 0', out.getvalue())
+        self.assertIsNotNone(ready_thumbnail(self.post))
+        out = StringIO()
+        call_command('warm_thumbnails', stdout=out)
+        self.assertIn('Создано: 0, уже были: 1', out.getvalue())
+
+    def test_posts_thumbnails_warm_command_bumps_feeds_once(self):
+        '''
+        Поколение лент меняется один раз за запуск команды,
+        а не после каждой картинки.
+        '''
+        Post.objects.create(
+            author=WarmThumbnailsCommandTest.user, text='Тестовый пост 3',
+            image=uploaded_png('other.png', (40, 20))
+        )
+        generation = get_feed_generation()
+        call_command('warm_thumbnails', stdout=StringIO())
+        self.assertEqual(get_feed_generation(), generation + 1)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ImageVariantsTest(TestCase):
+    '''
+    Класс ImageVariantsTest.
+    Тестируем варианты картинки поста для srcset.
+    '''
+    @classmethod
+    def setUpClass(cls):
+        '''
+        Создаём автора.
+        '''
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='usertest')
+
+    @classmethod
+    def tearDownClass(cls):
+        '''
+        Удаляем лишнее по завершении тестов.
+        '''
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        '''
+        Очищаем кеш и создаём клиента автора.
+        '''
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(ImageVariantsTest.user)
+
+    def test_posts_thumbnails_variants_in_srcset(self):
+        '''
+        При публикации создаются варианты не шире оригинала,
+        страница поста выводит их в srcset.
+        '''
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={
+                'text': 'Пост с картинкой',
+                'image': uploaded_png('wide.png', (1000, 500))
+            }
+        )
+        post = Post.objects.get(text='Пост с картинкой')
+        self.assertEqual(post.image_widths, '320,640,960')
+        for width in (320, 640, 960):
+            for extension, _, _ in POST_IMAGE_FORMATS:
+                name = variant_name(post.image.name, width, extension)
+                self.assertTrue(
+                    default_storage.exists(name),
+                    f'Тест не пройден, нет варианта {name}'
+                )
+        with default_storage.open(
+            variant_name(post.image.name, 320, 'jpg')
+        ) as variant:
+            self.assertEqual(Image.open(variant).size, (320, 113))
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.id})
+        )
+        self.assertContains(response, '<picture>')
+        self.assertContains(
+            response,
+            default_storage.url(variant_name(post.image.name, 640, 'jpg'))
+            + ' 640w'
+        )
+
+    def test_posts_thumbnails_variants_replaced_on_edit(self):
+        '''
+        Новая картинка при редактировании получает свои варианты.
+        '''
+        post = Post.objects.create(
+            author=ImageVariantsTest.user,
+            text='Тестовый пост',
+            image=uploaded_png('old.png', (700, 300)),
+            image_widths='320,640'
+        )
+        old_name = post.image.name
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.id}),
+            data={
+                'text': 'Тестовый пост',
+                'image': uploaded_png('new.png', (400, 200))
+            }
+        )
+        post.refresh_from_db()
+        self.assertNotEqual(post.image.name, old_name)
+        self.assertEqual(post.image_widths, '320')
@@ -0,0 +1,277 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post, Follow
+from posts.timeline import (
+    get_timeline, refresh_celebrities, timeline_key, update_timelines
+)
+
+User = get_user_model()
+
+
+def commit():
+    '''
+    Выполняет отложенное до фиксации транзакции: TestCase
+    её не фиксирует.
+    '''
+    callbacks, connection.run_on_commit = connection.run_on_commit, []
+    for _, func in callbacks:
+        func()
+
+
+@override_settings(FOLLOW_TIMELINE=True)
+class HomeTimelineTest(TestCase):
+    '''
+    Класс HomeTimelineTest.
+    Тестируем материализованную ленту подписок.
+    '''
+    @classmethod
+    def setUpClass(cls):
+        '''
+        Создаём авторов, подписчика и посты.
+        '''
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.other_author = User.objects.create_user(username='other_author')
+        cls.follower = User.objects.create_user(username='follower')
+        cls.post = Post.objects.create(author=cls.author, text='Пост 1')
+        cls.other_post = Post.objects.create(
+            author=cls.other_author, text='Пост 2'
+        )
+        Follow.objects.create(user=cls.follower, author=cls.author)
+
+    def setUp(self):
+        '''
+        Очищаем кеш и создаём клиента подписчика.
+        '''
+        cache.clear()
+        self.follower_client = Client()
+        self.follower_client.force_login(HomeTimelineTest.follower)
+
+    def timeline_post_ids(self):
+        '''
+        id постов в ленте подписчика.
+        '''
+        return [entry[1] for entry in get_timeline(self.follower.id)]
+
+    def test_posts_timeline_built_on_first_read(self):
+        '''
+        Лента собирается из БД при первом чтении.
+        '''
+        self.assertIsNone(cache.get(timeline_key(self.follower.id)))
+        response = self.follower_client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            list(response.context['page_obj']), [HomeTimelineTest.post]
+        )
+        self.assertIsNotNone(cache.get(timeline_key(self.follower.id)))
+
+    def test_posts_timeline_new_post_fanned_out(self):
+        '''
+        Новый пост автора попадает в ленту подписчика.
+        '''
+        self.timeline_post_ids()
+        new_post = Post.objects.create(
+            author=HomeTimelineTest.author, text='Пост 3'
+        )
+        self.assertEqual(self.timeline_post_ids(), [HomeTimelineTest.post.id])
+        commit()
+        self.assertEqual(
+            self.timeline_post_ids(), [new_post.id, HomeTimelineTest.post.id]
+        )
+        response = self.follower_client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.context['page_obj'][0], new_post)
+
+    def test_posts_timeline_deleted_post_removed(self):
+        '''
+        Удалённый пост пропадает из ленты.
+        '''
+        new_post = Post.objects.create(
+            author=HomeTimelineTest.author, text='Пост 3'
+        )
+        commit()
+        self.timeline_post_ids()
+        new_post.delete()
+        commit()
+        self.assertEqual(
+            self.timeline_post_ids(), [HomeTimelineTest.post.id]
+        )
+
+    def test_posts_timeline_follow_backfill_and_unfollow_prune(self):
+        '''
+        Подписка дополняет ленту постами автора, отписка их убирает.
+        '''
+        self.timeline_post_ids()
+        self.follower_client.get(
+            reverse(
+                'posts:profile_follow',
+                kwargs={'username': 'other_author'}
+            )
+        )
+        commit()
+        self.assertEqual(
+            self.timeline_post_ids(),
+            [HomeTimelineTest.other_post.id, HomeTimelineTest.post.id]
+        )
+        self.follower_client.get(
+            reverse(
+                'posts:profile_unfollow',
+                kwargs={'username': 'other_author'}
+            )
+        )
+        commit()
+        self.assertEqual(
+            self.timeline_post_ids(), [HomeTimelineTest.post.id]
+        )
+
+    def test_posts_timeline_rolled_back_post_not_fanned_out(self):
+        '''
+        Пост из отменённой транзакции не попадает в ленту.
+        '''
+        self.timeline_post_ids()
+        try:
+            with transaction.atomic():
+                Post.objects.create(
+                    author=HomeTimelineTest.author, text='Пост 3'
+                )
+                raise ValueError
+        except ValueError:
+            pass
+        commit()
+        self.assertEqual(self.timeline_post_ids(), [HomeTimelineTest.post.id])
+
+    def test_posts_timeline_concurrent_updates(self):
+        '''
+        Изменение, прочитавшее ленту до параллельного изменения,
+        не затирает его: лента собирается заново. Изменения
+        не продлевают время хранения ленты.
+        '''
+        follower_id = HomeTimelineTest.follower.id
+        self.timeline_post_ids()
+        key = timeline_key(follower_id)
+        read_before = cache.get(key)
+        first, second = (
+            Post.objects.create(author=HomeTimelineTest.author, text=text)
+            for text in ('Пост 3', 'Пост 4')
+        )
+        update_timelines(
+            (follower_id,), lambda entries: [(0, first.id, 0), *entries]
+        )
+        self.assertEqual(cache.get(key)[1], read_before[1])
+        cache.set(key, read_before)
+        update_timelines(
+            (follower_id,), lambda entries: [(0, second.id, 0), *entries]
+        )
+        self.assertIsNone(cache.get(key))
+        self.assertEqual(
+            self.timeline_post_ids(),
+            [second.id, first.id, HomeTimelineTest.post.id]
+        )
+
+    def test_posts_timeline_read_without_follow_join(self):
+        '''
+        Страница читается из кеша без JOIN с подписками.
+        '''
+        self.timeline_post_ids()
+        with self.assertNumQueries(3):
+            response = self.follower_client.get(
+                reverse('posts:follow_index')
+            )
+        self.assertEqual(len(response.context['page_obj']), 1)
+
+
+@override_settings(
+    FOLLOW_TIMELINE=True, FOLLOW_TIMELINE_CELEBRITY_THRESHOLD=2
+)
+class HybridTimelineTest(TestCase):
+    '''
+    Класс HybridTimelineTest.
+    Тестируем подмешивание постов знаменитостей при чтении ленты.
+    '''
+    @classmethod
+    def setUpClass(cls):
+        '''
+        Создаём знаменитость с двумя подписчиками и обычного автора.
+        '''
+        super().setUpClass()
+        cls.celebrity = User.objects.create_user(username='celebrity')
+        cls.author = User.objects.create_user(username='author')
+        cls.follower = User.objects.create_user(username='follower')
+        cls.fan = User.objects.create_user(username='fan')
+        Follow.objects.create(user=cls.follower, author=cls.celebrity)
+        Follow.objects.create(user=cls.fan, author=cls.celebrity)
+        Follow.objects.create(user=cls.follower, author=cls.author)
+
+    def setUp(self):
+        '''
+        Очищаем кеш и создаём клиента подписчика.
+        '''
+        cache.clear()
+        self.follower_client = Client()
+        self.follower_client.force_login(HybridTimelineTest.follower)
+
+    def test_posts_timeline_celebrity_merged_on_read(self):
+        '''
+        Пост знаменитости не рассылается, но виден в ленте по порядку.
+        '''
+        old_post = Post.objects.create(
+            author=HybridTimelineTest.author, text='Старый пост'
+        )
+        commit()
+        get_timeline(HybridTimelineTest.follower.id)
+        celebrity_post = Post.objects.create(
+            author=HybridTimelineTest.celebrity, text='Пост знаменитости'
+        )
+        new_post = Post.objects.create(
+            author=HybridTimelineTest.author, text='Новый пост'
+        )
+        commit()
+        self.assertEqual(
+            [
+                entry[1]
+                for entry in get_timeline(HybridTimelineTest.follower.id)
+            ],
+            [new_post.id, old_post.id],
+            'Тест не пройден, пост знаменитости разослан подписчикам'
+        )
+        response = self.follower_client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            list(response.context['page_obj']),
+            [new_post, celebrity_post, old_post]
+        )
+
+    def test_posts_timeline_celebrity_change_drops_timelines(self):
+        '''
+        Когда автор перестаёт быть знаменитостью, ленты его подписчиков
+        собираются заново с его постами.
+        '''
+        celebrity_post = Post.objects.create(
+            author=HybridTimelineTest.celebrity, text='Пост знаменитости'
+        )
+        commit()
+        get_timeline(HybridTimelineTest.follower.id)
+        Follow.objects.filter(user=HybridTimelineTest.fan).delete()
+        commit()
+        refresh_celebrities(2)
+        self.assertIsNone(cache.get(timeline_key(self.follower.id)))
+        self.assertEqual(
+            [
+                entry[1]
+                for entry in get_timeline(HybridTimelineTest.follower.id)
+            ],
+            [celebrity_post.id]
+        )
+
+    def test_posts_timeline_celebrities_command(self):
+        '''
+        Команда celebrities выводит знаменитостей.
+        '''
+        out = StringIO()
+        call_command('celebrities', stdout=out)
+        self.assertIn('celebrity\t2', out.getvalue())
+        self.assertNotIn('author', out.getvalue())
@@ -0,0 +1,215 @@
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from posts.models import Comment, Follow, Group, Post
+from posts.following import is_following
+from posts.search import search_ids
+from posts.transfer import Checkpoint
+
+User = get_user_model()
+
+
+class TransferCommandsTest(TestCase):
+    '''
+    Класс TransferCommandsTest.
+    Тестируем выгрузку и загрузку постов, комментариев и подписок.
+    '''
+    @classmethod
+    def setUpClass(cls):
+        '''
+        Создаём авторов, группу, старые посты, комментарии и подписку.
+        '''
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='usertest')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа 1',
+            slug='slug-g1',
+            description='Тестовое описание группы 1',
+        )
+        cls.old_date = timezone.now() - timedelta(days=365)
+        for number in range(5):
+            Post.objects.create(
+                author=cls.user, text=f'Книга номер {number}',
+                group=cls.group if number % 2 else None
+            )
+        Post.objects.update(pub_date=cls.old_date)
+        post = Post.objects.first()
+        Comment.objects.create(post=post, author=cls.reader, text='Отлично')
+        Comment.objects.update(created=cls.old_date)
+        Follow.objects.create(user=cls.reader, author=cls.user)
+
+    def setUp(self):
+        '''
+        Создаём временный каталог для файлов выгрузки.
+        '''
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        '''
+        Удаляем временный каталог.
+        '''
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def path(self, name):
+        '''
+        Путь к файлу во временном каталоге.
+        '''
+        return os.path.join(self.temp_dir, name)
+
+    def export(self, model, path, *args):
+        '''
+        Выгрузка командой export_data.
+        '''
+        call_command('export_data', model, path, *args, stdout=StringIO())
+
+    def load(self, model, path, *args):
+        '''
+        Загрузка командой import_data.
+        '''
+        call_command('import_data', model, path, *args, stdout=StringIO())
+
+    def test_posts_transfer_round_trip(self):
+        '''
+        Выгруженные данные загружаются с теми же id и датами,
+        счётчики и поисковый индекс восстанавливаются.
+        '''
+        for fmt in ('ndjson', 'csv'):
+            with self.subTest(fmt=fmt):
+                expected = {
+                    'post': list(Post.objects.order_by('id').values()),
+                    'comment': list(Comment.objects.order_by('id').values()),
+                    'follow': list(Follow.objects.order_by('id').values()),
+                }
+                for model in expected:
+                    self.export(
+                        model, self.path(f'{model}.{fmt}'),
+                        '--format', fmt, '--batch-size', '2'
+                    )
+                Post.objects.all().delete()
+                Follow.objects.all().delete()
+                for model in expected:
+                    self.load(
+                        model, self.path(f'{model}.{fmt}'),
+                        '--format', fmt, '--batch-size', '2'
+                    )
+                self.assertEqual(
+                    list(Post.objects.order_by('id').values()),
+                    expected['post']
+                )
+                self.assertEqual(
+                    list(Comment.objects.order_by('id').values()),
+                    expected['comment']
+                )
+                self.assertEqual(
+                    list(Follow.objects.order_by('id').values()),
+                    expected['follow']
+                )
+                self.assertEqual(
+                    User.objects.get(pk=TransferCommandsTest.user.pk)
+                    .counters.follower_count, 1
+                )
+                self.assertEqual(
+                    Group.objects.get(pk=TransferCommandsTest.group.pk)
+                    .post_count, 2
+                )
+                self.assertEqual(len(search_ids('книги')), 5)
+
+    def test_posts_transfer_export_resumes(self):
+        '''
+        Выгрузка с контрольной точкой дописывает только записи
+        после последнего выгруженного id.
+        '''
+        path = self.path('posts.ndjson')
+        checkpoint = self.path('export.checkpoint')
+        ids = list(Post.objects.order_by('id').values_list('id', flat=True))
+        with open(path, 'w') as stream:
+            stream.write(json.dumps({'id': ids[0]}) + '\n')
+        with open(checkpoint, 'w') as stream:
+            stream.write(str(ids[0]))
+        self.export('post', path, '--checkpoint', checkpoint)
+        with open(path) as stream:
+            exported = [json.loads(line)['id'] for line in stream]
+        self.assertEqual(exported, ids)
+        self.assertEqual(Checkpoint(checkpoint).read(), ids[-1])
+        self.assertEqual(
+            Checkpoint(checkpoint).offset(), os.path.getsize(path)
+        )
+
+    def test_posts_transfer_export_truncates_interrupted_batch(self):
+        '''
+        Продолжение выгрузки обрезает записи и оборванную строку,
+        записанные после контрольной точки.
+        '''
+        for fmt in ('ndjson', 'csv'):
+            with self.subTest(fmt=fmt):
+                path = self.path(f'posts.{fmt}')
+                checkpoint = self.path(f'{fmt}.checkpoint')
+                self.export(
+                    'post', path, '--format', fmt,
+                    '--checkpoint', checkpoint, '--batch-size', '2'
+                )
+                with open(path, 'rb') as stream:
+                    complete = stream.read()
+                ids = list(
+                    Post.objects.order_by('id').values_list('id', flat=True)
+                )
+                size = len(complete) - len(complete.split(b'\n')[-2]) - 1
+                with open(path, 'ab') as stream:
+                    stream.write(b'{"id": 99, "text": "\xd0\x9e\xd0')
+                with open(checkpoint, 'w') as stream:
+                    stream.write(f'{ids[-2]} {size}')
+                self.export(
+                    'post', path, '--format', fmt,
+                    '--checkpoint', checkpoint, '--batch-size', '2'
+                )
+                with open(path, 'rb') as stream:
+                    self.assertEqual(stream.read(), complete)
+
+    def test_posts_transfer_import_resets_following(self):
+        '''
+        Загруженные подписки видны в кеше подписок сразу.
+        '''
+        path = self.path('follows.ndjson')
+        self.export('follow', path)
+        reader = TransferCommandsTest.reader
+        user = TransferCommandsTest.user
+        Follow.objects.all().delete()
+        self.assertFalse(is_following(reader.id, user.id))
+        self.load('follow', path)
+        self.assertTrue(
+            is_following(reader.id, user.id),
+            'Тест не пройден, после загрузки в кеше прежние подписки'
+        )
+
+    def test_posts_transfer_import_resumes(self):
+        '''
+        Загрузка с контрольной точкой пропускает уже загруженные
+        строки, повторно загруженные записи не дублируются.
+        '''
+        path = self.path('posts.csv')
+        checkpoint = self.path('import.checkpoint')
+        self.export('post', path, '--format', 'csv')
+        ids = list(Post.objects.order_by('id').values_list('id', flat=True))
+        Post.objects.filter(id__in=ids[2:]).delete()
+        with open(checkpoint, 'w') as stream:
+            stream.write('1')
+        self.load(
+            'post', path, '--format', 'csv', '--checkpoint', checkpoint,
+            '--batch-size', '2'
+        )
+        self.assertEqual(
+            list(Post.objects.order_by('id').values_list('id', flat=True)),
+            ids
+        )
+        with open(checkpoint) as stream:
+            self.assertEqual(int(stream.read()), len(ids))
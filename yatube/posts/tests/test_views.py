@@ -1,6 +1,5 @@
 import shutil
 import tempfile
-import time
 
 from django.contrib.auth import get_user_model
 from django.test import Client, TestCase, override_settings
@@ -11,7 +10,7 @@ from django.conf import settings
 
 from posts.models import Post, Group, Comment, Follow
 
-from yatube.settings import COUNT_OF_PAGE_POST, TIME_CACHED
+from yatube.settings import COUNT_OF_PAGE_POST
 
 User = get_user_model()
 
@@ -348,35 +347,35 @@ class PostsContextTest(TestCase):
         '''
         response = self.authorized_client.get(reverse('posts:index'))
         count_posts_in_response = len(response.context['page_obj'])
-        # print(count_posts_in_response)
-        new_post = Post.objects.create(
-            author=PostsContextTest.user,
-            text='Тестовый пост 2'
+        Post.objects.filter(id=PostsContextTest.post.id).update(
+            text='Изменён без сигнала'
         )
-        new_post.save()
         response = self.authorized_client.get(reverse('posts:index'))
-        # print(len(response.context['page_obj']))
         self.assertIsNone(
             response.context,
             (
-                'Тест не пройден, новый контекст передался после'
-                'создания нового поста, хотя должен был кешироватсья'
+                'Тест не пройден, страница отрисовалась заново, '
+                'хотя должна была браться из кеша'
             )
         )
-        time.sleep(TIME_CACHED / 2)
-        response = self.authorized_client.get(reverse('posts:index'))
-        self.assertIsNone(
-            response.context,
-            (
-                'Тест не пройден, новый контекст передался после создания'
-                'нового поста, хотя должен был кешироватсья'
-            )
+        Post.objects.create(
+            author=PostsContextTest.user,
+            text='Тестовый пост 2'
         )
-        time.sleep(TIME_CACHED / 2)
         response = self.authorized_client.get(reverse('posts:index'))
         self.assertEqual(
             len(response.context['page_obj']), count_posts_in_response + 1,
-            'Тест не пройден, должен был уже новый пост отобразиться')
+            'Тест не пройден, новый пост должен был сбросить кеш')
+        Comment.objects.create(
+            author=PostsContextTest.user,
+            post=PostsContextTest.post,
+            text='Новый комментарий'
+        )
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertIsNotNone(
+            response.context,
+            'Тест не пройден, новый комментарий должен был сбросить кеш'
+        )
 
     def test_posts_views_page_follow_show_correct_context(self):
         '''
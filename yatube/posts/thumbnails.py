@@ -0,0 +1,333 @@
+'''
+Фоновое создание миниатюр и вариантов картинок постов.
+
+Тег {% thumbnail %} из sorl-thumbnail при первом обращении создаёт
+миниатюру прямо во время рендера страницы. BackgroundThumbnailBackend
+(THUMBNAIL_BACKEND) отдаёт только уже готовые миниатюры, а недостающие
+ставит в очередь пула из THUMBNAIL_WORKERS потоков; тег тем временем
+выводит содержимое блока {% empty %} - заглушку.
+При THUMBNAIL_WORKERS = 0 и для базы в памяти (в тестах) миниатюры
+создаются сразу, как в sorl.
+
+Для srcset у картинки поста создаются варианты шириной
+POST_IMAGE_WIDTHS в форматах POST_IMAGE_FORMATS с предсказуемыми
+именами posts/variants/<имя картинки>-<ширина>.<расширение>;
+готовые ширины записываются в Post.image_widths.
+Картинки хранятся по содержимому (posts.storage), поэтому пост
+с уже загруженной картинкой получает готовые миниатюру и варианты.
+'''
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, connections, transaction
+from PIL import Image, ImageOps, features
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+
+from .caching import bump_feed_generation, invalidate_post_cards
+from .models import Post
+from .storage import image_references, post_image_storage
+
+logger = logging.getLogger(__name__)
+
+# Миниатюра картинки поста в лентах и на странице поста
+POST_THUMBNAIL_GEOMETRY = '960x339'
+POST_THUMBNAIL_OPTIONS = {'crop': 'center', 'upscale': True}
+
+# Варианты картинки поста для srcset: ширины, соотношение сторон
+# миниатюры и форматы (расширение, формат Pillow, параметры сохранения).
+# WEBP создаётся, только если Pillow собран с libwebp
+POST_IMAGE_WIDTHS = (320, 640, 960, 1920)
+POST_IMAGE_RATIO = 339 / 960
+POST_IMAGE_FORMATS = tuple(
+    image_format for image_format in (
+        ('webp', 'WEBP', {'quality': 80, 'method': 4}),
+        ('jpg', 'JPEG', {'quality': 85, 'progressive': True}),
+    )
+    if image_format[1] != 'WEBP' or features.check('webp')
+)
+POST_IMAGE_VARIANTS_DIR = 'posts/variants'
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = {}
+# Пакетная обработка картинок: число открытых блоков
+# deferred_feed_bump и нужна ли смена поколения лент при выходе
+_feed_bump = {'depth': 0, 'pending': False}
+
+
+def get_executor():
+    '''
+    Пул потоков, создающих миниатюры.
+    '''
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails'
+            )
+        return _executor
+
+
+def in_memory_db():
+    '''
+    База SQLite в памяти (тестовая). Потоки пула не могут делить её
+    с запросом: блокировки общей базы в памяти не ждут освобождения.
+    '''
+    return connection.vendor == 'sqlite' and connection.is_in_memory_db()
+
+
+def run_in_background():
+    '''
+    Создавать ли картинки в пуле потоков, а не сразу.
+    '''
+    return bool(settings.THUMBNAIL_WORKERS) and not in_memory_db()
+
+
+def submit(key, func, *args):
+    '''
+    Отправляет func(*args) в пул потоков.
+    Задача с тем же key, пока она не выполнена, повторно не ставится.
+    '''
+    executor = get_executor()
+    with _executor_lock:
+        if key in _pending:
+            return
+        _pending[key] = executor.submit(run_in_worker, key, func, *args)
+
+
+def run_in_worker(key, func, *args):
+    '''
+    Выполнение задачи в потоке пула.
+    '''
+    try:
+        func(*args)
+    except Exception:
+        logger.exception('Не удалось обработать картинку %s', args[0])
+    finally:
+        connections.close_all()
+        with _executor_lock:
+            _pending.pop(key, None)
+
+
+def wait_thumbnails():
+    '''
+    Ждёт, пока будут созданы все поставленные в очередь миниатюры.
+    '''
+    with _executor_lock:
+        futures = list(_pending.values())
+    wait(futures)
+
+
+def refresh_post_cards(name):
+    '''
+    Сбрасывает закешированные карточки постов с картинкой name:
+    в них была заглушка или картинка без вариантов.
+    Закешированные страницы лент с этими карточками нельзя найти
+    по ключу, поэтому меняется поколение лент - внутри
+    deferred_feed_bump один раз на весь блок.
+    '''
+    invalidate_post_cards(
+        Post.objects.filter(image=name).values_list('id', flat=True)
+    )
+    with _executor_lock:
+        if _feed_bump['depth']:
+            _feed_bump['pending'] = True
+            return
+    bump_feed_generation()
+
+
+@contextmanager
+def deferred_feed_bump():
+    '''
+    Блок пакетной обработки картинок: поколение лент меняется
+    один раз при выходе, а не после каждой картинки.
+    '''
+    with _executor_lock:
+        _feed_bump['depth'] += 1
+    try:
+        yield
+    finally:
+        with _executor_lock:
+            _feed_bump['depth'] -= 1
+            bump = not _feed_bump['depth'] and _feed_bump['pending']
+            if bump:
+                _feed_bump['pending'] = False
+        if bump:
+            bump_feed_generation()
+
+
+def source_image(file_):
+    '''
+    Картинка поста для sorl: ключ миниатюры зависит от хранилища
+    исходника, поэтому картинка по имени открывается в том же
+    хранилище, что и поле Post.image.
+    '''
+    return ImageFile(getattr(file_, 'name', file_), post_image_storage)
+
+
+class BackgroundThumbnailBackend(ThumbnailBackend):
+    '''
+    Бэкенд sorl-thumbnail, не создающий миниатюры во время запроса.
+    '''
+    def thumbnail_options(self, source, options):
+        '''
+        Дополняет options значениями по умолчанию так же,
+        как ThumbnailBackend.get_thumbnail.
+        '''
+        options = dict(options)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        return options
+
+    def get_ready_thumbnail(self, file_, geometry_string, **options):
+        '''
+        Готовая миниатюра или None, если её ещё нет.
+        '''
+        source = source_image(file_)
+        options = self.thumbnail_options(source, options)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return default.kvstore.get(ImageFile(name, default.storage))
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        if not run_in_background():
+            return super().get_thumbnail(file_, geometry_string, **options)
+        if not file_:
+            raise ValueError('falsey file_ argument in get_thumbnail()')
+        thumbnail = self.get_ready_thumbnail(
+            file_, geometry_string, **options
+        )
+        if thumbnail is None:
+            self.schedule(file_, geometry_string, **options)
+        return thumbnail
+
+    def schedule(self, file_, geometry_string, **options):
+        '''
+        Ставит создание миниатюры в очередь пула потоков после
+        фиксации текущей транзакции: поток пула должен видеть пост.
+        '''
+        name = getattr(file_, 'name', file_)
+        if not run_in_background():
+            super().get_thumbnail(
+                source_image(name), geometry_string, **options
+            )
+            return
+        transaction.on_commit(
+            lambda: self.submit(name, geometry_string, options)
+        )
+
+    def submit(self, name, geometry_string, options):
+        '''
+        Отправляет создание миниатюры в пул потоков.
+        '''
+        submit(
+            (name, geometry_string, tuple(sorted(options.items()))),
+            self.generate, name, geometry_string, options
+        )
+
+    def generate(self, name, geometry_string, options):
+        '''
+        Создаёт миниатюру и сбрасывает карточки постов с ней.
+        '''
+        thumbnail = super().get_thumbnail(
+            source_image(name), geometry_string, **options
+        )
+        refresh_post_cards(name)
+        return thumbnail
+
+
+def variant_name(name, width, extension):
+    '''
+    Имя файла варианта картинки name.
+    '''
+    stem = os.path.splitext(os.path.basename(name))[0]
+    return f'{POST_IMAGE_VARIANTS_DIR}/{stem}-{width}.{extension}'
+
+
+def variant_widths(image_width):
+    '''
+    Ширины вариантов для картинки шириной image_width:
+    крупнее оригинала варианты не растягиваются.
+    '''
+    widths = [width for width in POST_IMAGE_WIDTHS if width <= image_width]
+    return widths or [POST_IMAGE_WIDTHS[0]]
+
+
+def generate_variants(name):
+    '''
+    Создаёт варианты картинки name и записывает их ширины в посты.
+    '''
+    with post_image_storage.open(name) as image_file:
+        image = Image.open(image_file)
+        image = ImageOps.exif_transpose(image).convert('RGB')
+    widths = variant_widths(image.width)
+    for width in widths:
+        size = (width, max(1, round(width * POST_IMAGE_RATIO)))
+        variant = ImageOps.fit(image, size, Image.LANCZOS)
+        for extension, image_format, save_options in POST_IMAGE_FORMATS:
+            buffer = BytesIO()
+            variant.save(buffer, image_format, **save_options)
+            path = variant_name(name, width, extension)
+            default_storage.delete(path)
+            default_storage.save(path, ContentFile(buffer.getvalue()))
+    Post.objects.filter(image=name).update(
+        image_widths=','.join(str(width) for width in widths)
+    )
+    refresh_post_cards(name)
+    return widths
+
+
+def schedule_variants(name):
+    '''
+    Ставит создание вариантов картинки в очередь пула потоков.
+    '''
+    if not run_in_background():
+        generate_variants(name)
+        return
+    transaction.on_commit(
+        lambda: submit(('variants', name), generate_variants, name)
+    )
+
+
+def schedule_post_thumbnails(post):
+    '''
+    Заранее создаёт миниатюру и варианты картинки поста.
+    Готовые миниатюра и варианты той же картинки других постов
+    используются повторно.
+    '''
+    if not post.image:
+        return
+    name = post.image.name
+    backend = default.backend
+    if not backend.get_ready_thumbnail(
+        name, POST_THUMBNAIL_GEOMETRY, **POST_THUMBNAIL_OPTIONS
+    ):
+        backend.schedule(
+            name, POST_THUMBNAIL_GEOMETRY, **POST_THUMBNAIL_OPTIONS
+        )
+    widths = image_references(name, exclude=post.pk).exclude(
+        image_widths=''
+    ).values_list('image_widths', flat=True).first()
+    if widths:
+        Post.objects.filter(pk=post.pk).update(image_widths=widths)
+        post.image_widths = widths
+        invalidate_post_cards((post.pk,))
+    else:
+        schedule_variants(name)
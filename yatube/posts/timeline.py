@@ -0,0 +1,336 @@
+'''
+Материализованная лента подписок (fan-out-on-write).
+
+Для каждого подписчика в кеше хранится ограниченный список записей
+(время публикации, id поста, id автора), отсортированный от новых к старым.
+Новый пост дописывается в списки подписчиков автора при сохранении,
+follow_index читает страницу прямо из списка.
+Списки заводятся только при чтении ленты: у неактивных пользователей
+их нет, и рассылка нового поста их не трогает.
+
+Посты авторов с числом подписчиков от FOLLOW_TIMELINE_CELEBRITY_THRESHOLD
+("знаменитостей") не рассылаются: у каждого такого автора в кеше хранится
+список его последних постов, и при чтении ленты эти списки сливаются
+со списком подписчика (k-way merge по времени публикации).
+
+Лента хранится вместе с номером версии, на которой она основана,
+и временем истечения. Каждое изменение ленты атомарно увеличивает
+счётчик версий (cache.incr) и записывает ленту, только если прочитало
+предыдущую версию; иначе параллельное изменение могло потеряться,
+и лента удаляется, чтобы собраться заново при чтении. Лента с версией,
+отличной от счётчика, тоже собирается заново. Изменения не продлевают
+время хранения ленты.
+
+Множество знаменитостей хранится бессрочно вместе со временем,
+когда его пора пересчитать. При пересчёте ленты подписчиков авторов,
+ставших или переставших быть знаменитостями, удаляются: в них нет
+постов бывшей знаменитости или есть посты новой.
+'''
+import heapq
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+
+from core.routers import cache_timeout
+
+from .following import contains, get_following
+from .models import Follow, Post
+
+CELEBRITIES_KEY = 'timeline:celebrities'
+# Ключей в одном cache.delete_many при удалении лент
+DROP_BATCH_SIZE = 1000
+
+
+def timeline_key(user_id):
+    '''
+    Ключ кеша ленты пользователя.
+    '''
+    return f'timeline:{user_id}'
+
+
+def timeline_version_key(user_id):
+    '''
+    Ключ кеша счётчика версий ленты пользователя.
+    '''
+    return f'timeline:{user_id}:version'
+
+
+def author_posts_key(author_id):
+    '''
+    Ключ кеша последних постов автора-знаменитости.
+    '''
+    return f'timeline:author:{author_id}'
+
+
+def make_entry(post):
+    '''
+    Запись ленты для поста.
+    '''
+    return (post.pub_date.timestamp(), post.id, post.author_id)
+
+
+def sort_entries(entries):
+    '''
+    Сортирует записи от новых к старым и обрезает до длины ленты.
+    '''
+    entries = sorted(set(entries), reverse=True)
+    return entries[:settings.FOLLOW_TIMELINE_LENGTH]
+
+
+def make_entries(posts):
+    '''
+    Записи ленты для первых FOLLOW_TIMELINE_LENGTH постов запроса.
+    '''
+    rows = posts.values_list('pub_date', 'id', 'author_id')
+    return [
+        (pub_date.timestamp(), post_id, author_id)
+        for pub_date, post_id, author_id
+        in rows[:settings.FOLLOW_TIMELINE_LENGTH]
+    ]
+
+
+def find_celebrities(threshold):
+    '''
+    Авторы, у которых не меньше threshold подписчиков, с их числом.
+    '''
+    return Follow.objects.values('author_id').annotate(
+        followers=Count('id')
+    ).filter(
+        followers__gte=threshold
+    ).order_by('-followers').values_list('author_id', 'followers')
+
+
+def get_celebrities():
+    '''
+    Множество id авторов-знаменитостей, пустое, если гибридный
+    режим выключен. Пересчитывается раз в
+    FOLLOW_TIMELINE_CELEBRITIES_TIME_CACHED секунд.
+    '''
+    threshold = settings.FOLLOW_TIMELINE_CELEBRITY_THRESHOLD
+    if threshold is None:
+        return frozenset()
+    cached = cache.get(CELEBRITIES_KEY)
+    if cached is None or cached[0] <= time.time():
+        return refresh_celebrities(threshold)
+    return cached[1]
+
+
+def refresh_celebrities(threshold):
+    '''
+    Пересчитывает множество авторов-знаменитостей и кладёт его в кеш.
+    Ленты подписчиков авторов, чей статус изменился, удаляются.
+    '''
+    celebrities = frozenset(
+        author_id for author_id, _ in find_celebrities(threshold)
+    )
+    cached = cache.get(CELEBRITIES_KEY)
+    refresh_at = time.time() + settings.FOLLOW_TIMELINE_CELEBRITIES_TIME_CACHED
+    cache.set(CELEBRITIES_KEY, (refresh_at, celebrities), None)
+    if cached is not None:
+        drop_timelines(cached[1] ^ celebrities)
+    return celebrities
+
+
+def drop_timelines(author_ids):
+    '''
+    Удаляет ленты подписчиков авторов author_ids.
+    '''
+    if not author_ids:
+        return
+    user_ids = Follow.objects.filter(
+        author_id__in=author_ids
+    ).values_list('user_id', flat=True).distinct()
+    keys = [timeline_key(user_id) for user_id in user_ids.iterator()]
+    for start in range(0, len(keys), DROP_BATCH_SIZE):
+        cache.delete_many(keys[start:start + DROP_BATCH_SIZE])
+
+
+def build_timeline(user_id):
+    '''
+    Собирает ленту пользователя из БД без постов знаменитостей.
+    '''
+    return make_entries(
+        Post.objects.filter(
+            author__following__user_id=user_id
+        ).exclude(author_id__in=get_celebrities())
+    )
+
+
+def get_timeline(user_id):
+    '''
+    Возвращает ленту пользователя, собирая её, если в кеше её нет
+    или она не совпадает с текущей версией.
+    '''
+    key = timeline_key(user_id)
+    version_key = timeline_version_key(user_id)
+    cached = cache.get_many((key, version_key))
+    version = cached.get(version_key)
+    timeline = cached.get(key)
+    if timeline is not None and timeline[0] == version:
+        return timeline[2]
+    if version is None:
+        cache.add(version_key, 0, None)
+        version = cache.get(version_key)
+    entries = build_timeline(user_id)
+    timeout = cache_timeout(settings.FOLLOW_TIMELINE_TIME_CACHED)
+    cache.set(key, (version, time.time() + timeout, entries), timeout)
+    return entries
+
+
+def update_timelines(user_ids, update):
+    '''
+    Применяет update к уже заведённым лентам пользователей user_ids.
+    Ленты, изменённые параллельно, удаляются.
+    '''
+    version_keys = {
+        timeline_key(user_id): timeline_version_key(user_id)
+        for user_id in user_ids
+    }
+    timelines = cache.get_many(version_keys)
+    stale = []
+    for key, (based_on, expires_at, entries) in timelines.items():
+        try:
+            version = cache.incr(version_keys[key])
+        except ValueError:
+            version = None
+        timeout = expires_at - time.time()
+        if version != based_on + 1 or timeout < 1:
+            stale.append(key)
+            continue
+        cache.set(key, (version, expires_at, update(entries)), timeout)
+    if stale:
+        cache.delete_many(stale)
+
+
+def follower_ids(author_id):
+    '''
+    id подписчиков автора.
+    '''
+    return Follow.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True)
+
+
+def get_author_posts(author_ids):
+    '''
+    Списки последних постов авторов-знаменитостей.
+    '''
+    keys = {
+        author_posts_key(author_id): author_id for author_id in author_ids
+    }
+    cached = cache.get_many(keys)
+    missing = {}
+    for key, author_id in keys.items():
+        if key not in cached:
+            missing[key] = make_entries(
+                Post.objects.filter(author_id=author_id)
+            )
+    if missing:
+        cache.set_many(
+            missing, cache_timeout(settings.FOLLOW_TIMELINE_TIME_CACHED)
+        )
+    return [*cached.values(), *missing.values()]
+
+
+def push_post(post):
+    '''
+    Рассылает новый пост в ленты подписчиков автора.
+    Пост знаменитости попадает только в список постов самого автора.
+    '''
+    if post.author_id in get_celebrities():
+        cache.delete(author_posts_key(post.author_id))
+        return
+    entry = make_entry(post)
+    update_timelines(
+        follower_ids(post.author_id),
+        lambda entries: sort_entries([entry, *entries])
+    )
+
+
+def remove_post(post_id, author_id):
+    '''
+    Убирает удалённый пост из лент подписчиков автора.
+    '''
+    cache.delete(author_posts_key(author_id))
+    update_timelines(
+        follower_ids(author_id),
+        lambda entries: [
+            entry for entry in entries if entry[1] != post_id
+        ]
+    )
+
+
+def backfill_author(user_id, author_id):
+    '''
+    Добавляет в ленту пользователя последние посты нового автора.
+    Посты знаменитости подмешиваются при чтении.
+    '''
+    if author_id in get_celebrities():
+        return
+    author_entries = make_entries(Post.objects.filter(author_id=author_id))
+    update_timelines(
+        (user_id,),
+        lambda entries: sort_entries([*author_entries, *entries])
+    )
+
+
+def prune_author(user_id, author_id):
+    '''
+    Убирает из ленты пользователя посты автора, от которого он отписался.
+    '''
+    update_timelines(
+        (user_id,),
+        lambda entries: [
+            entry for entry in entries if entry[2] != author_id
+        ]
+    )
+
+
+def merge_celebrities(user_id, entries):
+    '''
+    Сливает ленту пользователя с последними постами знаменитостей,
+    на которых он подписан.
+    '''
+    celebrities = get_celebrities()
+    if not celebrities:
+        return entries
+    following = get_following(user_id)
+    followed = [
+        author_id for author_id in celebrities
+        if contains(following, author_id)
+    ]
+    if not followed:
+        return entries
+    merged = []
+    seen = set()
+    for entry in heapq.merge(
+        entries, *get_author_posts(followed), reverse=True
+    ):
+        if entry[1] in seen:
+            continue
+        seen.add(entry[1])
+        merged.append(entry)
+        if len(merged) == settings.FOLLOW_TIMELINE_LENGTH:
+            break
+    return merged
+
+
+class HomeTimeline:
+    '''
+    Лента подписок пользователя для Paginator.
+    Длина берётся из кеша, посты страницы выбираются по id.
+    '''
+    def __init__(self, user_id):
+        self.entries = merge_celebrities(user_id, get_timeline(user_id))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        post_ids = [entry[1] for entry in self.entries[index]]
+        posts = Post.objects.for_feed().in_bulk(post_ids)
+        return [posts[post_id] for post_id in post_ids if post_id in posts]
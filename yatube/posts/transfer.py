@@ -0,0 +1,245 @@
+'''
+Потоковая выгрузка и загрузка постов, комментариев и подписок.
+
+Записи читаются из БД через iterator() пачками по batch_size и
+пишутся построчно в NDJSON (объект JSON в строке) или CSV, загрузка
+читает файл построчно и вставляет пачки через bulk_create,
+поэтому память не зависит от числа записей.
+Первичные ключи и даты сохраняются. Прогресс записывается
+в файл контрольной точки после каждой пачки: выгрузка обрезает файл
+до конца последней записанной пачки и продолжается с записи после
+последнего выгруженного id, загрузка - со строки после последней
+загруженной.
+'''
+import csv
+import io
+import json
+import os
+from datetime import datetime
+from itertools import islice
+
+from django.core.management.color import no_style
+from django.db import connection, transaction
+
+from .models import Comment, Follow, Post
+
+FORMATS = ('ndjson', 'csv')
+
+# Выгружаемые модели и их поля. Пользователи и группы переносятся
+# dumpdata/loaddata и должны быть загружены раньше
+MODELS = {
+    'post': (Post, (
+        'id', 'text', 'pub_date', 'author_id', 'group_id', 'image',
+        'image_widths',
+    )),
+    'comment': (Comment, ('id', 'post_id', 'author_id', 'text', 'created')),
+    'follow': (Follow, ('id', 'user_id', 'author_id')),
+}
+
+
+class Checkpoint:
+    '''
+    Файл контрольной точки: id последней выгруженной записи или
+    число загруженных строк, у выгрузки через пробел - размер файла
+    выгрузки в байтах после этой записи.
+    '''
+    def __init__(self, path):
+        self.path = path
+
+    def fields(self):
+        if not self.path or not os.path.exists(self.path):
+            return []
+        with open(self.path) as checkpoint:
+            return [int(field) for field in checkpoint.read().split()]
+
+    def read(self):
+        fields = self.fields()
+        return fields[0] if fields else 0
+
+    def offset(self):
+        '''
+        Размер файла выгрузки или None для контрольной точки без него.
+        '''
+        fields = self.fields()
+        return fields[1] if len(fields) > 1 else None
+
+    def write(self, value, offset=None):
+        '''
+        Записывает значение через временный файл, чтобы прерванная
+        запись не оставила испорченную контрольную точку.
+        '''
+        if not self.path:
+            return
+        temp_path = f'{self.path}.tmp'
+        with open(temp_path, 'w') as checkpoint:
+            checkpoint.write(str(value))
+            if offset is not None:
+                checkpoint.write(f' {offset}')
+        os.replace(temp_path, self.path)
+
+
+def batches(iterable, batch_size):
+    '''
+    Разбивает iterable на списки по batch_size элементов.
+    '''
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def encode(value):
+    '''
+    Значение поля для файла: даты в ISO 8601.
+    '''
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def open_export(path, checkpoint):
+    '''
+    Открывает файл выгрузки. При продолжении выгрузки файл
+    обрезается до размера из контрольной точки: записи прерванной
+    пачки и оборванная строка не попадут в файл дважды.
+    '''
+    offset = checkpoint.offset() if checkpoint.read() else 0
+    if offset is None:
+        return open(path, 'a', newline='', encoding='utf-8')
+    stream = open(path, 'a+b' if offset else 'wb')
+    stream.truncate(offset)
+    return io.TextIOWrapper(stream, encoding='utf-8', newline='')
+
+
+def export_rows(name, stream, fmt, batch_size, checkpoint):
+    '''
+    Выгружает записи модели name в открытый файл stream.
+    После каждой пачки в контрольную точку пишутся id последней
+    записи и размер файла.
+    Возвращает число выгруженных записей.
+    '''
+    model, fields = MODELS[name]
+    after_id = checkpoint.read()
+    if fmt == 'csv':
+        writer = csv.writer(stream)
+        if not after_id:
+            writer.writerow(fields)
+    rows = model.objects.filter(pk__gt=after_id).order_by('pk').values_list(
+        *fields
+    ).iterator(chunk_size=batch_size)
+    exported = 0
+    for batch in batches(rows, batch_size):
+        for row in batch:
+            values = [encode(value) for value in row]
+            if fmt == 'csv':
+                writer.writerow(['' if v is None else v for v in values])
+            else:
+                stream.write(
+                    json.dumps(dict(zip(fields, values)), ensure_ascii=False)
+                )
+                stream.write('\n')
+        stream.flush()
+        exported += len(batch)
+        checkpoint.write(batch[-1][0], stream.tell())
+    return exported
+
+
+def read_records(stream, fmt):
+    '''
+    Построчно читает записи из файла в словари.
+    '''
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def build(model, fields, record):
+    '''
+    Объект модели из записи файла. Пустые строки CSV
+    в необязательных внешних ключах означают NULL.
+    '''
+    values = {}
+    for name in fields:
+        field = model._meta.get_field(name)
+        value = record.get(name)
+        if value == '' and field.null:
+            value = None
+        values[name] = None if value is None else field.to_python(value)
+    return model(**values)
+
+
+def date_fields(model):
+    '''
+    Поля модели с auto_now_add: bulk_create заменяет их значения
+    текущим временем.
+    '''
+    return [
+        field.attname for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now_add', False)
+    ]
+
+
+def insert_batch(model, objects):
+    '''
+    Вставляет пачку объектов, пропуская уже существующие ключи,
+    и возвращает вставленным датам значения из файла: bulk_update
+    не вызывает pre_save и auto_now_add не применяет.
+    '''
+    dates = date_fields(model)
+    if not dates:
+        model.objects.bulk_create(objects, ignore_conflicts=True)
+        return
+    existing = set(model.objects.filter(
+        pk__in=[obj.pk for obj in objects]
+    ).values_list('pk', flat=True))
+    saved = [[getattr(obj, name) for name in dates] for obj in objects]
+    model.objects.bulk_create(objects, ignore_conflicts=True)
+    created = []
+    for obj, values in zip(objects, saved):
+        if obj.pk in existing:
+            continue
+        for name, value in zip(dates, values):
+            setattr(obj, name, value)
+        created.append(obj)
+    model.objects.bulk_update(created, dates)
+
+
+def import_records(name, stream, fmt, batch_size, checkpoint):
+    '''
+    Загружает записи модели name из открытого файла stream.
+    Каждая пачка вставляется в своей транзакции; записи с уже
+    существующим ключом пропускаются, поэтому пачку, прерванную
+    до записи контрольной точки, можно загрузить повторно.
+    Возвращает число прочитанных строк без пропущенных по
+    контрольной точке.
+    '''
+    model, fields = MODELS[name]
+    done = checkpoint.read()
+    records = islice(read_records(stream, fmt), done, None)
+    imported = 0
+    for batch in batches(records, batch_size):
+        with transaction.atomic():
+            insert_batch(
+                model, [build(model, fields, record) for record in batch]
+            )
+        imported += len(batch)
+        checkpoint.write(done + imported)
+    reset_sequences(model)
+    return imported
+
+
+def reset_sequences(model):
+    '''
+    Переводит последовательность первичного ключа за загруженные id
+    (нужно PostgreSQL, SQLite возвращает пустой список).
+    '''
+    statements = connection.ops.sequence_reset_sql(no_style(), [model])
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
@@ -0,0 +1,144 @@
+'''
+Приём картинок постов.
+
+Загружаемые файлы пишутся на диск частями (TemporaryFileUploadHandler),
+а SizeLimitedUploadHandler прекращает разбор запроса, как только файл
+превысил UPLOAD_MAX_SIZE, - остаток запроса не читается. Отброшенный
+файл заменяется в uploaded_files(request) на OversizeUploadedFile,
+и форма выводит ошибку о нём.
+Размер картинки в пикселях проверяется по заголовку, до декодирования,
+а слишком большие оригиналы уменьшаются до POST_IMAGE_MAX_SIDE
+при сохранении формы. JPEG декодируется сразу в уменьшенном
+масштабе, остальные форматы - целиком, поэтому для них предел
+числа точек меньше: POST_IMAGE_MAX_DECODED_PIXELS.
+'''
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.files.uploadedfile import (
+    InMemoryUploadedFile, SimpleUploadedFile
+)
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+from PIL import Image, ImageOps
+
+# Форматы, которые уменьшаются без потери свойств картинки
+# (у GIF при пересохранении пропала бы анимация)
+DOWNSAMPLE_FORMATS = {
+    'JPEG': {'quality': 90, 'progressive': True},
+    'PNG': {'optimize': True},
+    'WEBP': {'quality': 90},
+}
+
+
+class OversizeUploadedFile(SimpleUploadedFile):
+    '''
+    Заменяет файл, отброшенный из-за размера.
+    Содержимое не сохраняется, size - сколько байт успело прийти.
+    '''
+    oversize = True
+
+    def __init__(self, name, size, content_type):
+        super().__init__(name, b'', content_type)
+        self.size = size
+
+
+class SizeLimitedUploadHandler(FileUploadHandler):
+    '''
+    Обработчик загрузки, ограничивающий размер файла.
+    Стоит первым в FILE_UPLOAD_HANDLERS: пока файл не превысил
+    UPLOAD_MAX_SIZE, его части передаются следующему обработчику,
+    после - разбор запроса прекращается, соединение закрывается
+    без чтения остатка, а файл записывается в request.oversize_uploads.
+    '''
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.UPLOAD_MAX_SIZE:
+            if self.request is not None:
+                if not hasattr(self.request, 'oversize_uploads'):
+                    self.request.oversize_uploads = {}
+                self.request.oversize_uploads[self.field_name] = (
+                    OversizeUploadedFile(
+                        self.file_name, self.received, self.content_type
+                    )
+                )
+            raise StopUpload(connection_reset=True)
+        return raw_data
+
+    def file_complete(self, file_size):
+        return None
+
+
+def uploaded_files(request):
+    '''
+    Файлы запроса для формы вместе с отброшенными из-за размера
+    или None, если файлов нет.
+    '''
+    files = request.FILES
+    oversize = getattr(request, 'oversize_uploads', None)
+    if oversize:
+        files = files.copy()
+        files.update(oversize)
+    return files or None
+
+
+def pixel_limit(image):
+    '''
+    Наибольшее число точек картинки: JPEG уменьшается при
+    декодировании, остальные форматы декодируются целиком.
+    '''
+    if image.format == 'JPEG':
+        return settings.POST_IMAGE_MAX_PIXELS
+    return min(
+        settings.POST_IMAGE_MAX_PIXELS,
+        settings.POST_IMAGE_MAX_DECODED_PIXELS
+    )
+
+
+def too_many_pixels(image):
+    '''
+    Размер картинки из заголовка превышает pixel_limit.
+    '''
+    width, height = image.size
+    return width * height > pixel_limit(image)
+
+
+def downsample(upload):
+    '''
+    Уменьшает картинку upload, если её сторона больше
+    POST_IMAGE_MAX_SIDE, и возвращает новый загруженный файл.
+    JPEG декодируется сразу в уменьшенном масштабе (draft),
+    поэтому полный растр оригинала в память не попадает;
+    остальные форматы сюда приходят не больше
+    POST_IMAGE_MAX_DECODED_PIXELS точек.
+    Результат больше FILE_UPLOAD_MAX_MEMORY_SIZE тоже пишется на диск.
+    '''
+    max_side = settings.POST_IMAGE_MAX_SIDE
+    image = upload.image
+    if (
+        max_side is None
+        or max(image.size) <= max_side
+        or image.format not in DOWNSAMPLE_FORMATS
+    ):
+        return upload
+    upload.seek(0)
+    image = Image.open(upload)
+    image_format = image.format
+    image.draft('RGB', (max_side, max_side))
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((max_side, max_side), Image.LANCZOS)
+    buffer = tempfile.SpooledTemporaryFile(
+        max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+    )
+    image.save(buffer, image_format, **DOWNSAMPLE_FORMATS[image_format])
+    result = InMemoryUploadedFile(
+        buffer, None, os.path.basename(upload.name),
+        upload.content_type, buffer.tell(), None
+    )
+    result.seek(0)
+    result.image = image
+    return result
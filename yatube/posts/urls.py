@@ -24,4 +24,7 @@ urlpatterns = [
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path('create/', views.post_create, name='post_create'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('follow/many/', views.follow_many, name='follow_many'),
+    path('unfollow/many/', views.unfollow_many, name='unfollow_many'),
+    path('search/', views.search, name='search'),
 ]
@@ -1,25 +1,35 @@
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
 from django.shortcuts import get_object_or_404, render, redirect
-from django.views.decorators.cache import cache_page
+from django.views.decorators.http import require_POST
 
-from .models import Follow, Group, Post, User, Comment
-from .forms import PostForm, CommentForm
+from .models import Group, Post, User, Comment
+from .caching import (
+    FEED_GENERATION_KEY, INDEX_COUNT_KEY, PROFILE_GENERATION_KEY,
+    cache_feed_page, conditional_page
+)
+from .counters import get_user_counters
+from .following import get_following, is_following
+from .follows import follow_authors, unfollow_authors
+from .forms import CommentForm, FollowManyForm, PostForm
+from .paginators import paginate, paginate_comments
+from .search import SearchResults
+from .thumbnails import schedule_post_thumbnails
+from .timeline import HomeTimeline
+from .uploads import uploaded_files
 
-from yatube.settings import COUNT_OF_PAGE_POST
 from yatube.settings import TIME_CACHED
 
 
-@cache_page(TIME_CACHED, key_prefix='index_page')
+@conditional_page(FEED_GENERATION_KEY)
+@cache_feed_page(TIME_CACHED, key_prefix='index_page')
 def index(request):
     '''
     Функция вызова заглавной страницы.
     '''
     template = 'posts/index.html'
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, COUNT_OF_PAGE_POST)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = Post.objects.for_feed()
+    page_obj = paginate(request, post_list, count_key=INDEX_COUNT_KEY)
     context = {
         'title': 'Последние обновления на сайте',
         'page_obj': page_obj,
@@ -27,16 +37,15 @@ def index(request):
     return render(request, template, context)
 
 
+@conditional_page(FEED_GENERATION_KEY)
 def group_posts(request, slug):
     '''
     Функция вызова страницы сообщества.
     '''
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    paginator = Paginator(post_list, COUNT_OF_PAGE_POST)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = group.posts.for_feed()
+    page_obj = paginate(request, post_list, count=group.post_count)
     context = {
         'group': group,
         'page_obj': page_obj,
@@ -44,6 +53,7 @@ def group_posts(request, slug):
     return render(request, template, context)
 
 
+@conditional_page(FEED_GENERATION_KEY, PROFILE_GENERATION_KEY)
 def profile(request, username):
     '''
     Функция вызова страницы пользователя.
@@ -52,21 +62,39 @@ def profile(request, username):
     profile_user = get_object_or_404(User, username=username)
     name_user = profile_user.get_full_name()
     title_profile = f'Профайл пользователя {name_user}'
-    post_list = profile_user.posts.all()
-    paginator = Paginator(post_list, COUNT_OF_PAGE_POST)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    counters = get_user_counters(profile_user)
+    post_list = profile_user.posts.for_feed()
+    page_obj = paginate(request, post_list, count=counters.post_count)
     context = {
         'title': title_profile,
         'profile_user': profile_user,
+        'counters': counters,
         'page_obj': page_obj,
     }
     if request.user.is_authenticated:
-        following = request.user.follower.filter(author=profile_user).exists()
-        context['following'] = following
+        context['following'] = is_following(
+            request.user.id, profile_user.id
+        )
     return render(request, template, context)
 
 
+def search(request):
+    '''
+    Функция поиска постов по тексту.
+    '''
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    results = SearchResults(query) if query else []
+    page_obj = paginate(request, results)
+    context = {
+        'title': f'Поиск: {query}' if query else 'Поиск',
+        'query': query,
+        'page_obj': page_obj,
+    }
+    return render(request, template, context)
+
+
+@conditional_page(FEED_GENERATION_KEY, PROFILE_GENERATION_KEY)
 def post_detail(request, post_id):
     '''
     Функция вызова страницы конкретного поста.
@@ -75,10 +103,16 @@ def post_detail(request, post_id):
     current_post: Post = get_object_or_404(Post, pk=post_id)
     form = CommentForm()
     title_post_detail = f'Пост {current_post}'
-    comments = Comment.objects.filter(post=current_post)
+    comments = paginate_comments(
+        request,
+        current_post.comments.select_related('author').only(
+            'text', 'created', 'post_id', 'author__username'
+        )
+    )
     context = {
         'title': title_post_detail,
         'post': current_post,
+        'author_counters': get_user_counters(current_post.author),
         'form': form,
         'comments': comments
     }
@@ -108,13 +142,13 @@ def post_create(request):
     template = 'posts/create_post.html'
 
     if request.method != 'POST':
-        form = PostForm(files=request.FILES or None)
+        form = PostForm(files=uploaded_files(request))
         return render(
             request, template,
             {'title': 'Новый пост', 'form': form, 'is_edit': False}
         )
 
-    form = PostForm(request.POST, files=request.FILES or None)
+    form = PostForm(request.POST, files=uploaded_files(request))
 
     if not form.is_valid():
         return render(
@@ -126,6 +160,7 @@ def post_create(request):
     new_post = form.save(commit=False)
     new_post.author = user
     new_post.save()
+    schedule_post_thumbnails(new_post)
     return redirect('posts:profile', username=user.username)
 
 
@@ -143,7 +178,7 @@ def post_edit(request, post_id):
 
     if request.method != 'POST':
         form = PostForm(
-            files=request.FILES or None,
+            files=uploaded_files(request),
             instance=post
         )
         return render(
@@ -153,7 +188,7 @@ def post_edit(request, post_id):
 
     form = PostForm(
         request.POST,
-        files=request.FILES or None,
+        files=uploaded_files(request),
         instance=post
     )
     if not form.is_valid():
@@ -162,7 +197,13 @@ def post_edit(request, post_id):
             {'title': title, 'form': form, 'is_edit': True}
         )
 
-    form.save()
+    post = form.save(commit=False)
+    image_changed = 'image' in form.changed_data
+    if image_changed:
+        post.image_widths = ''
+    post.save()
+    if image_changed:
+        schedule_post_thumbnails(post)
     return redirect('posts:post_detail', post_id=post_id)
 
 
@@ -173,10 +214,19 @@ def follow_index(request):
     '''
     template = 'posts/follow.html'
     user: User = request.user
-    post_list = Post.objects.filter(author__following__user=user)
-    paginator = Paginator(post_list, COUNT_OF_PAGE_POST)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    if settings.FOLLOW_TIMELINE:
+        post_list = HomeTimeline(user.id)
+    else:
+        author_ids = get_following(user.id)
+        if len(author_ids) > settings.FOLLOWING_FEED_MAX_AUTHORS:
+            post_list = Post.objects.for_feed().filter(
+                author__following__user=user
+            )
+        else:
+            post_list = Post.objects.for_feed().filter(
+                author_id__in=author_ids
+            )
+    page_obj = paginate(request, post_list)
     context = {
         'title': 'Последние обновления на сайте',
         'page_obj': page_obj,
@@ -189,10 +239,8 @@ def profile_follow(request, username):
     '''
     user подписывается на автора username.
     '''
-    user = request.user
     author = get_object_or_404(User, username=username)
-    if user != author:
-        Follow.objects.get_or_create(user=user, author=author)
+    follow_authors(request.user, (author.id,))
     return redirect('posts:profile', username=username)
 
 
@@ -201,9 +249,35 @@ def profile_unfollow(request, username):
     '''
     user отписывается от автора username.
     '''
-    user = request.user
     author = get_object_or_404(User, username=username)
-    check_follow = Follow.objects.filter(user=user, author=author)
-    if check_follow.exists():
-        check_follow.delete()
+    unfollow_authors(request.user, (author.id,))
     return redirect('posts:profile', username=username)
+
+
+@require_POST
+@login_required
+def follow_many(request):
+    '''
+    user подписывается на всех авторов из списка usernames.
+    Неизвестные имена пропускаются.
+    '''
+    form = FollowManyForm(request.POST)
+    if form.is_valid():
+        follow_authors(request.user, User.objects.filter(
+            username__in=form.cleaned_data['usernames']
+        ).values_list('id', flat=True))
+    return redirect('posts:follow_index')
+
+
+@require_POST
+@login_required
+def unfollow_many(request):
+    '''
+    user отписывается от всех авторов из списка usernames.
+    '''
+    form = FollowManyForm(request.POST)
+    if form.is_valid():
+        unfollow_authors(request.user, User.objects.filter(
+            username__in=form.cleaned_data['usernames']
+        ).values_list('id', flat=True))
+    return redirect('posts:follow_index')
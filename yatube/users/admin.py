@@ -0,0 +1,118 @@
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.db import connections
+from django.db.models import Q
+from django.urls import reverse
+
+User = get_user_model()
+
+
+def username_prefix_users(term):
+    '''
+    Пользователи, чей username начинается с term.
+    SQLite сравнивает строки побайтно (collation BINARY), и префикс
+    ищется диапазоном по уникальному индексу username: LIKE этот
+    индекс не использует. В остальных СУБД порядок строк зависит
+    от collation, поэтому используется LIKE 'term%' - для него
+    PostgreSQL создаёт у username индекс varchar_pattern_ops.
+    '''
+    users = User.objects.all()
+    if connections[users.db].vendor == 'sqlite':
+        users = users.filter(
+            username__gte=term, username__lt=term + '\U0010ffff'
+        )
+    else:
+        users = users.filter(username__startswith=term)
+    return users.values('pk')
+
+
+def is_autocomplete(request):
+    '''
+    Запрос пришёл от автодополнения админки.
+    '''
+    match = request.resolver_match
+    return match is not None and match.url_name.endswith('_autocomplete')
+
+
+class UsernameSearchMixin:
+    '''
+    Поиск в админке по началу username пользователей, связанных
+    с записью через поля username_search_fields.
+    При username_search_autocomplete_only так ищет только
+    автодополнение, а список записей - по search_fields.
+    '''
+    username_search_fields = ()
+    username_search_autocomplete_only = False
+
+    def get_search_results(self, request, queryset, search_term):
+        if (self.username_search_autocomplete_only
+                and not is_autocomplete(request)):
+            return super().get_search_results(
+                request, queryset, search_term
+            )
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        users = username_prefix_users(term)
+        condition = Q()
+        for field in self.username_search_fields:
+            condition |= Q(**{f'{field}__in': users})
+        return queryset.filter(condition), False
+
+
+class UsernameFilter(admin.SimpleListFilter):
+    '''
+    Фильтр по username пользователя из поля field_name: поле ввода
+    с подсказками из автодополнения админки вместо списка
+    всех пользователей в боковой панели.
+    '''
+    template = 'admin/username_filter.html'
+    field_name = None
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def has_output(self):
+        return True
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(
+                **{f'{self.field_name}__username': self.value()}
+            )
+        return queryset
+
+    def choices(self, changelist):
+        yield {
+            'value': self.value() or '',
+            'parameter_name': self.parameter_name,
+            'query_parts': [
+                (name, value)
+                for name, value in changelist.get_filters_params().items()
+                if name != self.parameter_name
+            ],
+            'reset_query_string': changelist.get_query_string(
+                remove=[self.parameter_name]
+            ),
+            'autocomplete_url': reverse('admin:auth_user_autocomplete'),
+        }
+
+
+class UserAdmin(UsernameSearchMixin, BaseUserAdmin):
+    '''
+    Класс UserAdmin.
+    Автодополнение ищет пользователей по началу username, список
+    пользователей - как стандартная админка, по username, имени,
+    фамилии и email.
+    '''
+    username_search_fields = ('pk',)
+    username_search_autocomplete_only = True
+    show_full_result_count = False
+
+
+# Стандартная админка пользователей ищет по LIKE '%term%' в четырёх
+# полях; автодополнение пользователей в админке постов идёт через неё
+# и вызывается на каждое нажатие клавиши
+admin.site.unregister(User)
+admin.site.register(User, UserAdmin)
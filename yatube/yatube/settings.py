@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 
 import os
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -58,6 +60,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.PrimaryPinMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -82,6 +85,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'core.context_processors.year.year',
+                'core.context_processors.fragments.fragment_timeout',
             ],
         },
     },
@@ -93,12 +97,66 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+# YATUBE_DB_ENGINE=postgresql переключает проект на PostgreSQL
+# (нужен пакет psycopg2), параметры подключения берутся из POSTGRES_*.
+# Соединения переиспользуются YATUBE_DB_CONN_MAX_AGE секунд;
+# при пуле соединений PgBouncer (режим transaction) нужно
+# YATUBE_DB_PGBOUNCER=1: серверные курсоры с ним не работают.
+# SQLite по умолчанию работает в режиме WAL (YATUBE_SQLITE_WAL),
+# запись ждёт освобождения блокировки YATUBE_SQLITE_TIMEOUT секунд.
+DB_ENGINE = os.getenv('YATUBE_DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('POSTGRES_DB', 'yatube'),
+            'USER': os.getenv('POSTGRES_USER', 'yatube'),
+            'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
+            'HOST': os.getenv('POSTGRES_HOST', 'localhost'),
+            'PORT': os.getenv('POSTGRES_PORT', '5432'),
+            'CONN_MAX_AGE': int(os.getenv('YATUBE_DB_CONN_MAX_AGE', '60')),
+            'DISABLE_SERVER_SIDE_CURSORS': (
+                os.getenv('YATUBE_DB_PGBOUNCER', '0') == '1'
+            ),
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'core.backends.sqlite3',
+            'NAME': os.getenv(
+                'YATUBE_DB_NAME', os.path.join(BASE_DIR, 'db.sqlite3')
+            ),
+            'OPTIONS': {
+                'timeout': int(os.getenv('YATUBE_SQLITE_TIMEOUT', '20')),
+            },
+        }
     }
-}
+
+SQLITE_WAL = os.getenv('YATUBE_SQLITE_WAL', '1') == '1'
+
+# Реплики для чтения: YATUBE_DB_REPLICAS - через запятую файлы баз
+# SQLite или хосты PostgreSQL (остальные параметры как у default).
+# Чтение постов, групп, комментариев и подписок в безопасных
+# запросах идёт на реплики, запись - в default. После записи
+# пользователь PRIMARY_PIN_SECONDS секунд читает default
+# (cookie PRIMARY_PIN_COOKIE), чтобы видеть свои изменения
+REPLICA_DATABASES = []
+for number, replica in enumerate(
+    filter(None, os.getenv('YATUBE_DB_REPLICAS', '').split(',')), 1
+):
+    alias = f'replica{number}'
+    DATABASES[alias] = dict(
+        DATABASES['default'],
+        **({'HOST': replica} if DB_ENGINE == 'postgresql' else {'NAME': replica}),
+        TEST={'MIRROR': 'default'},
+    )
+    REPLICA_DATABASES.append(alias)
+REPLICA_APP_LABELS = ('posts',)
+DATABASE_ROUTERS = ['core.routers.PrimaryReplicaRouter']
+PRIMARY_PIN_COOKIE = 'primary_pin'
+PRIMARY_PIN_SECONDS = int(os.getenv('YATUBE_DB_PRIMARY_PIN', '5'))
 
 
 # Password validation
@@ -154,14 +212,108 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'send_emails')
 
 # Количество выводимых постов на странице с помощью paginator
 COUNT_OF_PAGE_POST = 10
+# Количество комментариев на странице поста
+COUNT_OF_PAGE_COMMENT = 20
+
+# Курсорная пагинация лент по (pub_date, id) вместо COUNT(*) и OFFSET.
+# Страницы адресуются параметром ?cursor= вместо ?page=
+CURSOR_PAGINATION = False
+
+# С какого числа строк пагинатор таблицы без фильтров берёт
+# число строк из статистики планировщика вместо COUNT(*)
+ESTIMATED_COUNT_THRESHOLD = 100000
+# Сколько секунд хранится в кеше число записей такой ленты
+PAGINATOR_COUNT_TIMEOUT = 300
+# Сколько номеров страниц выводится по обе стороны от текущей
+# и в начале и конце списка страниц
+PAGE_WINDOW = 3
+PAGE_ON_ENDS = 1
+
+# Сколько самых релевантных постов выдаёт поиск
+SEARCH_MAX_RESULTS = 1000
+
+# Материализованная лента подписок в кеше (fan-out-on-write):
+# новые посты рассылаются в ленты подписчиков при сохранении.
+# В нескольких процессах требует общего для них кеша
+FOLLOW_TIMELINE = False
+FOLLOW_TIMELINE_LENGTH = 1000
+FOLLOW_TIMELINE_TIME_CACHED = 60 * 60 * 24
+# Посты авторов, у которых подписчиков не меньше порога, не рассылаются,
+# а подмешиваются в ленту при чтении. None - рассылать всем
+FOLLOW_TIMELINE_CELEBRITY_THRESHOLD = 10000
+FOLLOW_TIMELINE_CELEBRITIES_TIME_CACHED = 60 * 10
+# Подписки пользователя хранятся в кеше FOLLOWING_TIME_CACHED секунд.
+# Лента подписок выбирает посты по списку авторов из кеша, если их
+# не больше FOLLOWING_FEED_MAX_AUTHORS, иначе - через JOIN с подписками.
+# Каждый автор - параметр запроса, а SQLite до 3.32 принимает
+# не больше 999 параметров, поэтому остаётся запас на остальные
+FOLLOWING_TIME_CACHED = 60 * 60 * 24
+FOLLOWING_FEED_MAX_AUTHORS = 900
+# Сколько авторов можно подписать или отписать одним запросом
+FOLLOW_MANY_MAX_AUTHORS = 100
+
+# Загрузки пишутся на диск частями; на файле больше UPLOAD_MAX_SIZE
+# разбор запроса прекращается, остаток не читается
+FILE_UPLOAD_HANDLERS = (
+    'posts.uploads.SizeLimitedUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+)
+UPLOAD_MAX_SIZE = 50 * 1024 * 1024
+# Картинки, в которых по заголовку больше POST_IMAGE_MAX_PIXELS точек,
+# не принимаются; стороны больше POST_IMAGE_MAX_SIDE уменьшаются
+# при публикации (None - сохранять оригинал). Не-JPEG декодируются
+# целиком, для них предел - POST_IMAGE_MAX_DECODED_PIXELS точек
+POST_IMAGE_MAX_PIXELS = 60_000_000
+POST_IMAGE_MAX_DECODED_PIXELS = 16_000_000
+POST_IMAGE_MAX_SIDE = 3840
+# Картинка без постов, сохранённая или загруженная повторно меньше
+# POST_IMAGE_RELEASE_DELAY секунд назад, удаляется после этой задержки
+POST_IMAGE_RELEASE_DELAY = 60
+
+# Миниатюры картинок создаются в фоне пулом из THUMBNAIL_WORKERS потоков,
+# пока миниатюры нет, страница выводит заглушку.
+# 0 - создавать при рендере страницы, как в sorl-thumbnail
+THUMBNAIL_BACKEND = 'posts.thumbnails.BackgroundThumbnailBackend'
+THUMBNAIL_WORKERS = int(os.getenv('YATUBE_THUMBNAIL_WORKERS', '2'))
 
 # Заменяем функцию, что отвечает за ошибку с CSRF Token (403)
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 # Кеширование
+# YATUBE_CACHE выбирает хранилище кеша:
+# locmem - своё в каждом процессе (по умолчанию),
+# file - общий для процессов кеш в каталоге YATUBE_CACHE_LOCATION,
+# memcached - общий кеш на серверах YATUBE_CACHE_LOCATION
+# (адреса через запятую, нужен пакет python-memcached).
+# Ключи всех режимов начинаются с YATUBE_CACHE_KEY_PREFIX
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'memcached': 'django.core.cache.backends.memcached.MemcachedCache',
+}
+CACHE_LOCATIONS = {
+    'locmem': '',
+    'file': os.path.join(BASE_DIR, 'cache'),
+    'memcached': '127.0.0.1:11211',
+}
+CACHE_MODE = os.getenv('YATUBE_CACHE', 'locmem')
+if CACHE_MODE not in CACHE_BACKENDS:
+    raise ImproperlyConfigured(
+        f'YATUBE_CACHE={CACHE_MODE!r}: допустимые значения - '
+        f'{", ".join(CACHE_BACKENDS)}'
+    )
+CACHE_LOCATION = os.getenv('YATUBE_CACHE_LOCATION', CACHE_LOCATIONS[CACHE_MODE])
+if CACHE_MODE == 'memcached':
+    CACHE_LOCATION = CACHE_LOCATION.split(',')
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': CACHE_BACKENDS[CACHE_MODE],
+        'LOCATION': CACHE_LOCATION,
+        'KEY_PREFIX': os.getenv('YATUBE_CACHE_KEY_PREFIX', 'yatube'),
     }
 }
-TIME_CACHED = 20
+# Время кеширования главной страницы. Страница сбрасывается
+# при изменении постов, групп и комментариев, поэтому может быть долгим
+TIME_CACHED = 60 * 60 * 3
+# Время кеширования карточек постов и первой страницы комментариев
+FRAGMENT_TIME_CACHED = 60 * 60 * 24